@@ -0,0 +1,103 @@
+"""
+Utilitaires partagés par les scripts de benchmark: réponses simulées du LLM
+(benchmark hors ligne et mock Groq), percentiles, en-tête Server-Timing.
+"""
+
+import re
+import resource
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+SOURCE_HEADER = re.compile(r"SOURCE 1: ([^\n]+)")
+
+SUGGESTED_QUESTIONS = [
+    "Quelle est la durée du préavis de licenciement ?",
+    "Comment calculer l'indemnité de congé payé ?",
+    "Quels recours en cas de licenciement abusif ?",
+    "Qui peut saisir l'inspection du travail ?",
+]
+
+
+# =============================================================================
+# RÉPONSES SIMULÉES
+# =============================================================================
+
+def route_response(prompt: str) -> str:
+    """Réponse du LLM de routage: toujours juridique (questions du benchmark)."""
+    return "JURIDIQUE"
+
+
+def generation_response(prompt: str) -> str:
+    """Réponse déterministe du LLM de génération selon le prompt reçu."""
+    lower = prompt.lower()
+    if "questions suggérées" in lower or "génère 4 à 5 questions" in lower:
+        return "\n".join(SUGGESTED_QUESTIONS)
+
+    match = SOURCE_HEADER.search(prompt)
+    source = match.group(1) if match else "les textes fournis"
+    return (
+        f"D'après {source}, la règle applicable est la suivante. "
+        "Le texte prévoit les conditions, la procédure à suivre "
+        "et les droits de chaque partie. "
+        "L'employeur comme le salarié doivent respecter les délais fixés par la loi, "
+        "et tout manquement peut être porté devant l'inspection du travail "
+        "ou le tribunal compétent. "
+        "En cas de doute, conservez les documents écrits "
+        "et demandez conseil à un professionnel du droit."
+    )
+
+
+def respond(prompt: str) -> str:
+    """Réponse simulée pour un prompt quelconque (routage reconnu à sa consigne)."""
+    if "Réponds 'JURIDIQUE' ou 'AUTRE'" in prompt:
+        return route_response(prompt)
+    return generation_response(prompt)
+
+
+# =============================================================================
+# MESURES
+# =============================================================================
+
+def peak_rss_mb() -> float:
+    """RSS maximal du processus (Linux: ru_maxrss en Ko)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def percentiles(values: List[float]) -> dict:
+    """p50 / p95 / p99 / moyenne (ms) d'une série de durées."""
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "count": len(ordered),
+        "p50": round(statistics.median(ordered), 2),
+        "p95": round(ordered[int(0.95 * last)], 2),
+        "p99": round(ordered[int(0.99 * last)], 2),
+        "mean": round(statistics.fmean(ordered), 2),
+    }
+
+
+def parse_server_timing(header: str) -> Dict[str, float]:
+    """`classify;dur=12.3, retrieve;dur=45.0` -> {"classify": 12.3, ...}."""
+    timings = {}
+    for entry in header.split(","):
+        name, _, params = entry.strip().partition(";")
+        if params.startswith("dur="):
+            timings[name] = float(params[4:])
+    return timings
+
+
+def git_commit() -> Optional[str]:
+    """Commit courant (identifie les résultats à comparer)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
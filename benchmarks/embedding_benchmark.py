@@ -0,0 +1,201 @@
+"""
+Benchmark des backends d'embeddings (torch vs ONNX int8).
+
+Chaque backend est mesuré dans un processus séparé (RSS indépendant):
+- temps de chargement du modèle et RSS maximal
+- latence par requête (p50 / p95) et débit d'encodage des chunks
+- recall@k par rapport au backend torch (classement de référence):
+  * "mixed": requêtes ONNX contre les vecteurs torch stockés dans la base
+    (base existante non ré-encodée)
+  * "reembedded": requêtes et chunks encodés en ONNX (après `reembed`)
+
+Prérequis: base Chroma construite, modèle ONNX exporté
+(`python -m src.embeddings export`).
+
+Usage:
+    python benchmarks/embedding_benchmark.py [--db-path data/chroma_db_with_web]
+        [--corpus-size 2000] [--k 10] [--output resultats.json]
+"""
+
+import argparse
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+QUERIES = [
+    "Combien de jours de congé ai-je droit par an ?",
+    "Mon employeur peut-il me licencier sans préavis ?",
+    "Quelle est la durée légale du travail au Sénégal ?",
+    "Combien de temps dure la période d'essai ?",
+    "À quel âge puis-je partir à la retraite ?",
+    "Qui peut être président du Sénégal ?",
+    "Quelle est la durée du mandat présidentiel ?",
+    "Ai-je le droit de créer un syndicat ?",
+    "Puis-je faire grève au Sénégal ?",
+    "Quelles sont les sanctions pour harcèlement au travail ?",
+    "Quelles sont les peines pour le vol ?",
+    "Que dit l'article L.2 du Code du Travail ?",
+    "Comment saisir l'inspection du travail ?",
+    "Quels sont les droits de la femme enceinte au travail ?",
+    "Peut-on me discriminer à l'embauche ?",
+    "Comment se marier au Sénégal ?",
+    "Qu'est-ce qu'un contrat à durée déterminée ?",
+    "Quelles sont les obligations de l'employeur en matière de sécurité ?",
+    "Comment est élue l'Assemblée nationale ?",
+    "Quelles sont les conditions de la légitime défense ?",
+]
+
+
+def _peak_rss_mb() -> float:
+    """RSS maximal du processus (Linux: ru_maxrss en Ko)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_worker(backend: str, workdir: Path) -> None:
+    """Mesures d'un backend (exécuté dans un sous-processus)."""
+    from src.embeddings import build_embedding_model, embedding_namespace
+
+    texts = json.loads((workdir / "corpus.json").read_text(encoding="utf-8"))
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    model = build_embedding_model(backend)
+    load_seconds = time.perf_counter() - start
+
+    # Préchauffage (allocation des buffers, compilation du graphe)
+    model.embed_query("préchauffage")
+
+    latencies = []
+    query_vectors = []
+    for query in QUERIES:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    corpus_vectors = model.embed_documents(texts)
+    corpus_seconds = time.perf_counter() - start
+
+    queries_array = np.asarray(query_vectors, dtype=np.float32)
+    corpus_array = np.asarray(corpus_vectors, dtype=np.float32)
+    np.save(workdir / f"{backend}_queries.npy", queries_array)
+    np.save(workdir / f"{backend}_corpus.npy", corpus_array)
+
+    latencies.sort()
+    result = {
+        "backend": embedding_namespace(model),
+        "load_seconds": round(load_seconds, 2),
+        "rss_before_load_mb": round(rss_before, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "query_latency_ms": {
+            "p50": round(statistics.median(latencies), 2),
+            "p95": round(latencies[int(0.95 * (len(latencies) - 1))], 2),
+            "mean": round(statistics.fmean(latencies), 2),
+        },
+        "corpus_chunks_per_second": (
+            round(len(texts) / corpus_seconds, 1) if corpus_seconds else None
+        ),
+    }
+    result_path = workdir / f"{backend}_result.json"
+    result_path.write_text(json.dumps(result), encoding="utf-8")
+
+
+def load_corpus(db_path: Path, corpus_size: int):
+    """Textes et vecteurs stockés (torch) des premiers chunks de la base."""
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(db_path))
+    collection = client.get_collection("juridiction_senegal")
+    page = collection.get(include=["documents", "embeddings"], limit=corpus_size)
+    texts = [doc or "" for doc in page["documents"]]
+    return texts, np.asarray(page["embeddings"], dtype=np.float32)
+
+
+def top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k chunks les plus proches (vecteurs normalisés: produit scalaire)."""
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def recall_at_k(reference: np.ndarray, candidate: np.ndarray) -> float:
+    """Part moyenne des k résultats de référence retrouvés."""
+    k = reference.shape[1]
+    return float(np.mean([
+        len(set(ref) & set(cand)) / k for ref, cand in zip(reference, candidate)
+    ]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark des backends d'embeddings")
+    parser.add_argument(
+        "--db-path", type=Path, default=BASE_DIR / "data" / "chroma_db_with_web"
+    )
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--worker", choices=["torch", "onnx"], help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.workdir)
+        return
+
+    texts, stored_vectors = load_corpus(args.db_path, args.corpus_size)
+    print(f"📦 {len(texts)} chunks, {len(QUERIES)} requêtes, k={args.k}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        (workdir / "corpus.json").write_text(
+            json.dumps(texts, ensure_ascii=False), encoding="utf-8"
+        )
+
+        results = {}
+        for backend in ("torch", "onnx"):
+            print(f"🔄 Backend {backend}...")
+            subprocess.run(
+                [
+                    sys.executable, __file__,
+                    "--worker", backend, "--workdir", str(workdir),
+                ],
+                check=True
+            )
+            result_path = workdir / f"{backend}_result.json"
+            results[backend] = json.loads(result_path.read_text(encoding="utf-8"))
+
+        torch_queries = np.load(workdir / "torch_queries.npy")
+        torch_corpus = np.load(workdir / "torch_corpus.npy")
+        onnx_queries = np.load(workdir / "onnx_queries.npy")
+        onnx_corpus = np.load(workdir / "onnx_corpus.npy")
+
+    reference = top_k(torch_queries, torch_corpus, args.k)
+    mixed = top_k(onnx_queries, stored_vectors, args.k)
+    reembedded = top_k(onnx_queries, onnx_corpus, args.k)
+    results["onnx"]["recall_at_k"] = {
+        "k": args.k,
+        "mixed": round(recall_at_k(reference, mixed), 4),
+        "reembedded": round(recall_at_k(reference, reembedded), 4),
+    }
+    results["onnx"]["mean_cosine_to_torch"] = round(
+        float(np.mean(np.sum(torch_corpus * onnx_corpus, axis=1))), 4
+    )
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    print(report)
+    if args.output:
+        args.output.write_text(report, encoding="utf-8")
+        print(f"💾 Résultats: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Générateur de charge HTTP pour /ask et /ask/stream.
+
+À lancer contre un serveur réel (uvicorn, middlewares, rate limiting) dont
+les appels LLM pointent vers le mock Groq:
+
+    python benchmarks/mock_groq.py --port 8100 &
+    GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=mock \
+        uvicorn src.server:app --port 8000 &
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --concurrency 1,8,32,64
+
+Pour chaque niveau de concurrence: codes HTTP (429 du rate limiting par IP,
+504 des timeouts...), latence p50/p95/p99, temps jusqu'au premier token
+(streaming), débit, durées par étape (en-tête Server-Timing) et, avec
+`--mock-url`, la concurrence maximale observée côté LLM.
+
+Prérequis: httpx.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.common import (  # noqa: E402 (après sys.path.insert)
+    git_commit,
+    parse_server_timing,
+    percentiles,
+)
+
+QUESTIONS = [
+    "Combien de jours de congé ai-je droit par an ?",
+    "Mon employeur peut-il me licencier sans préavis ?",
+    "Quelle est la durée légale du travail au Sénégal ?",
+    "Combien de temps dure la période d'essai ?",
+    "À quel âge puis-je partir à la retraite ?",
+    "Qui peut être président du Sénégal ?",
+    "Quelle est la durée du mandat présidentiel ?",
+    "Ai-je le droit de créer un syndicat ?",
+    "Puis-je faire grève au Sénégal ?",
+    "Quelles sont les peines pour le vol ?",
+]
+
+
+async def ask(client: httpx.AsyncClient, question: str, thread_id: str) -> dict:
+    """Une requête /ask."""
+    start = time.perf_counter()
+    payload = {"question": question, "thread_id": thread_id}
+    response = await client.post("/ask", json=payload)
+    return {
+        "status": response.status_code,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "timings": parse_server_timing(response.headers.get("server-timing", "")),
+    }
+
+
+async def ask_stream(client: httpx.AsyncClient, question: str, thread_id: str) -> dict:
+    """Une requête /ask/stream (temps jusqu'au premier token et jusqu'à `done`)."""
+    start = time.perf_counter()
+    first_token_ms: Optional[float] = None
+    done_ms: Optional[float] = None
+    payload = {"question": question, "thread_id": thread_id}
+    async with client.stream("POST", "/ask/stream", json=payload) as response:
+        timings = parse_server_timing(response.headers.get("server-timing", ""))
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "token" and first_token_ms is None:
+                    first_token_ms = (time.perf_counter() - start) * 1000
+                elif event == "done":
+                    done_ms = (time.perf_counter() - start) * 1000
+                elif event == "error":
+                    return {
+                        "status": "stream_error",
+                        "latency_ms": (time.perf_counter() - start) * 1000,
+                    }
+    result = {
+        "status": response.status_code,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "timings": timings,
+    }
+    if first_token_ms is not None:
+        result["timings"]["first_token"] = first_token_ms
+    if done_ms is not None:
+        result["timings"]["done"] = done_ms
+    return result
+
+
+async def run_level(client: httpx.AsyncClient, args, concurrency: int) -> dict:
+    """`args.requests` requêtes avec au plus `concurrency` en vol."""
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[dict] = []
+    request = ask_stream if args.stream else ask
+
+    async def one(index: int) -> None:
+        thread_id = f"load-{concurrency}-{index}" if args.unique_threads else "default"
+        async with semaphore:
+            try:
+                question = QUESTIONS[index % len(QUESTIONS)]
+                results.append(await request(client, question, thread_id))
+            except httpx.HTTPError as e:
+                results.append({"status": type(e).__name__, "latency_ms": None})
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    wall_seconds = time.perf_counter() - start
+
+    ok = [result for result in results if result["status"] == 200]
+    stages = sorted({stage for result in ok for stage in result.get("timings", {})})
+    return {
+        "requests": len(results),
+        "status": dict(Counter(str(result["status"]) for result in results)),
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": round(len(ok) / wall_seconds, 2) if wall_seconds else None,
+        "latency_ms": percentiles([result["latency_ms"] for result in ok]),
+        "stages_ms": {
+            stage: percentiles([
+                result["timings"][stage] for result in ok if stage in result["timings"]
+            ])
+            for stage in stages
+        },
+    }
+
+
+async def fetch_json(url: Optional[str]) -> Optional[dict]:
+    if not url:
+        return None
+    try:
+        async with httpx.AsyncClient(timeout=5) as client:
+            return (await client.get(url)).json()
+    except Exception as e:
+        print(f"⚠️ {url} indisponible: {e}")
+        return None
+
+
+async def main_async(args) -> dict:
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "url": args.url,
+            "endpoint": "/ask/stream" if args.stream else "/ask",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "levels": {},
+    }
+    max_connections = max(args.concurrency)
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    async with httpx.AsyncClient(
+        base_url=args.url, timeout=args.timeout, limits=limits
+    ) as client:
+        for concurrency in args.concurrency:
+            print(f"🔄 Concurrence {concurrency}...")
+            level = await run_level(client, args, concurrency)
+            mock_stats = await fetch_json(
+                f"{args.mock_url}/stats" if args.mock_url else None
+            )
+            if mock_stats:
+                level["llm_mock"] = mock_stats
+            results["levels"][str(concurrency)] = level
+            print(
+                f"   {level['status']} | p50 {level['latency_ms'].get('p50')} ms, "
+                f"p95 {level['latency_ms'].get('p95')} ms | "
+                f"{level['throughput_rps']} req/s"
+            )
+    results["server_stats"] = await fetch_json(f"{args.url}/stats")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge de /ask")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[1, 8, 32],
+    )
+    parser.add_argument(
+        "--requests", type=int, default=100, help="Requêtes par niveau de concurrence"
+    )
+    parser.add_argument("--stream", action="store_true", help="Utiliser /ask/stream")
+    parser.add_argument(
+        "--unique-threads", action="store_true", help="Un thread_id par requête"
+    )
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument(
+        "--mock-url", help="URL du mock Groq (statistiques de concurrence LLM)"
+    )
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    print(report)
+    if args.output:
+        args.output.write_text(report, encoding="utf-8")
+        print(f"💾 Résultats: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
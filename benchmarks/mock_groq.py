@@ -0,0 +1,294 @@
+"""
+Serveur local compatible Groq/OpenAI pour les tests de charge.
+
+Tester /ask en charge contre Groq consomme du quota et mesure surtout le
+réseau. Ce serveur implémente `POST /openai/v1/chat/completions` (chemin du
+SDK groq, aussi servi sous /v1 pour les clients OpenAI) et renvoie des
+réponses déterministes (benchmarks/common.py), avec ou sans streaming:
+
+- latence avant le premier token: fixe, uniforme ou log-normale;
+- débit de génération en tokens/s (streaming token par token);
+- taux d'erreurs 500 et de réponses 429 aléatoires;
+- limite de requêtes par minute (429 + Retry-After), comme l'API réelle.
+
+Usage:
+    python benchmarks/mock_groq.py --port 8100 --latency-ms 400 \
+        --tokens-per-second 250
+puis, côté API:
+    GROQ_BASE_URL=http://127.0.0.1:8100 GROQ_API_KEY=mock uvicorn src.server:app
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from benchmarks.common import respond  # noqa: E402 (après sys.path.insert)
+from src.context_packer import count_tokens  # noqa: E402
+
+MODELS = ["llama-3.1-8b-instant", "llama-3.3-70b-versatile", "llama-3-8b-instant"]
+
+
+class MockGroq:
+    """Comportement simulé de l'API (latences, erreurs, limite de débit)."""
+
+    def __init__(
+        self,
+        latency_ms: float = 400,
+        latency_distribution: str = "lognormal",
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 250,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        requests_per_minute: Optional[int] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            latency_ms: Latence médiane avant le premier token
+            latency_distribution: "fixed", "uniform" (±50%) ou "lognormal"
+            latency_sigma: Dispersion de la loi log-normale
+            tokens_per_second: Débit de génération
+            error_rate: Part des requêtes en erreur 500
+            rate_limit_rate: Part des requêtes refusées en 429 (hors limite RPM)
+            requests_per_minute: Limite de requêtes par minute (None: illimité)
+            seed: Graine du générateur aléatoire (reproductibilité)
+        """
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests_per_minute = requests_per_minute
+        self._random = random.Random(seed)
+        self._recent: deque = deque()
+
+        self.requests = 0
+        self.completions = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def first_token_delay(self) -> float:
+        """Latence avant le premier token (secondes), selon la distribution."""
+        if self.latency_distribution == "fixed":
+            delay = self.latency_ms
+        elif self.latency_distribution == "uniform":
+            delay = self._random.uniform(0.5 * self.latency_ms, 1.5 * self.latency_ms)
+        else:
+            delay = self.latency_ms * self._random.lognormvariate(0, self.latency_sigma)
+        return delay / 1000
+
+    def _over_rpm(self) -> bool:
+        if not self.requests_per_minute:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60:
+            self._recent.popleft()
+        if len(self._recent) >= self.requests_per_minute:
+            return True
+        self._recent.append(now)
+        return False
+
+    def rejection(self) -> Optional[JSONResponse]:
+        """Réponse d'erreur simulée pour la requête courante (None: accepter)."""
+        if self._over_rpm() or self._random.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {
+                    "message": "Rate limit reached (mock). Please try again later.",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }},
+                headers={"retry-after": "1"}
+            )
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {
+                    "message": "Internal server error (mock)",
+                    "type": "internal_server_error",
+                }}
+            )
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "completions": self.completions,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+        }
+
+
+def _usage(prompt: str, text: str) -> dict:
+    prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(text)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(mock: MockGroq) -> FastAPI:
+    app = FastAPI(title="Mock Groq")
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        mock.requests += 1
+
+        rejected = mock.rejection()
+        if rejected is not None:
+            return rejected
+
+        messages: List[dict] = body.get("messages", [])
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        text = respond(prompt)
+        model = body.get("model", MODELS[0])
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            return StreamingResponse(
+                stream_completion(mock, completion_id, created, model, prompt, text),
+                media_type="text/event-stream"
+            )
+
+        mock.in_flight += 1
+        mock.max_in_flight = max(mock.max_in_flight, mock.in_flight)
+        try:
+            generation_seconds = count_tokens(text) / mock.tokens_per_second
+            await asyncio.sleep(mock.first_token_delay() + generation_seconds)
+        finally:
+            mock.in_flight -= 1
+        mock.completions += 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(prompt, text),
+        }
+
+    async def list_models():
+        return {
+            "object": "list",
+            "data": [
+                {"id": model, "object": "model", "owned_by": "mock"} for model in MODELS
+            ],
+        }
+
+    async def get_stats():
+        return mock.stats()
+
+    for prefix in ("/openai/v1", "/v1"):
+        app.add_api_route(
+            f"{prefix}/chat/completions", chat_completions, methods=["POST"]
+        )
+        app.add_api_route(f"{prefix}/models", list_models, methods=["GET"])
+    app.add_api_route("/stats", get_stats, methods=["GET"])
+    return app
+
+
+async def stream_completion(
+    mock: MockGroq,
+    completion_id: str,
+    created: int,
+    model: str,
+    prompt: str,
+    text: str,
+):
+    """Flux SSE au format OpenAI: un chunk par mot, puis usage et [DONE]."""
+    def chunk(delta: dict, finish_reason: Optional[str] = None, **extra) -> str:
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            **extra,
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    mock.in_flight += 1
+    mock.max_in_flight = max(mock.max_in_flight, mock.in_flight)
+    try:
+        await asyncio.sleep(mock.first_token_delay())
+        yield chunk({"role": "assistant", "content": ""})
+        words = text.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == len(words) - 1 else word + " "
+            await asyncio.sleep(count_tokens(piece) / mock.tokens_per_second)
+            yield chunk({"content": piece})
+        # Groq renvoie l'usage dans le dernier chunk (champ x_groq)
+        usage = _usage(prompt, text)
+        yield chunk({}, "stop", x_groq={"id": completion_id, "usage": usage})
+        yield "data: [DONE]\n\n"
+        mock.completions += 1
+    finally:
+        mock.in_flight -= 1
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur mock compatible Groq/OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=400,
+        help="Latence médiane avant le premier token",
+    )
+    parser.add_argument(
+        "--latency-distribution",
+        choices=["fixed", "uniform", "lognormal"],
+        default="lognormal",
+    )
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--tokens-per-second", type=float, default=250)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--requests-per-minute", type=int)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    mock = MockGroq(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.latency_distribution,
+        latency_sigma=args.latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        requests_per_minute=args.requests_per_minute,
+        seed=args.seed,
+    )
+    print(f"🧪 Mock Groq sur http://{args.host}:{args.port} (GROQ_BASE_URL)")
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,364 @@
+"""
+Benchmark de bout en bout hors ligne (LLM simulé, vraie base Chroma).
+
+Les appels Groq (`router_llm`, `generation_llm`) sont remplacés par un modèle
+local déterministe dont la latence est configurable (délai avant le premier
+token + débit de tokens). Embeddings, Chroma, BM25, FlashRank, packer de
+contexte, graphe LangGraph et stack FastAPI sont les vrais composants.
+
+Deux niveaux, chacun à plusieurs niveaux de concurrence:
+- "agent": `agent_app.ainvoke` directement;
+- "http": POST /ask sur l'application FastAPI via un client en processus
+  (httpx.ASGITransport, middlewares compris). Le rate limiting par IP est
+  relevé: toutes les requêtes viennent du même client.
+
+Mesures: latence p50/p95/p99 par étape (durées de src/metrics.py; en-tête
+Server-Timing pour "http"), latence totale, débit (requêtes/s), RSS maximal.
+Les résultats JSON (avec le commit courant) se comparent entre commits avec
+`--baseline`.
+
+Prérequis: base Chroma construite (data/chroma_db_with_web), httpx pour le
+niveau "http" (`pip install httpx`).
+
+Usage:
+    python benchmarks/run_benchmark.py [--modes agent,http] [--concurrency 1,4,8]
+        [--requests 40] [--llm-latency-ms 300] [--llm-tokens-per-second 250]
+        [--output resultats.json] [--baseline precedent.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+# Le benchmark mesure le pipeline: pas de cache de réponses ni de regroupement
+# (questions répétées), pas de préchauffage en tâche de fond (fait ici avant
+# les mesures). Valeurs surchargeables par l'environnement.
+os.environ.setdefault("GROQ_API_KEY", "benchmark-offline")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+os.environ.setdefault("REQUEST_COALESCING", "false")
+os.environ.setdefault("WARM_UP_ON_STARTUP", "false")
+
+# Imports du projet après sys.path.insert et la configuration ci-dessus
+from benchmarks.common import (  # noqa: E402
+    generation_response,
+    git_commit,
+    parse_server_timing,
+    peak_rss_mb,
+    percentiles,
+    route_response,
+)
+from src.context_packer import count_tokens  # noqa: E402
+
+
+# =============================================================================
+# LLM SIMULÉ
+# =============================================================================
+
+class StubChatModel(BaseChatModel):
+    """Modèle de chat local déterministe, latence = premier token + tokens / débit."""
+
+    responder: Callable[[str], str]
+    latency_ms: float = 300
+    tokens_per_second: float = 250
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-stub"
+
+    @staticmethod
+    def _prompt(messages: List[BaseMessage]) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _duration(self, text: str) -> float:
+        return self.latency_ms / 1000 + count_tokens(text) / self.tokens_per_second
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = self.responder(self._prompt(messages))
+        time.sleep(self._duration(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        text = self.responder(self._prompt(messages))
+        await asyncio.sleep(self._duration(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        for word in self.responder(self._prompt(messages)).split(" "):
+            time.sleep(count_tokens(word) / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        for word in self.responder(self._prompt(messages)).split(" "):
+            await asyncio.sleep(count_tokens(word) / self.tokens_per_second)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def install_stub_llms(latency_ms: float, tokens_per_second: float) -> None:
+    """Remplace les clients Groq de l'agent par le modèle simulé."""
+    import src.agent as agent
+
+    agent.router_llm = StubChatModel(
+        responder=route_response,
+        latency_ms=latency_ms / 3,
+        tokens_per_second=tokens_per_second * 4,
+    )
+    agent.generation_llm = StubChatModel(
+        responder=generation_response,
+        latency_ms=latency_ms,
+        tokens_per_second=tokens_per_second,
+    )
+
+
+# =============================================================================
+# MESURES
+# =============================================================================
+
+def summarize(
+    samples: List[Dict[str, float]], wall_seconds: float, errors: int
+) -> dict:
+    """Latences par étape et débit d'une série de requêtes."""
+    stages = sorted({stage for sample in samples for stage in sample})
+    return {
+        "requests": len(samples) + errors,
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 2),
+        "throughput_rps": (
+            round(len(samples) / wall_seconds, 2) if wall_seconds else None
+        ),
+        "stages_ms": {
+            stage: percentiles([sample[stage] for sample in samples if stage in sample])
+            for stage in stages
+        },
+    }
+
+
+async def run_load(
+    request: Callable[[str], Any],
+    questions: List[str],
+    count: int,
+    concurrency: int,
+) -> dict:
+    """Envoie `count` requêtes avec au plus `concurrency` en vol."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: List[Dict[str, float]] = []
+    errors = 0
+
+    async def one(index: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            try:
+                samples.append(await request(questions[index % len(questions)]))
+            except Exception as e:
+                errors += 1
+                print(f"⚠️ Requête en erreur: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return summarize(samples, time.perf_counter() - start, errors)
+
+
+async def agent_request(question: str) -> Dict[str, float]:
+    """Une exécution du graphe (durées des étapes collectées dans le contexte)."""
+    from src.agent import agent_app
+    from src.metrics import start_request_timings
+
+    timings = start_request_timings()
+    start = time.perf_counter()
+    await agent_app.ainvoke({"question": question, "messages": []})
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return dict(timings)
+
+
+async def run_agent_mode(questions: List[str], args) -> dict:
+    results = {}
+    for concurrency in args.concurrency:
+        print(f"🔄 agent, concurrence {concurrency}...")
+        results[str(concurrency)] = await run_load(
+            agent_request, questions, args.requests, concurrency
+        )
+    return results
+
+
+async def run_http_mode(questions: List[str], args) -> dict:
+    import httpx
+    import src.security as security
+    from src.server import app
+
+    # Un seul client en processus: la limite par IP fausserait la mesure
+    security.RATE_LIMIT_REQUESTS = sys.maxsize
+
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://benchmark", timeout=None
+        ) as client:
+
+            async def http_request(question: str) -> Dict[str, float]:
+                response = await client.post("/ask", json={"question": question})
+                response.raise_for_status()
+                return parse_server_timing(response.headers.get("server-timing", ""))
+
+            for concurrency in args.concurrency:
+                print(f"🔄 http, concurrence {concurrency}...")
+                results[str(concurrency)] = await run_load(
+                    http_request, questions, args.requests, concurrency
+                )
+    return results
+
+
+# =============================================================================
+# RAPPORT
+# =============================================================================
+
+def compare(results: dict, baseline: dict) -> None:
+    """Écart de latence totale (p95) et de débit avec un résultat précédent."""
+    print(f"\n📊 Comparaison avec {baseline.get('meta', {}).get('commit')}:")
+    for mode in ("agent", "http"):
+        for concurrency, current in results.get(mode, {}).items():
+            previous = baseline.get(mode, {}).get(concurrency)
+            if not previous:
+                continue
+            p95 = current["stages_ms"].get("total", {}).get("p95")
+            p95_before = previous["stages_ms"].get("total", {}).get("p95")
+            rps, rps_before = current["throughput_rps"], previous["throughput_rps"]
+            if not (p95 and p95_before and rps and rps_before):
+                continue
+            print(
+                f"   {mode} x{concurrency}: p95 {p95_before} -> {p95} ms "
+                f"({(p95 / p95_before - 1) * 100:+.1f}%), "
+                f"débit {rps_before} -> {rps} req/s "
+                f"({(rps / rps_before - 1) * 100:+.1f}%)"
+            )
+
+
+async def main_async(args) -> dict:
+    install_stub_llms(args.llm_latency_ms, args.llm_tokens_per_second)
+
+    from src.agent import CITIZEN_QUESTIONS, warm_up
+
+    rss_before = peak_rss_mb()
+    print("🔥 Préchauffage des modèles...")
+    warm_up_steps = await asyncio.to_thread(warm_up)
+
+    questions = list(CITIZEN_QUESTIONS)
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+        },
+        "warm_up": warm_up_steps,
+        "rss_before_load_mb": round(rss_before, 1),
+        "rss_after_warm_up_mb": round(peak_rss_mb(), 1),
+    }
+
+    # Requêtes non mesurées: premiers appels (allocations, caches internes)
+    for question in questions[:args.warmup_requests]:
+        await agent_request(question)
+
+    if "agent" in args.modes:
+        results["agent"] = await run_agent_mode(questions, args)
+    if "http" in args.modes:
+        results["http"] = await run_http_mode(questions, args)
+
+    results["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark de bout en bout (LLM simulé)"
+    )
+    parser.add_argument(
+        "--modes", type=lambda value: value.split(","), default=["agent", "http"]
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=lambda value: [int(v) for v in value.split(",")],
+        default=[1, 4, 8],
+    )
+    parser.add_argument(
+        "--requests", type=int, default=40, help="Requêtes par niveau de concurrence"
+    )
+    parser.add_argument("--warmup-requests", type=int, default=3)
+    parser.add_argument(
+        "--llm-latency-ms",
+        type=float,
+        default=300,
+        help="Délai avant le premier token",
+    )
+    parser.add_argument("--llm-tokens-per-second", type=float, default=250)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument(
+        "--baseline", type=Path, help="Résultats JSON précédents à comparer"
+    )
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    report = json.dumps(results, indent=2, ensure_ascii=False)
+    print(report)
+    if args.output:
+        args.output.write_text(report, encoding="utf-8")
+        print(f"💾 Résultats: {args.output}")
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ import SuggestedQuestions from '@/components/SuggestedQuestions';
 import EmptyState from '@/components/EmptyState';
 import FormattedResponse from '@/components/FormattedResponse';
 import Header from '@/components/Header';
-import { askQuestion, ApiError } from '@/lib/api';
+import { askQuestion, fetchSuggestedQuestions, ApiError } from '@/lib/api';
 import { debounce } from '@/lib/utils/debounce';
 import { CreditGauge } from '@/components/credits/CreditGauge';
 import { useCredits } from '@/lib/hooks/useCredits';
@@ -419,6 +419,19 @@ export default function Home() {
         setGlobalSuggestedQuestions(data.suggested_questions);
       }
 
+      // Questions suggérées générées en arrière-plan côté serveur
+      if (data.response_id && assistantMessage.suggestedQuestions?.length === 0) {
+        fetchSuggestedQuestions(data.response_id).then((questions) => {
+          if (questions.length === 0) return;
+          setMessages((prev) =>
+            prev.map((msg) =>
+              msg === assistantMessage ? { ...msg, suggestedQuestions: questions } : msg
+            )
+          );
+          setGlobalSuggestedQuestions(questions);
+        });
+      }
+
       setMessages((prev) => {
         const updated = [...prev, assistantMessage];
         
@@ -10,8 +10,16 @@ export interface ApiResponse {
   reponse: string;
   sources: string[];
   suggested_questions?: string[];
+  response_id?: string | null;
+  thread_token?: string | null;
 }
 
+/**
+ * Jetons de thread émis par le serveur (historique de conversation), par session.
+ * Le serveur ne s'appuie jamais sur le threadId du client pour retrouver l'historique.
+ */
+const threadTokens = new Map<string, string>();
+
 export interface ApiError {
   detail: string;
   status?: number;
@@ -149,6 +157,7 @@ export async function askQuestion(
         body: JSON.stringify({
           question: question.trim(),
           thread_id: threadId || 'default',
+          thread_token: threadTokens.get(threadId) || null,
         }),
       }
     );
@@ -186,12 +195,17 @@ export async function askQuestion(
       throw new Error('Réponse invalide de l\'API');
     }
 
+    if (data.thread_token) {
+      threadTokens.set(threadId, data.thread_token);
+    }
+
     // Ne pas sanitizer les réponses (React les sécurise automatiquement avec textContent)
     // Le backend ne les encode plus en HTML, donc pas besoin de double encodage
     return {
       reponse: data.reponse,
       sources: data.sources || [],
       suggested_questions: data.suggested_questions || [],
+      response_id: data.response_id || null,
     };
   } catch (error) {
     if (error instanceof Error) {
@@ -202,6 +216,35 @@ export async function askQuestion(
   }
 }
 
+/**
+ * Récupère les questions suggérées générées en arrière-plan pour une réponse.
+ * Le serveur attend la fin de la génération (long polling, `wait` secondes max).
+ */
+export async function fetchSuggestedQuestions(
+  responseId: string,
+  wait: number = 20
+): Promise<string[]> {
+  if (!/^[a-f0-9]+$/.test(responseId)) {
+    return [];
+  }
+
+  try {
+    const response = await fetchWithTimeout(
+      `${API_URL}/suggested-questions/${responseId}?wait=${wait}`,
+      { method: 'GET' },
+      (wait + 5) * 1000
+    );
+    if (!response.ok) {
+      return [];
+    }
+    const data = await response.json();
+    return Array.isArray(data.suggested_questions) ? data.suggested_questions : [];
+  } catch {
+    // Les suggestions sont facultatives: ignorer les erreurs
+    return [];
+  }
+}
+
 /**
  * Vérifie si l'API est accessible.
  */
@@ -4,24 +4,38 @@ Version refactorisée pour une cohérence absolue entre sources et réponses.
 """
 
 from dotenv import load_dotenv
-from typing import List, TypedDict, Optional
+from typing import List, TypedDict, Optional, Tuple
 from pathlib import Path
 import os
+import re
 import json
 import random
+import asyncio
 import gc
 import functools
+import threading
 import time
 
 from langchain_groq import ChatGroq
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.documents import Document
 from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 
 from langgraph.graph import StateGraph, END
 
+from src.article_index import load_article_index
+from src.classifier import CentroidClassifier, LEGAL_EXAMPLES
+from src.concurrency import InstrumentedExecutor
+from src.context_packer import count_tokens, pack_context
+from src.embeddings import CachedEmbeddings, build_embedding_model, embedding_namespace
+from src.lexical_index import HybridRetriever, load_lexical_index
+from src.metrics import record_event, stage_timer
+from src.model_server import ModelServerClient, RemoteEmbeddings, RemoteReranker
+from src.question_bank import QuestionBank, load_question_bank
+from src.reranking import RerankBatcher
+
 load_dotenv()
 
 # =============================================================================
@@ -32,9 +46,75 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 CHROMA_DB_PATH = BASE_DIR / "data" / "chroma_db_with_web"  # Base avec PDFs uniquement (temporaire)
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+# API compatible Groq/OpenAI alternative (ex: benchmarks/mock_groq.py pour les tests de charge)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY non définie")
 
+# Recherche hybride BM25 + vectorielle (fusion RRF) si l'index lexical existe
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "true").lower() == "true"
+
+# Cache des embeddings de requêtes (mémoire LRU + niveau disque optionnel)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")  # ex: data/cache/query_embeddings.sqlite
+
+# Serveur de modèles partagé (python -m src.model_server): si défini, les
+# embeddings et le reranking sont délégués à ce processus via socket Unix
+MODEL_SERVER_SOCKET = os.getenv("MODEL_SERVER_SOCKET")
+
+# Pools de threads dédiés: calcul des modèles (CPU) et appels réseau bloquants (I/O)
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))  # Pool CPU: embeddings, Chroma, reranking
+IO_WORKERS = int(os.getenv("IO_WORKERS", "16"))  # Pool I/O: appels LLM synchrones, serveur de modèles
+
+# Micro-batching du reranker entre requêtes concurrentes
+RERANK_BATCHING = os.getenv("RERANK_BATCHING", "true").lower() == "true"
+RERANK_MAX_BATCH = int(os.getenv("RERANK_MAX_BATCH", "64"))  # Paires (question, passage) par lot
+RERANK_MAX_WAIT_MS = float(os.getenv("RERANK_MAX_WAIT_MS", "5"))  # Attente maximale pour compléter un lot
+
+# Classification locale par centroïdes avant le LLM de routage: JURIDIQUE au-dessus
+# de BAND_HIGH, sinon escalade au LLM. Décision AUTRE locale sous BAND_LOW,
+# seulement si ce seuil est fixé (désactivée par défaut)
+LOCAL_CLASSIFIER = os.getenv("LOCAL_CLASSIFIER", "true").lower() == "true"
+CLASSIFIER_BAND_LOW = float(os.getenv("CLASSIFIER_BAND_LOW")) if os.getenv("CLASSIFIER_BAND_LOW") else None
+CLASSIFIER_BAND_HIGH = float(os.getenv("CLASSIFIER_BAND_HIGH", "0.05"))
+
+# Recherche spéculative: quand la classification passe par le LLM de routage,
+# la recherche démarre en parallèle (résultat jeté si la question est hors-sujet)
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "true").lower() == "true"
+
+# Contexte de génération: documents gardés après reranking, puis assemblés
+# sous un budget de tokens pour l'ensemble du prompt (latence et coût Groq prévisibles)
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", "5"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+
+# Historique injecté dans le prompt de génération (derniers messages, tronqués)
+HISTORY_MAX_MESSAGES = 4
+HISTORY_USER_CHARS = 100
+HISTORY_ASSISTANT_CHARS = 150
+
+# Questions suggérées tirées de la banque construite à l'ingestion (src/question_bank.py):
+# aucun appel LLM quand des questions sont rattachées aux chunks de la réponse
+QUESTION_BANK_SUGGESTIONS = os.getenv("QUESTION_BANK_SUGGESTIONS", "true").lower() == "true"
+QUESTION_BANK_DUPLICATE_THRESHOLD = float(os.getenv("QUESTION_BANK_DUPLICATE_THRESHOLD", "0.9"))
+
+# Questions d'accueil: thèmes tirés au hasard à chaque génération
+CORPUS_SAMPLE_QUERIES = int(os.getenv("CORPUS_SAMPLE_QUERIES", "4"))  # Thèmes par tirage
+CORPUS_SAMPLE_DOCUMENTS = int(os.getenv("CORPUS_SAMPLE_DOCUMENTS", "8"))  # Documents envoyés au LLM
+QUESTIONS_TEMPERATURE = float(os.getenv("QUESTIONS_TEMPERATURE", "0.8"))
+
+# Échéance par requête (champ `deadline` de l'état, horloge time.monotonic):
+# les étapes optionnelles sont sautées si le budget restant passe sous ces
+# seuils (secondes) et les appels LLM sont annulés à l'échéance
+DEADLINE_RERANK_MIN_SECONDS = float(os.getenv("DEADLINE_RERANK_MIN_SECONDS", "10"))
+DEADLINE_CLASSIFIER_MIN_SECONDS = float(os.getenv("DEADLINE_CLASSIFIER_MIN_SECONDS", "15"))
+DEADLINE_SUGGESTIONS_MIN_SECONDS = float(os.getenv("DEADLINE_SUGGESTIONS_MIN_SECONDS", "10"))
+DEADLINE_GENERATION_MIN_SECONDS = float(os.getenv("DEADLINE_GENERATION_MIN_SECONDS", "2"))
+DEADLINE_MARGIN_SECONDS = 1.0  # Marge laissée après l'appel LLM pour construire la réponse
+
+# Tag posé sur l'appel LLM qui produit la réponse finale, pour que le streaming
+# (/ask/stream) ne relaie que ces tokens et pas ceux des appels annexes
+ANSWER_STREAM_TAG = "answer_stream"
+
 # Seuil de pertinence minimum pour les documents (après reranking)
 # Note: FlashRank ne retourne pas toujours relevance_score, donc on utilise directement les top rerankés
 RELEVANCE_THRESHOLD = 0.0  # Désactivé car FlashRank gère déjà le tri par pertinence
@@ -47,25 +127,55 @@ _embedding_function = None
 _db = None
 _retriever = None
 _reranker = None
+_rerank_batcher = None
+_article_index = None
+_question_classifier = None
+_question_bank = None
+
+# Verrou réentrant des initialisations paresseuses: des premières requêtes
+# concurrentes ne chargent pas deux fois les modèles (get_db appelle
+# get_embedding_function, get_retriever appelle get_db, ...)
+_init_lock = threading.RLock()
+_model_server_client = None
+
+cpu_executor = InstrumentedExecutor("cpu", MAX_WORKERS)
+io_executor = InstrumentedExecutor("io", IO_WORKERS)
+# Avec le serveur de modèles, embeddings et reranking sont des appels socket
+model_executor = io_executor if MODEL_SERVER_SOCKET else cpu_executor
+
+
+def get_model_server_client() -> Optional[ModelServerClient]:
+    """Client du serveur de modèles (None si MODEL_SERVER_SOCKET n'est pas défini)."""
+    global _model_server_client
+    if MODEL_SERVER_SOCKET and _model_server_client is None:
+        _model_server_client = ModelServerClient(MODEL_SERVER_SOCKET)
+    return _model_server_client
 
 
 def get_embedding_function():
-    """Lazy loading du modèle d'embeddings (optimisé)."""
+    """Lazy loading du modèle d'embeddings (backend EMBEDDING_BACKEND, requêtes mises en cache)."""
     global _embedding_function
     if _embedding_function is None:
-        _embedding_function = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-            model_kwargs={'device': 'cpu'},
-            encode_kwargs={
-                'normalize_embeddings': True,
-                'batch_size': 32
-            }
-        )
-        # Forcer le garbage collection après chargement
-        gc.collect()
+        with _init_lock:
+            if _embedding_function is None:
+                client = get_model_server_client()
+                model = RemoteEmbeddings(client) if client else build_embedding_model()
+                _embedding_function = CachedEmbeddings(
+                    model,
+                    max_entries=EMBEDDING_CACHE_SIZE,
+                    disk_path=Path(EMBEDDING_CACHE_PATH) if EMBEDDING_CACHE_PATH else None,
+                    namespace=embedding_namespace(model)
+                )
+                # Forcer le garbage collection après chargement
+                gc.collect()
     return _embedding_function
 
 
+def embed_question(question: str) -> List[float]:
+    """Calcule l'embedding (normalisé) d'une question."""
+    return get_embedding_function().embed_query(question)
+
+
 def get_db():
     """Lazy loading de ChromaDB."""
     global _db
@@ -74,11 +184,13 @@ def get_db():
             print(f"⚠️ Base Chroma introuvable: {CHROMA_DB_PATH}")
             return None
         
-        _db = Chroma(
-            persist_directory=str(CHROMA_DB_PATH),
-            embedding_function=get_embedding_function(),
-            collection_name="juridiction_senegal"
-        )
+        with _init_lock:
+            if _db is None:
+                _db = Chroma(
+                    persist_directory=str(CHROMA_DB_PATH),
+                    embedding_function=get_embedding_function(),
+                    collection_name="juridiction_senegal"
+                )
     return _db
 
 
@@ -89,35 +201,145 @@ def get_retriever():
         db = get_db()
         if db is None:
             return None
-        _retriever = db.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 10}  # Récupérer plus de docs pour meilleur reranking
-        )
+        
+        with _init_lock:
+            if _retriever is None:
+                lexical_index = load_lexical_index(CHROMA_DB_PATH) if HYBRID_RETRIEVAL else None
+                if lexical_index is not None:
+                    # Fusion RRF des résultats BM25 et Chroma avant le reranking FlashRank
+                    _retriever = HybridRetriever(
+                        vectorstore=db,
+                        lexical_index=lexical_index,
+                        k=10,
+                        fetch_k=10
+                    )
+                else:
+                    _retriever = db.as_retriever(
+                        search_type="similarity",
+                        search_kwargs={"k": 10}  # Récupérer plus de docs pour meilleur reranking
+                    )
     return _retriever
 
 
+def retrieve_many(queries: List[str], k: int = 10) -> List[List[Document]]:
+    """
+    Recherche groupée: embeddings calculés en un seul lot et une seule requête
+    multi-vecteurs envoyée à la collection Chroma (puis fusion BM25 si activée).
+
+    Args:
+        queries: Requêtes de recherche
+        k: Nombre de documents par requête
+
+    Returns:
+        Une liste de documents par requête (même ordre que `queries`)
+    """
+    if not queries:
+        return []
+    
+    db = get_db()
+    embeddings = get_embedding_function().embed_queries(queries)
+    results = db._collection.query(
+        query_embeddings=embeddings,
+        n_results=k,
+        include=["documents", "metadatas"]
+    )
+    
+    dense_results = [
+        [
+            Document(id=doc_id, page_content=text or "", metadata=metadata or {})
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+    
+    current_retriever = get_retriever()
+    if isinstance(current_retriever, HybridRetriever):
+        return [docs[:k] for docs in current_retriever.fuse_many(queries, dense_results)]
+    return dense_results
+
+
 def get_reranker():
     """Lazy loading du reranker FlashRank (optimisé pour performance)."""
     global _reranker
     if _reranker is None:
-        try:
-            from langchain_community.document_compressors import FlashrankRerank
-            _reranker = FlashrankRerank(
-                top_n=3,  # Réduit à 3 pour plus de rapidité
-                model="ms-marco-MiniLM-L-12-v2"
-            )
-        except Exception as e:
-            _reranker = False  # Marquer comme non disponible
+        with _init_lock:
+            if _reranker is None:
+                try:
+                    client = get_model_server_client()
+                    if client:
+                        # Le serveur de modèles regroupe déjà les requêtes de tous les workers
+                        _reranker = RemoteReranker(client, top_n=RERANK_TOP_N)
+                        return _reranker
+                    from langchain_community.document_compressors import FlashrankRerank
+                    _reranker = FlashrankRerank(
+                        top_n=RERANK_TOP_N,  # Candidats pour le packer de contexte
+                        model="ms-marco-MiniLM-L-12-v2"
+                    )
+                except Exception as e:
+                    _reranker = False  # Marquer comme non disponible
     return _reranker if _reranker else None
 
 
-# Initialisation au démarrage
-try:
-    db = get_db()
-    retriever = get_retriever()
-except Exception as e:
-    db = None
-    retriever = None
+def get_rerank_batcher():
+    """Lazy loading du batcher de reranking (None si désactivé ou reranker absent)."""
+    global _rerank_batcher
+    if _rerank_batcher is None:
+        reranker = get_reranker()
+        if not RERANK_BATCHING or reranker is None or isinstance(reranker, RemoteReranker):
+            return None
+        with _init_lock:
+            if _rerank_batcher is None:
+                _rerank_batcher = RerankBatcher(
+                    reranker,
+                    max_batch_size=RERANK_MAX_BATCH,
+                    max_wait_ms=RERANK_MAX_WAIT_MS
+                )
+    return _rerank_batcher
+
+
+def model_stats() -> dict:
+    """
+    Statistiques du cache d'embeddings et du batcher de reranking de ce
+    processus (composants non encore chargés omis: aucun chargement forcé).
+    """
+    stats = {}
+    if _embedding_function is not None:
+        stats["embedding_cache"] = _embedding_function.stats()
+    if _rerank_batcher:
+        stats["rerank_batcher"] = _rerank_batcher.stats()
+    return stats
+
+
+def rerank_documents(docs: List[Document], question: str) -> List[Document]:
+    """Reranking FlashRank, groupé avec les requêtes concurrentes si activé."""
+    batcher = get_rerank_batcher()
+    if batcher is not None:
+        return batcher.rerank(question, docs)
+    return get_reranker().compress_documents(docs, question)
+
+
+def get_article_index():
+    """Lazy loading de l'index direct des articles (None si absent)."""
+    global _article_index
+    if _article_index is None:
+        with _init_lock:
+            if _article_index is None:
+                _article_index = load_article_index(CHROMA_DB_PATH) or False
+    return _article_index if _article_index else None
+
+
+def get_question_bank() -> Optional[QuestionBank]:
+    """Lazy loading de la banque de questions (None si désactivée ou non construite)."""
+    global _question_bank
+    if _question_bank is None:
+        db = get_db() if QUESTION_BANK_SUGGESTIONS else None
+        if db is None:
+            return None
+        with _init_lock:
+            if _question_bank is None:
+                _question_bank = load_question_bank(db._client, QUESTION_BANK_DUPLICATE_THRESHOLD) or False
+    return _question_bank if _question_bank else None
+
 
 # LLMs
 # Modèle pour le routage (rapide, peu de tokens) - utiliser modèle plus rapide
@@ -125,7 +347,8 @@ router_llm = ChatGroq(
     model_name="llama-3.1-8b-instant",  # Modèle rapide pour classification
     temperature=0,
     max_tokens=20,  # Réduit pour plus de rapidité
-    timeout=15  # Timeout réduit
+    timeout=15,  # Timeout réduit
+    base_url=GROQ_BASE_URL
 )
 
 # Modèle pour la génération (optimisé pour vitesse)
@@ -133,7 +356,19 @@ generation_llm = ChatGroq(
     model_name="llama-3.3-70b-versatile",  # Modèle actuel Groq
     temperature=0,
     max_tokens=1500,  # Réduit pour des réponses plus rapides
-    timeout=45  # Timeout réduit
+    timeout=45,  # Timeout réduit
+    base_url=GROQ_BASE_URL
+)
+
+
+# Modèle pour les questions d'accueil: même modèle, échantillonnage pour varier
+# les questions d'un tirage à l'autre (les réponses restent à temperature=0)
+questions_llm = ChatGroq(
+    model_name="llama-3.3-70b-versatile",
+    temperature=QUESTIONS_TEMPERATURE,
+    max_tokens=400,
+    timeout=45,
+    base_url=GROQ_BASE_URL
 )
 
 
@@ -149,6 +384,10 @@ class AgentState(TypedDict):
     sources: List[str]
     messages: List
     suggested_questions: List[str]
+    prompt_tokens: int  # Tokens du prompt de génération (contexte sous budget)
+    deadline: float  # Échéance de la requête (time.monotonic), absente = pas de limite
+    degraded: List[str]  # Étapes sautées ou interrompues faute de temps
+    prefetched_documents: Optional[List[dict]]  # Recherche spéculative (pendant la classification)
 
 
 # =============================================================================
@@ -207,8 +446,12 @@ def document_to_source(doc: Document, idx: int) -> dict:
     
     return {
         "id": f"source_{idx}",
+        # Id Chroma du chunk (questions de la banque rattachées à ce chunk)
+        "chunk_id": doc.id,
         "title": source_name,
         "content": content,
+        # Texte intégral pour le packer de contexte (retiré des sources renvoyées)
+        "text": doc.page_content or "",
         "article": metadata.get('article', ''),
         "breadcrumb": metadata.get('breadcrumb', ''),
         "page": metadata.get('page'),
@@ -256,83 +499,7 @@ CITIZEN_QUESTIONS = [
 ]
 
 
-def generate_initial_questions() -> List[str]:
-    """
-    Génère 4-5 questions suggérées à l'accueil basées sur le contenu réel de la base de données.
-    Récupère des documents variés et utilise le LLM pour générer des questions contextualisées.
-    """
-    try:
-        db = get_db()
-        if not db or not retriever:
-            # Fallback sur questions statiques si pas d'accès à la base
-            domain_questions = {
-                "travail": [
-                    "Combien de jours de congé ai-je droit par an ?",
-                    "Quels sont mes droits si je suis licencié ?",
-                ],
-                "constitution": [
-                    "Qui peut être président du Sénégal ?",
-                    "Quels sont mes droits fondamentaux ?",
-                ],
-                "syndicats": [
-                    "Puis-je faire grève au Sénégal ?",
-                ],
-                "droits": [
-                    "Peut-on me discriminer à l'embauche ?",
-                ],
-                "penal": [
-                    "Quelles sont les peines pour violence au Sénégal ?",
-                ],
-            }
-            selected = []
-            for domain, questions in domain_questions.items():
-                selected.extend(random.sample(questions, 1))
-            return selected[:5]
-        
-        # Récupérer des documents variés avec des requêtes thématiques
-        search_queries = [
-            "droit travail contrat employeur",
-            "constitution président gouvernement droits",
-            "syndicat grève représentation",
-            "discrimination égalité protection",
-            "pénal infraction sanction",
-            "protection sociale retraite"
-        ]
-        
-        all_docs = []
-        for query in search_queries:
-            try:
-                docs = retriever.invoke(query)
-                if docs:
-                    all_docs.extend(docs[:2])
-            except:
-                pass
-        
-        if not all_docs:
-            # Fallback sur questions statiques
-            return [
-                "Combien de jours de congé ai-je droit par an ?",
-                "Qui peut être président du Sénégal ?",
-                "Puis-je faire grève au Sénégal ?",
-            ]
-        
-        # Sélectionner les 10 documents uniques les plus pertinents
-        unique_docs = {}
-        for doc in all_docs[:20]:
-            content_hash = doc.page_content[:100] if doc.page_content else ""
-            if content_hash and content_hash not in unique_docs:
-                unique_docs[content_hash] = doc
-        
-        sample_docs = list(unique_docs.values())[:10]
-        
-        # Préparer le contexte pour le LLM
-        docs_context = "\n".join([
-            f"- {doc.metadata.get('source_name', 'Document')}: {doc.page_content[:250]}..."
-            for doc in sample_docs
-        ])
-        
-        # Générer les questions avec le LLM basées sur les documents
-        prompt = ChatPromptTemplate.from_template("""Tu es un assistant juridique sénégalais expert. Basé sur les documents juridiques réels suivants,
+INITIAL_QUESTIONS_PROMPT = ChatPromptTemplate.from_template("""Tu es un assistant juridique sénégalais expert. Basé sur les documents juridiques réels suivants,
 génère 4 à 5 questions pratiques et variées que les citoyens sénégalais pourraient se poser.
 
 Les questions DOIVENT:
@@ -351,62 +518,91 @@ Question 1?
 Question 2?
 Question 3?
 Question 4?""")
-        
-        chain = prompt | generation_llm
-        result = chain.invoke({"docs_context": docs_context})
-        
-        # Extraire et parser les questions
-        suggested = result.content.strip().split('\n')
-        suggested = [
-            q.strip().rstrip('?').strip() + '?' 
-            for q in suggested 
-            if q.strip() and len(q.strip()) > 10 and '?' in q
-        ]
-        
-        # Mélanger les questions pour plus de variété à chaque appel
-        random.shuffle(suggested)
-        
-        # Retourner 4-5 questions variées basées sur les documents
-        final_questions = suggested[:5] if len(suggested) >= 4 else suggested
-        
-        if final_questions:
-            return final_questions
-        
-        # Fallback si pas de questions générées
-        return [
-            "Quels sont mes droits au travail ?",
-            "Qui peut être président du Sénégal ?",
-            "Puis-je faire grève ?",
-        ]
-    
-    except Exception as e:
-        print(f"⚠️ Erreur génération questions initiales: {str(e)}")
-        # Fallback robuste
-        return [
-            "Quels sont mes droits au travail ?",
-            "Qui peut être président du Sénégal ?",
-            "Puis-je faire grève ?",
-        ]
 
 
-def generate_suggested_questions(question: str, sources: List[dict], answer: str) -> List[str]:
+CORPUS_QUERIES = [
+    "droit travail contrat employeur",
+    "licenciement préavis indemnité",
+    "congés payés durée du travail",
+    "salaire rémunération heures supplémentaires",
+    "constitution président gouvernement droits",
+    "assemblée nationale élections",
+    "libertés fondamentales citoyen",
+    "syndicat grève représentation",
+    "discrimination égalité protection",
+    "pénal infraction sanction",
+    "procédure plainte tribunal",
+    "protection sociale retraite",
+    "accident du travail maladie professionnelle",
+    "maternité femme enceinte",
+]
+
+
+def sample_corpus_documents() -> List[Document]:
     """
-    Génère 3 questions suggérées dynamiquement basées sur le contenu réel des documents.
-    Utilise le LLM pour créer des questions pertinentes au contexte.
+    Documents variés de la base, tirés au hasard à chaque appel.
+
+    Un sous-ensemble aléatoire de `CORPUS_QUERIES` est recherché (un seul lot
+    d'embeddings et une seule requête Chroma), puis des documents sont tirés
+    parmi les meilleurs résultats de chaque thème: deux tirages ne donnent
+    pas les mêmes documents, ni donc les mêmes questions.
+
+    Travail CPU (embeddings, Chroma): à exécuter dans le pool des modèles.
+    Exception en cas d'erreur de recherche.
     """
-    try:
-        # Si pas de sources ou réponse vide, retourner liste vide
-        if not sources or not answer or "Je ne dispose pas" in answer:
-            return []
-        
-        # Préparer le contexte des sources pour le LLM
-        sources_context = "\n".join([
-            f"- {s.get('source', 'Document')}: {s.get('content', '')[:300]}"
-            for s in sources[:3]
-        ])
-        
-        # Prompt pour générer des questions basées sur le contenu réel
-        prompt = ChatPromptTemplate.from_template("""Tu es un assistant juridique sénégalais expert. Basé sur les documents suivants et la réponse fournie, 
+    search_queries = random.sample(CORPUS_QUERIES, min(CORPUS_SAMPLE_QUERIES, len(CORPUS_QUERIES)))
+
+    candidates = []
+    for docs in retrieve_many(search_queries, k=10):
+        top = docs[:5]
+        candidates.extend(random.sample(top, min(2, len(top))))
+
+    # Dédupliquer sur le début du contenu
+    unique_docs = {}
+    for doc in candidates:
+        content_hash = doc.page_content[:100] if doc.page_content else ""
+        if content_hash and content_hash not in unique_docs:
+            unique_docs[content_hash] = doc
+
+    docs = list(unique_docs.values())
+    random.shuffle(docs)
+    return docs[:CORPUS_SAMPLE_DOCUMENTS]
+
+
+def generate_questions_from_documents(sample_docs: List[Document]) -> List[str]:
+    """
+    Génère 4-5 questions citoyennes à partir de documents (appel LLM bloquant).
+
+    Liste vide sans documents, exception en cas d'erreur du LLM.
+    """
+    if not sample_docs:
+        return []
+    
+    # Préparer le contexte pour le LLM
+    docs_context = "\n".join([
+        f"- {doc.metadata.get('source_name', 'Document')}: {doc.page_content[:250]}..."
+        for doc in sample_docs
+    ])
+    
+    chain = INITIAL_QUESTIONS_PROMPT | questions_llm
+    result = chain.invoke({"docs_context": docs_context})
+    
+    # Extraire et parser les questions
+    suggested = result.content.strip().split('\n')
+    suggested = [
+        q.strip().rstrip('?').strip() + '?' 
+        for q in suggested 
+        if q.strip() and len(q.strip()) > 10 and '?' in q
+    ]
+    
+    # Mélanger les questions pour plus de variété à chaque appel
+    random.shuffle(suggested)
+    
+    # Retourner 4-5 questions variées basées sur les documents
+    return suggested[:5] if len(suggested) >= 4 else suggested
+
+
+SUGGESTIONS_PROMPT = ChatPromptTemplate.from_template("""Tu es un assistant juridique sénégalais expert. Basé sur les documents suivants et la réponse fournie, 
 génère exactement 3 questions suggérées pertinentes que l'utilisateur pourrait poser ensuite.
 
 Les questions doivent:
@@ -426,30 +622,85 @@ Génère exactement 3 questions, une par ligne, sans numérotation ni tirets. Fo
 Question 1?
 Question 2?
 Question 3?""")
+
+
+def _should_suggest(sources: List[dict], answer: str) -> bool:
+    """Pas de suggestions sans sources ou si l'agent n'a pas trouvé l'information."""
+    return bool(sources) and bool(answer) and "Je ne dispose pas" not in answer
+
+
+def _build_suggestion_inputs(question: str, sources: List[dict], answer: str) -> dict:
+    """Prépare les variables du prompt de suggestions."""
+    sources_context = "\n".join([
+        f"- {s.get('source', 'Document')}: {s.get('content', '')[:300]}"
+        for s in sources[:3]
+    ])
+    return {
+        "question": question,
+        "sources_context": sources_context,
+        "answer": answer
+    }
+
+
+def _parse_suggestions(content: str) -> List[str]:
+    """Extrait les 3 premières questions valides de la sortie du LLM."""
+    suggested = content.strip().split('\n')
+    suggested = [q.strip().rstrip('?').strip() + '?' for q in suggested if q.strip()]
+    return suggested[:3]
+
+
+def _question_bank_suggestions(question: str, sources: List[dict]) -> List[str]:
+    """Questions de la banque rattachées aux chunks de la réponse (liste vide si aucune)."""
+    chunk_ids = [source.get("chunk_id") for source in sources if source.get("chunk_id")]
+    if not chunk_ids:
+        return []
+    try:
+        # Banque illisible: liste vide, la génération LLM prend le relais
+        bank = get_question_bank()
+        if bank is None:
+            return []
+        with stage_timer("question_bank"):
+            return bank.suggest(embed_question(question), chunk_ids, count=3)
+    except Exception as e:
+        print(f"⚠️ Banque de questions indisponible: {str(e)}")
+        return []
+
+
+def _fallback_suggestions() -> List[str]:
+    """Questions statiques utilisées quand la génération échoue."""
+    if CITIZEN_QUESTIONS:
+        shuffled = CITIZEN_QUESTIONS.copy()
+        random.shuffle(shuffled)
+        return shuffled[:3]
+    return []
+
+
+async def agenerate_suggested_questions(question: str, sources: List[dict], answer: str) -> List[str]:
+    """
+    Génère 3 questions suggérées basées sur le contenu réel des documents.
+    Les questions de la banque (ingestion) rattachées aux documents sont
+    utilisées en priorité; le LLM n'est appelé qu'à défaut. Questions
+    statiques en cas d'erreur.
+    """
+    try:
+        if not _should_suggest(sources, answer):
+            return []
         
-        # Générer les questions avec le LLM
-        chain = prompt | generation_llm
-        result = chain.invoke({
-            "question": question,
-            "sources_context": sources_context,
-            "answer": answer
-        })
-        
-        # Extraire et parser les questions
-        suggested = result.content.strip().split('\n')
-        suggested = [q.strip().rstrip('?').strip() + '?' for q in suggested if q.strip()]
+        # Recherche locale (embedding + Chroma): pool des modèles
+        questions = await model_executor.run(_question_bank_suggestions, question, sources)
+        if questions:
+            record_event("suggestions_question_bank")
+            return questions
         
-        # Retourner les 3 premières questions valides
-        return suggested[:3]
+        chain = SUGGESTIONS_PROMPT | generation_llm
+        with stage_timer("llm_suggestions"):
+            result = await chain.ainvoke(_build_suggestion_inputs(question, sources, answer))
+        return _parse_suggestions(result.content)
     
     except Exception as e:
-        # En cas d'erreur, fallback sur la liste statique
         print(f"⚠️ Erreur génération questions: {str(e)}")
-        if CITIZEN_QUESTIONS:
-            shuffled = CITIZEN_QUESTIONS.copy()
-            random.shuffle(shuffled)
-            return shuffled[:3]
-        return []
+        record_event("suggestions_fallback")
+        return _fallback_suggestions()
 
 
 # =============================================================================
@@ -465,260 +716,640 @@ JURIDIQUE_KEYWORDS = [
 
 
 # =============================================================================
-# NŒUDS DU GRAPHE
+# PROMPTS ET RÉPONSES FIXES
 # =============================================================================
 
-def classify_question(state: AgentState) -> dict:
-    """Classifie la question comme juridique ou hors-sujet."""
-    question = state["question"].lower()
+CLASSIFICATION_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Réponds 'JURIDIQUE' ou 'AUTRE'. En cas de doute: 'JURIDIQUE'."),
+    ("human", "{question}")
+])
+
+# Prompt renforcé pour garantir la cohérence sources-réponse
+GENERATION_PROMPT = ChatPromptTemplate.from_template("""Tu es YoonAssist, assistant juridique sénégalais expert.
+
+⚠️ RÈGLES STRICTES - NON NÉGOCIABLES:
+1. Réponds UNIQUEMENT en te basant sur le CONTEXTE ci-dessous
+2. NE JAMAIS inventer ou ajouter d'informations non présentes dans le CONTEXTE
+3. Si la réponse n'est PAS dans le CONTEXTE: réponds "Je ne dispose pas de cette information précise dans les textes juridiques fournis."
+4. TOUJOURS citer la source exacte: [Article X du Code Y] ou [Titre du document]
+5. Si plusieurs articles sont pertinents, cite-les tous
+
+FORMAT DE RÉPONSE:
+- Réponse directe et précise (2-4 phrases)
+- Citer la source entre crochets: [Article X du Code Y]
+- Détails concrets: montants, délais, conditions
+- Langage clair et accessible
+
+{history}CONTEXTE JURIDIQUE (SOURCE DE VÉRITÉ):
+{context}
+
+QUESTION: {question}
+
+RÉPONSE (basée strictement sur le CONTEXTE):""")
+
+NON_JURIDIQUE_ANSWER = "Je suis un assistant spécialisé dans le droit sénégalais. Je ne peux répondre qu'aux questions juridiques concernant le Sénégal (Code du Travail, Code Pénal, Constitution, etc.)."
+NO_DOCUMENT_ANSWER = "Je ne dispose pas de cette information dans les textes de loi fournis. Veuillez reformuler votre question ou consulter un professionnel du droit."
+GENERATION_ERROR_ANSWER = "Une erreur s'est produite lors de la génération de la réponse. Veuillez réessayer."
+DEADLINE_ANSWER = "Le délai de réponse est dépassé avant la fin de la rédaction. Voici les textes de loi les plus pertinents pour votre question (réessayez pour obtenir une réponse rédigée):"
+
+# Phrases indiquant que le LLM n'a pas trouvé l'information dans le contexte
+NO_INFO_PHRASES = [
+    "je ne dispose pas",
+    "je n'ai pas trouvé",
+    "je ne trouve pas",
+    "pas d'information",
+    "aucune information",
+    "je ne peux pas répondre",
+    "information non disponible",
+]
+
+
+# =============================================================================
+# LOGIQUE PARTAGÉE DES NŒUDS (versions sync et async)
+# =============================================================================
+
+def _append_question(state: AgentState) -> List:
+    """Ajoute la question courante à l'historique de l'état."""
     messages = state.get("messages", [])
     messages.append(HumanMessage(content=state["question"]))
+    return messages
+
+
+def _keyword_category(question: str) -> Optional[str]:
+    """Classification rapide par mots-clés (None si ambigu)."""
+    question_lower = question.lower()
+    if any(kw in question_lower for kw in JURIDIQUE_KEYWORDS):
+        return "JURIDIQUE"
+    return None
+
+
+def get_question_classifier() -> CentroidClassifier:
+    """Lazy loading du classifieur par centroïdes (centroïdes calculés au 1er appel)."""
+    global _question_classifier
+    if _question_classifier is None:
+        with _init_lock:
+            if _question_classifier is None:
+                _question_classifier = CentroidClassifier(
+                    lambda texts: get_embedding_function().embed_queries(texts),
+                    legal_examples=LEGAL_EXAMPLES + CITIZEN_QUESTIONS,
+                    band_low=CLASSIFIER_BAND_LOW,
+                    band_high=CLASSIFIER_BAND_HIGH
+                )
+    return _question_classifier
+
+
+def _local_category(question: str) -> Optional[str]:
+    """
+    Classification locale par embedding (None si incertain ou indisponible).
     
-    # Classification rapide par mots-clés
-    if any(kw in question for kw in JURIDIQUE_KEYWORDS):
-        return {"category": "JURIDIQUE", "messages": messages}
+    L'embedding de la question est en général déjà en cache (cache sémantique,
+    recherche): aucun calcul supplémentaire.
+    """
+    if not LOCAL_CLASSIFIER:
+        return None
+    try:
+        with stage_timer("classify_local"):
+            return get_question_classifier().classify(embed_question(question))
+    except Exception as e:
+        print(f"⚠️ Classification locale indisponible: {str(e)}")
+        return None
+
+
+def _parse_category(content: str) -> str:
+    """Interprète la sortie du LLM de routage."""
+    return "AUTRE" if "AUTRE" in content.upper() else "JURIDIQUE"
+
+
+def _lookup_article_documents(question: str) -> List[Document]:
+    """
+    Chemin rapide: la question cite un article précis ("article L.56 du Code
+    du Travail"). Toutes ses parties sont lues directement par id, sans
+    embedding, recherche vectorielle ni reranking.
+    """
+    article_index = get_article_index()
+    db = get_db()
+    if article_index is None or db is None:
+        return []
     
-    # Classification LLM pour les cas ambigus (optimisé)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "Réponds 'JURIDIQUE' ou 'AUTRE'. En cas de doute: 'JURIDIQUE'."),
-        ("human", "{question}")
-    ])
+    chunk_ids = article_index.lookup(question)
+    if not chunk_ids:
+        return []
     
     try:
-        response = (prompt | router_llm).invoke({"question": state["question"]})
-        category = "AUTRE" if "AUTRE" in response.content.upper() else "JURIDIQUE"
+        by_id = {doc.id: doc for doc in db.get_by_ids(chunk_ids)}
     except Exception:
-        category = "JURIDIQUE"
-    
-    return {"category": category, "messages": messages}
+        return []
+    return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
 
 
-def handle_non_juridique(state: AgentState) -> dict:
-    """Répond poliment aux questions hors-sujet."""
-    messages = state.get("messages", [])
-    answer = "Je suis un assistant spécialisé dans le droit sénégalais. Je ne peux répondre qu'aux questions juridiques concernant le Sénégal (Code du Travail, Code Pénal, Constitution, etc.)."
-    messages.append(AIMessage(content=answer))
+def _search_documents(question: str) -> Tuple[List[Document], bool]:
+    """
+    Étape de recherche (travail CPU: embedding, recherche Chroma).
+    
+    Returns:
+        (documents, True s'ils viennent de l'index des articles: à utiliser
+        tels quels, sans reranking)
+    """
+    with stage_timer("article_lookup"):
+        article_docs = _lookup_article_documents(question)
+    if article_docs:
+        record_event("article_lookup_hit")
+        return article_docs, True
+    
+    retriever = get_retriever()
+    if not retriever:
+        return [], False
+    
+    try:
+        # Embedding mesuré séparément: la recherche le relit ensuite dans le cache
+        with stage_timer("embedding"):
+            embed_question(question)
+        
+        # Récupération initiale (k=10 pour avoir plus de choix)
+        with stage_timer("search"):
+            return retriever.invoke(question), False
+    except Exception as e:
+        record_event("retrieval_error")
+        return [], False
 
-    return {
-        "answer": answer,
-        "sources": [],
-        "messages": messages,
-        "suggested_questions": [],
-        "context_documents": []
-    }
 
+def _rerank_or_truncate(docs: List[Document], question: str) -> List[Document]:
+    """Reranking FlashRank (lots inter-requêtes) des documents récupérés, sinon les premiers."""
+    reranker = get_reranker()
+    if not reranker:
+        # Pas de reranker: utiliser directement les premiers documents
+        return docs[:RERANK_TOP_N]
+    try:
+        with stage_timer("rerank"):
+            reranked = rerank_documents(docs, question)
+    except Exception as e:
+        # Fallback en cas d'erreur de reranking
+        record_event("rerank_fallback")
+        return docs[:RERANK_TOP_N]
+    # Fallback si le reranker ne renvoie rien: premiers documents originaux
+    return reranked[:RERANK_TOP_N] if reranked else docs[:RERANK_TOP_N]
 
-def retrieve_node(state: AgentState) -> dict:
-    """Récupère et reranke les documents pertinents pour garantir la cohérence."""
-    question = state["question"]
+
+async def _arerank_or_truncate(docs: List[Document], question: str) -> List[Document]:
+    """
+    Version asynchrone de _rerank_or_truncate.
     
-    if not retriever:
-        return {"context_documents": []}
+    La demande est déposée dans le batcher depuis l'event loop: l'attente du
+    lot n'immobilise aucun thread du pool CPU, les lots grossissent donc avec
+    le nombre réel de requêtes concurrentes (et non avec MAX_WORKERS).
+    Sans batcher (désactivé, serveur de modèles), reranking dans le pool.
+    """
+    batcher = _rerank_batcher
+    if batcher is None and RERANK_BATCHING and not MODEL_SERVER_SOCKET:
+        # Chargement paresseux du reranker (bloquant) hors de l'event loop
+        batcher = await model_executor.run(get_rerank_batcher)
+    if batcher is None:
+        return await model_executor.run(_rerank_or_truncate, docs, question)
     
     try:
-        # Récupération initiale (k=10 pour avoir plus de choix)
-        docs = retriever.invoke(question)
-        
-        if not docs:
-            return {"context_documents": []}
-        
-        # Reranking avec FlashRank pour améliorer la pertinence
-        reranker = get_reranker()
-        if reranker:
-            try:
-                # Reranker tous les documents récupérés
-                reranked = reranker.compress_documents(docs, question)
-                
-                if reranked and len(reranked) > 0:
-                    # Prendre les top 3 documents les plus pertinents
-                    docs = reranked[:3]
-                else:
-                    # Fallback: prendre les 3 premiers documents originaux
-                    docs = docs[:3]
-                
-            except Exception as e:
-                # Fallback en cas d'erreur de reranking
-                docs = docs[:3]
-        else:
-            # Pas de reranker: utiliser directement les top 3
-            docs = docs[:3]
-        
-        # Filtrer les documents vides ou de mauvaise qualité
-        filtered_docs = []
-        for doc in docs:
-            content = doc.page_content.strip()
-            # Ignorer les documents trop courts (< 50 caractères)
-            if len(content) >= 50:
-                filtered_docs.append(doc)
-        
-        # Si tous les documents sont filtrés, utiliser les originaux
-        if not filtered_docs:
-            filtered_docs = docs[:3]
-        
-        # Convertir en format sérialisable avec informations enrichies
-        context_docs = [document_to_source(doc, i) for i, doc in enumerate(filtered_docs)]
-        
-        return {"context_documents": context_docs}
-        
+        with stage_timer("rerank"):
+            reranked = await asyncio.wait_for(
+                asyncio.wrap_future(batcher.submit(question, docs)),
+                timeout=batcher.timeout
+            )
     except Exception as e:
-        return {"context_documents": []}
+        try:
+            reranked = await model_executor.run(batcher.fallback, question, docs, e)
+        except Exception:
+            record_event("rerank_fallback")
+            return docs[:RERANK_TOP_N]
+    return reranked[:RERANK_TOP_N] if reranked else docs[:RERANK_TOP_N]
+
+
+def _select_documents(docs: List[Document]) -> List[dict]:
+    """Filtre les documents retenus et les convertit en sources sérialisables."""
+    # Filtrer les documents vides ou de mauvaise qualité
+    filtered_docs = []
+    for doc in docs:
+        content = doc.page_content.strip()
+        # Ignorer les documents trop courts (< 50 caractères)
+        if len(content) >= 50:
+            filtered_docs.append(doc)
+    
+    # Si tous les documents sont filtrés, utiliser les originaux
+    if not filtered_docs:
+        filtered_docs = docs[:RERANK_TOP_N]
+    
+    # Convertir en format sérialisable avec informations enrichies
+    return [document_to_source(doc, i) for i, doc in enumerate(filtered_docs)]
 
 
-def generate_node(state: AgentState) -> dict:
-    """Génère la réponse en utilisant UNIQUEMENT les documents récupérés."""
-    question = state["question"]
-    context_docs = state.get("context_documents", [])
-    messages = state.get("messages", [])
+def _retrieve_context_documents(question: str, rerank: bool = True) -> List[dict]:
+    """
+    Recherche + reranking + filtrage des documents (travail CPU: embedding,
+    recherche Chroma, cross-encoder FlashRank).
     
-    # CAS 1: Aucun document pertinent
-    if not context_docs:
-        answer = "Je ne dispose pas de cette information dans les textes de loi fournis. Veuillez reformuler votre question ou consulter un professionnel du droit."
-        messages.append(AIMessage(content=answer))
-        return {
-            "answer": answer,
-            "sources": [],
-            "messages": messages,
-            "suggested_questions": [],
-            "context_documents": []
-        }
-    
-    # CAS 2: Construire le contexte à partir des documents avec formatage clair
-    context_parts = []
-    for idx, doc in enumerate(context_docs[:3], 1):  # Limiter à 3 documents max
-        # En-tête de source clair avec numérotation
-        header = f"SOURCE {idx}: {doc['title']}"
-        if doc.get('article'):
-            header += f" - {doc['article']}"
-        if doc.get('breadcrumb'):
-            header += f" (Section: {doc['breadcrumb']})"
-        
-        # Contenu (limité pour performance)
-        content = doc.get('content', '')
-        if len(content) > 500:
-            content = content[:500] + "..."
-        
-        part = f"{header}\n{'='*60}\n{content}"
-        context_parts.append(part)
+    Args:
+        question: Question de l'utilisateur
+        rerank: False pour garder l'ordre de la recherche (budget de temps faible)
+    """
+    docs, from_article_index = _search_documents(question)
+    if from_article_index:
+        return [document_to_source(doc, i) for i, doc in enumerate(docs)]
+    if not docs:
+        return []
+    
+    docs = _rerank_or_truncate(docs, question) if rerank else docs[:RERANK_TOP_N]
+    return _select_documents(docs)
+
+
+async def _aretrieve_context_documents(question: str, rerank: bool = True) -> List[dict]:
+    """
+    Version asynchrone de _retrieve_context_documents: recherche dans le pool
+    des modèles, puis reranking attendu depuis l'event loop.
+    """
+    docs, from_article_index = await model_executor.run(_search_documents, question)
+    if from_article_index:
+        return [document_to_source(doc, i) for i, doc in enumerate(docs)]
+    if not docs:
+        return []
+    
+    docs = await _arerank_or_truncate(docs, question) if rerank else docs[:RERANK_TOP_N]
+    return _select_documents(docs)
+
+
+def _build_generation_inputs(question: str, context_docs: List[dict], messages: List) -> Tuple[dict, List[dict], int]:
+    """
+    Construit le contexte et l'historique injectés dans le prompt de génération.
     
-    context = "\n\n".join(context_parts)
+    Le contexte remplit le budget PROMPT_TOKEN_BUDGET restant après le gabarit,
+    la question et l'historique (documents dans l'ordre du reranking).
     
+    Returns:
+        (entrées du prompt, documents effectivement utilisés, tokens du prompt)
+    """
     # Construire l'historique de conversation (optimisé - seulement 4 derniers messages)
     history_str = ""
     if len(messages) > 1:
-        recent = messages[-4:]  # Réduits de 8 à 4 pour performance
+        recent = messages[-HISTORY_MAX_MESSAGES:]  # Réduits de 8 à 4 pour performance
         parts = []
         for msg in recent:
             if isinstance(msg, HumanMessage):
-                parts.append(f"U: {msg.content[:100]}")  # Limiter la longueur
+                parts.append(f"U: {msg.content[:HISTORY_USER_CHARS]}")  # Limiter la longueur
             elif isinstance(msg, AIMessage):
-                parts.append(f"A: {msg.content[:150]}")  # Limiter la longueur
+                parts.append(f"A: {msg.content[:HISTORY_ASSISTANT_CHARS]}")  # Limiter la longueur
         history_str = "\n".join(parts) + "\n\n"
     
-    # Prompt renforcé pour garantir la cohérence sources-réponse
-    template = """Tu es YoonAssist, assistant juridique sénégalais expert.
+    history_block = f"HISTORIQUE:\n{history_str}\n\n" if history_str else ""
+    inputs = {
+        "question": question,
+        "context": "",
+        "history": history_block
+    }
+    
+    # Tokens fixes: gabarit + question + historique; le reste revient au contexte
+    fixed_tokens = count_tokens(GENERATION_PROMPT.format(**inputs))
+    packed = pack_context(context_docs, max(0, PROMPT_TOKEN_BUDGET - fixed_tokens))
+    inputs["context"] = packed.text
+    
+    return inputs, packed.documents, fixed_tokens + packed.tokens
 
-⚠️ RÈGLES STRICTES - NON NÉGOCIABLES:
-1. Réponds UNIQUEMENT en te basant sur le CONTEXTE ci-dessous
-2. NE JAMAIS inventer ou ajouter d'informations non présentes dans le CONTEXTE
-3. Si la réponse n'est PAS dans le CONTEXTE: réponds "Je ne dispose pas de cette information précise dans les textes juridiques fournis."
-4. TOUJOURS citer la source exacte: [Article X du Code Y] ou [Titre du document]
-5. Si plusieurs articles sont pertinents, cite-les tous
 
-FORMAT DE RÉPONSE:
-- Réponse directe et précise (2-4 phrases)
-- Citer la source entre crochets: [Article X du Code Y]
-- Détails concrets: montants, délais, conditions
-- Langage clair et accessible
+def _public_source(doc: dict) -> str:
+    """Source sérialisée pour l'API (sans le texte intégral)."""
+    return json.dumps({key: value for key, value in doc.items() if key != "text"})
 
-{history}CONTEXTE JURIDIQUE (SOURCE DE VÉRITÉ):
-{context}
 
-QUESTION: {question}
+def _check_cited_articles(answer: str, context: str) -> None:
+    """Vérification de cohérence: articles cités dans la réponse mais absents du contexte."""
+    context_lower = context.lower()
+    
+    # Extraire les références d'articles de la réponse
+    article_refs = re.findall(r'article\s+\d+', answer.lower())
+    
+    # Vérifier que ces articles sont bien dans le contexte
+    for ref in article_refs:
+        if ref not in context_lower:
+            # L'article cité n'est pas dans le contexte fourni!
+            # En mode production, on pourrait logger cela
+            pass  # Pour l'instant on laisse passer mais c'est détectable
+
+
+def _empty_answer_state(answer: str, messages: List) -> dict:
+    """État final d'une réponse sans sources."""
+    return {
+        "answer": answer,
+        "sources": [],
+        "messages": messages,
+        "suggested_questions": [],
+        "context_documents": []
+    }
 
-RÉPONSE (basée strictement sur le CONTEXTE):"""
+
+def remaining_budget(state: dict) -> float:
+    """Secondes restantes avant l'échéance de la requête (infini sans échéance)."""
+    deadline = state.get("deadline")
+    if deadline is None:
+        return float("inf")
+    return deadline - time.monotonic()
+
+
+def _llm_timeout(state: dict) -> Optional[float]:
+    """Timeout d'un appel LLM: budget restant moins la marge (None sans échéance)."""
+    remaining = remaining_budget(state)
+    if remaining == float("inf"):
+        return None
+    return max(0.0, remaining - DEADLINE_MARGIN_SECONDS)
+
+
+def _degrade(state: dict, stage: str) -> List[str]:
+    """Enregistre une étape sautée ou interrompue par l'échéance."""
+    record_event(f"deadline_{stage}")
+    return [*state.get("degraded", []), stage]
+
+
+def suggestions_allowed(state: dict) -> bool:
+    """Les suggestions valent-elles un appel LLM (réponse complète et budget suffisant) ?"""
+    return not state.get("degraded") and remaining_budget(state) >= DEADLINE_SUGGESTIONS_MIN_SECONDS
+
+
+def _deadline_answer(used_docs: List[dict]) -> str:
+    """Réponse dégradée (échéance atteinte): extraits des documents retenus, sans LLM."""
+    lines = [DEADLINE_ANSWER]
+    for doc in used_docs:
+        label = doc["title"] + (f", {doc['article']}" if doc.get("article") else "")
+        lines.append(f"- {label}: {doc['content'][:300]}")
+    return "\n".join(lines)
+
+
+def _has_no_info(answer: str) -> bool:
+    """COHÉRENCE: le LLM indique-t-il ne pas disposer de l'information ?"""
+    answer_lower = answer.lower()
+    return any(phrase in answer_lower for phrase in NO_INFO_PHRASES)
+
+
+# =============================================================================
+# NŒUDS DU GRAPHE
+# =============================================================================
+
+def classify_question(state: AgentState) -> dict:
+    """Classifie la question comme juridique ou hors-sujet."""
+    messages = _append_question(state)
+    
+    # Classification rapide par mots-clés, puis par centroïdes d'embeddings
+    category = _keyword_category(state["question"]) or _local_category(state["question"])
+    if category:
+        return {"category": category, "messages": messages}
     
-    prompt = ChatPromptTemplate.from_template(template)
+    # Budget insuffisant pour le LLM de routage: la plupart du trafic est juridique
+    if remaining_budget(state) < DEADLINE_CLASSIFIER_MIN_SECONDS:
+        return {"category": "JURIDIQUE", "messages": messages, "degraded": _degrade(state, "classify_llm")}
     
+    # Classification LLM pour les cas ambigus (bande d'incertitude)
     try:
-        history_block = f"HISTORIQUE:\n{history_str}\n\n" if history_str else ""
-        response = (prompt | generation_llm).invoke({
-            "question": question,
-            "context": context,
-            "history": history_block
-        })
-        answer = response.content.strip()
-        
-        # Vérification de cohérence: si la réponse cite des articles non présents dans le contexte
-        # On ajoute un avertissement (pour debug)
-        context_lower = context.lower()
-        answer_lower = answer.lower()
-        
-        # Extraire les références d'articles de la réponse
-        import re
-        article_refs = re.findall(r'article\s+\d+', answer_lower)
-        
-        # Vérifier que ces articles sont bien dans le contexte
-        for ref in article_refs:
-            if ref not in context_lower:
-                # L'article cité n'est pas dans le contexte fourni!
-                # En mode production, on pourrait logger cela
-                pass  # Pour l'instant on laisse passer mais c'est détectable
+        with stage_timer("llm_classify"):
+            response = (CLASSIFICATION_PROMPT | router_llm).invoke({"question": state["question"]})
+        category = _parse_category(response.content)
+    except Exception:
+        record_event("classify_llm_error")
+        category = "JURIDIQUE"
+    
+    return {"category": category, "messages": messages}
+
+
+async def aclassify_question(state: AgentState) -> dict:
+    """Version asynchrone de classify_question."""
+    messages = _append_question(state)
+    
+    category = _keyword_category(state["question"])
+    if not category:
+        category = await model_executor.run(_local_category, state["question"])
+    if category:
+        return {"category": category, "messages": messages}
+    
+    if remaining_budget(state) < DEADLINE_CLASSIFIER_MIN_SECONDS:
+        return {"category": "JURIDIQUE", "messages": messages, "degraded": _degrade(state, "classify_llm")}
+    
+    # Presque tout le trafic est juridique: la recherche démarre pendant l'appel
+    # au LLM de routage, qui sort ainsi du chemin critique
+    prefetch = None
+    retrieval_update: dict = {}
+    if SPECULATIVE_RETRIEVAL:
+        rerank, retrieval_update = _retrieval_plan(state)
+        # Tâche par étapes (recherche dans le pool, puis reranking): annulée,
+        # elle s'arrête à la frontière en cours et le reranking n'est pas lancé
+        prefetch = asyncio.ensure_future(_aretrieve_context_documents(state["question"], rerank))
+    
+    update: dict = {}
+    used = False
+    try:
+        try:
+            with stage_timer("llm_classify"):
+                response = await asyncio.wait_for(
+                    (CLASSIFICATION_PROMPT | router_llm).ainvoke({"question": state["question"]}),
+                    timeout=_llm_timeout(state)
+                )
+            category = _parse_category(response.content)
+        except asyncio.TimeoutError:
+            category = "JURIDIQUE"
+            update["degraded"] = _degrade({**state, **retrieval_update}, "classify_llm")
+        except Exception:
+            record_event("classify_llm_error")
+            category = "JURIDIQUE"
         
-    except Exception as e:
-        answer = "Une erreur s'est produite lors de la génération de la réponse. Veuillez réessayer."
+        if category == "JURIDIQUE" and prefetch is not None:
+            update = {**retrieval_update, **update, "prefetched_documents": await prefetch}
+            used = True
+            record_event("speculative_retrieval_used")
+    finally:
+        if prefetch is not None and not used:
+            # Hors-sujet (ou requête annulée): résultat jeté. La recherche déjà
+            # démarrée se termine dans son thread, mais le reranking est sauté
+            # (demande non déposée, ou retirée du lot du batcher)
+            prefetch.cancel()
+            record_event("speculative_retrieval_discarded")
+    
+    return {"category": category, "messages": messages, **update}
+
+
+def handle_non_juridique(state: AgentState) -> dict:
+    """Répond poliment aux questions hors-sujet."""
+    messages = state.get("messages", [])
+    messages.append(AIMessage(content=NON_JURIDIQUE_ANSWER))
+    return _empty_answer_state(NON_JURIDIQUE_ANSWER, messages)
+
+
+def _retrieval_plan(state: AgentState) -> Tuple[bool, dict]:
+    """Reranking si le budget le permet (sinon étape sautée et notée dans l'état)."""
+    if remaining_budget(state) < DEADLINE_RERANK_MIN_SECONDS:
+        return False, {"degraded": _degrade(state, "rerank")}
+    return True, {}
+
+
+def retrieve_node(state: AgentState) -> dict:
+    """Récupère et reranke les documents pertinents pour garantir la cohérence."""
+    if state.get("prefetched_documents") is not None:
+        return {"context_documents": state["prefetched_documents"]}
+    rerank, update = _retrieval_plan(state)
+    return {"context_documents": _retrieve_context_documents(state["question"], rerank), **update}
+
+
+async def aretrieve_node(state: AgentState) -> dict:
+    """
+    Version asynchrone de retrieve_node.
     
+    L'embedding et la recherche Chroma sont du travail CPU: ils sont exécutés
+    dans le pool des modèles pour ne pas bloquer l'event loop; le reranking
+    groupé est attendu depuis l'event loop.
+    Si la recherche spéculative a déjà abouti pendant la classification, ses
+    documents sont repris tels quels.
+    """
+    if state.get("prefetched_documents") is not None:
+        return {"context_documents": state["prefetched_documents"]}
+    rerank, update = _retrieval_plan(state)
+    context_docs = await _aretrieve_context_documents(state["question"], rerank)
+    return {"context_documents": context_docs, **update}
+
+
+def _deadline_answer_state(state: AgentState, used_docs: List[dict], messages: List, prompt_tokens: int) -> dict:
+    """État final quand la génération est sautée ou interrompue par l'échéance."""
+    answer = _deadline_answer(used_docs)
     messages.append(AIMessage(content=answer))
+    return {
+        "answer": answer,
+        "sources": [_public_source(doc) for doc in used_docs],
+        "messages": messages,
+        "suggested_questions": [],
+        "context_documents": [],
+        "prompt_tokens": prompt_tokens,
+        "degraded": _degrade(state, "generate"),
+    }
+
+
+def _prepare_generation(state: AgentState) -> Tuple[Optional[dict], dict, List[dict], int]:
+    """
+    Étapes communes à generate_node et agenerate_node avant l'appel LLM:
+    contexte assemblé sous budget de tokens (historique compris) et contrôle
+    de l'échéance.
     
-    # COHÉRENCE: Si le LLM dit qu'il n'a pas l'info, ne pas afficher de sources
-    no_info_phrases = [
-        "je ne dispose pas",
-        "je n'ai pas trouvé",
-        "je ne trouve pas",
-        "pas d'information",
-        "aucune information",
-        "je ne peux pas répondre",
-        "information non disponible",
-    ]
+    Returns:
+        (état final si l'appel LLM n'a pas lieu, sinon None; entrées du
+        prompt; documents utilisés; tokens du prompt)
+    """
+    context_docs = state.get("context_documents", [])
+    messages = state.get("messages", [])
     
-    answer_lower = answer.lower()
-    has_no_info = any(phrase in answer_lower for phrase in no_info_phrases)
+    # CAS 1: Aucun document pertinent
+    if not context_docs:
+        messages.append(AIMessage(content=NO_DOCUMENT_ANSWER))
+        return _empty_answer_state(NO_DOCUMENT_ANSWER, messages), {}, [], 0
     
-    if has_no_info:
-        # Le LLM indique qu'il n'a pas l'info → pas de sources
-        return {
-            "answer": answer,
-            "sources": [],
-            "messages": messages,
-            "suggested_questions": [],
-            "context_documents": []
-        }
+    # CAS 2: Construire le contexte à partir des documents (budget de tokens)
+    with stage_timer("pack_context"):
+        inputs, used_docs, prompt_tokens = _build_generation_inputs(state["question"], context_docs, messages)
     
-    # Les sources sont EXACTEMENT les documents qui ont servi au contexte
-    sources_list = [json.dumps(doc) for doc in context_docs]
+    if remaining_budget(state) < DEADLINE_GENERATION_MIN_SECONDS:
+        return _deadline_answer_state(state, used_docs, messages, prompt_tokens), inputs, used_docs, prompt_tokens
+    return None, inputs, used_docs, prompt_tokens
+
+
+def _answer_state(state: AgentState, answer: str, used_docs: List[dict], prompt_tokens: int) -> dict:
+    """État final après la réponse du LLM (ou son message d'erreur)."""
+    messages = state.get("messages", [])
+    messages.append(AIMessage(content=answer))
+    
+    if _has_no_info(answer):
+        # Le LLM indique qu'il n'a pas l'info → pas de sources
+        return {**_empty_answer_state(answer, messages), "prompt_tokens": prompt_tokens}
     
-    # Générer les questions suggérées
-    suggested = generate_suggested_questions(question, context_docs, answer)
+    # Les sources sont EXACTEMENT les documents qui ont servi au contexte.
+    # Les questions suggérées sont générées hors du chemin critique
+    # (voir src/suggestions.py)
+    sources_list = [_public_source(doc) for doc in used_docs]
     
     return {
         "answer": answer,
         "sources": sources_list,
         "messages": messages,
-        "suggested_questions": suggested,
-        "context_documents": []
+        "suggested_questions": [],
+        "context_documents": [],
+        "prompt_tokens": prompt_tokens
     }
 
 
+def generate_node(state: AgentState) -> dict:
+    """Génère la réponse en utilisant UNIQUEMENT les documents récupérés."""
+    final_state, inputs, used_docs, prompt_tokens = _prepare_generation(state)
+    if final_state is not None:
+        return final_state
+    
+    try:
+        with stage_timer("llm_generate"):
+            response = (GENERATION_PROMPT | generation_llm).invoke(
+                inputs,
+                config={"tags": [ANSWER_STREAM_TAG]}
+            )
+        answer = response.content.strip()
+        _check_cited_articles(answer, inputs["context"])
+    except Exception as e:
+        record_event("generation_llm_error")
+        answer = GENERATION_ERROR_ANSWER
+    
+    return _answer_state(state, answer, used_docs, prompt_tokens)
+
+
+async def agenerate_node(state: AgentState) -> dict:
+    """Version asynchrone de generate_node (appels Groq via ainvoke)."""
+    final_state, inputs, used_docs, prompt_tokens = _prepare_generation(state)
+    if final_state is not None:
+        return final_state
+    
+    try:
+        # Appel annulé à l'échéance: la connexion Groq est fermée et la place libérée
+        with stage_timer("llm_generate"):
+            response = await asyncio.wait_for(
+                (GENERATION_PROMPT | generation_llm).ainvoke(
+                    inputs,
+                    config={"tags": [ANSWER_STREAM_TAG]}
+                ),
+                timeout=_llm_timeout(state)
+            )
+        answer = response.content.strip()
+        _check_cited_articles(answer, inputs["context"])
+    except asyncio.TimeoutError:
+        return _deadline_answer_state(state, used_docs, state.get("messages", []), prompt_tokens)
+    except Exception as e:
+        record_event("generation_llm_error")
+        answer = GENERATION_ERROR_ANSWER
+    
+    return _answer_state(state, answer, used_docs, prompt_tokens)
+
+
 # =============================================================================
 # CONSTRUCTION DU GRAPHE
 # =============================================================================
 
+def _timed_node(name: str, func, afunc=None) -> RunnableLambda:
+    """Nœud dont la durée est enregistrée sous son nom (voir src/metrics.py)."""
+    @functools.wraps(func)
+    def timed(state: AgentState) -> dict:
+        with stage_timer(name):
+            return func(state)
+    
+    if afunc is None:
+        return RunnableLambda(timed, name=name)
+    
+    @functools.wraps(afunc)
+    async def atimed(state: AgentState) -> dict:
+        with stage_timer(name):
+            return await afunc(state)
+    
+    return RunnableLambda(timed, afunc=atimed, name=name)
+
+
 workflow = StateGraph(AgentState)
 
-# Nœuds
-workflow.add_node("classify", classify_question)
-workflow.add_node("retrieve", retrieve_node)
-workflow.add_node("generate", generate_node)
-workflow.add_node("non_juridique", handle_non_juridique)
+# Nœuds: chaque nœud a une implémentation sync (agent_app.invoke) et async
+# (agent_app.ainvoke / astream) pour ne pas monopoliser un thread par requête
+workflow.add_node("classify", _timed_node("classify", classify_question, aclassify_question))
+workflow.add_node("retrieve", _timed_node("retrieve", retrieve_node, aretrieve_node))
+workflow.add_node("generate", _timed_node("generate", generate_node, agenerate_node))
+workflow.add_node("non_juridique", _timed_node("non_juridique", handle_non_juridique))
 
 # Point d'entrée
 workflow.set_entry_point("classify")
@@ -737,4 +1368,59 @@ workflow.add_edge("non_juridique", END)
 # Compilation (sans checkpointer pour éviter les erreurs de sérialisation)
 agent_app = workflow.compile()
 
-# Agent RAG initialisé
\ No newline at end of file
+
+# =============================================================================
+# PRÉCHAUFFAGE AU DÉMARRAGE
+# =============================================================================
+
+WARM_UP_QUESTION = "Combien de temps dure la période d'essai d'un contrat de travail ?"
+
+
+def _timed_step(timings: dict, name: str, func) -> None:
+    """Exécute une étape de préchauffage et enregistre sa durée (ms) ou son erreur."""
+    start = time.perf_counter()
+    try:
+        func()
+        timings[name] = round((time.perf_counter() - start) * 1000)
+    except Exception as e:
+        timings[name] = f"erreur: {type(e).__name__}: {e}"
+
+
+def warm_up() -> dict:
+    """
+    Charge et préchauffe les ressources du pipeline (bloquant, appelé au
+    démarrage de l'API dans un thread): modèle d'embeddings, base Chroma,
+    index, reranker, classifieur, tokenizer et clients HTTP synchrones.
+    
+    Returns:
+        Durée (ms) ou erreur de chaque étape
+    """
+    timings: dict = {}
+    _timed_step(timings, "embeddings", lambda: embed_question(WARM_UP_QUESTION))
+    _timed_step(timings, "vector_store", lambda: get_db()._collection.count())
+    _timed_step(timings, "article_index", get_article_index)
+    _timed_step(timings, "reranker", get_reranker)
+    # Recherche complète: retriever, BM25, batcher et session ONNX du reranker
+    _timed_step(timings, "retrieval", lambda: _retrieve_context_documents(WARM_UP_QUESTION))
+    _timed_step(timings, "classifier", lambda: get_question_classifier().margin(embed_question(WARM_UP_QUESTION)))
+    # Encodage tiktoken du packer de contexte (sinon chargé sur la boucle par agenerate_node)
+    _timed_step(timings, "tokenizer", lambda: count_tokens(WARM_UP_QUESTION))
+    # Connexion TLS du pool HTTP (liste des modèles: aucun token consommé)
+    _timed_step(timings, "groq_sync_client", lambda: generation_llm.client._client.models.list())
+    gc.collect()
+    return timings
+
+
+async def awarm_up_llm_clients() -> dict:
+    """Ouvre les connexions des clients Groq asynchrones (routage et génération)."""
+    timings: dict = {}
+    for name, llm in (("groq_router_client", router_llm), ("groq_generation_client", generation_llm)):
+        start = time.perf_counter()
+        try:
+            await llm.async_client._client.models.list()
+            timings[name] = round((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            timings[name] = f"erreur: {type(e).__name__}: {e}"
+    return timings
+
+# Agent RAG initialisé
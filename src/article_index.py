@@ -0,0 +1,240 @@
+"""
+Index direct des articles de loi.
+
+Beaucoup de questions citent un article précis ("Que dit l'article L.56 du
+Code du Travail ?"). Le découpage `SenegalLegalChunker` enregistre pour chaque
+chunk les métadonnées `source_name`, `article` et `part_number`: cet index
+persiste la correspondance (source, numéro d'article normalisé) -> ids des
+chunks, ce qui permet de récupérer toutes les parties d'un article sans
+embedding, recherche vectorielle ni reranking.
+
+Usage (reconstruire l'index d'une base existante):
+    python -m src.article_index [chemin_base_chroma]
+"""
+
+import json
+import logging
+import re
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ARTICLE_INDEX_FILENAME = "article_index.json"
+
+# Numéro en tête d'une métadonnée `article` ("Article L.56. - Le contrat ..." -> L, 56)
+ARTICLE_NUMBER_PATTERN = re.compile(
+    r"^\s*(?:articles?\b|art\b\.?)?\s*(?:(premier|1er)\b|([a-z])?\s*\.?\s*(\d+)(?:[-.](\d+))?(?:\s*(bis|ter|quater)\b)?)",
+    re.IGNORECASE
+)
+
+# Référence à un article dans une question ("l'article L.56", "les articles 5",
+# "art. 320 bis", "art 12")
+QUESTION_ARTICLE_PATTERN = re.compile(
+    r"\b(?:articles?|art\b\.?)\s*((?:premier|1er)\b|(?:[a-z]\s*\.?\s*)?\d+(?:[-.]\d+)?(?:\s*(?:bis|ter|quater)\b)?)",
+    re.IGNORECASE
+)
+
+
+def _strip_accents(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in normalized if not unicodedata.combining(c))
+
+
+def normalize_article_number(raw: str) -> Optional[str]:
+    """
+    Normalise un numéro d'article.
+
+    Exemples: "Article L.56. - Le contrat" -> "L56", "L 56" -> "L56",
+    "Art. 320 bis" -> "320BIS", "premier" -> "1", "L.2-1" -> "L2-1"
+
+    Args:
+        raw: Texte commençant par un numéro d'article
+
+    Returns:
+        Numéro normalisé, ou None si aucun numéro n'est reconnu
+    """
+    if not raw:
+        return None
+    match = ARTICLE_NUMBER_PATTERN.match(raw)
+    if not match:
+        return None
+    first, prefix, number, sub_number, suffix = match.groups()
+    if first:
+        return "1"
+    if not number:
+        return None
+    normalized = f"{(prefix or '').upper()}{int(number)}"
+    if sub_number:
+        normalized += f"-{int(sub_number)}"
+    if suffix:
+        normalized += suffix.upper()
+    return normalized
+
+
+def extract_article_references(question: str) -> List[str]:
+    """
+    Numéros normalisés des articles cités dans une question, sans doublons.
+
+    Exemple: "Que disent les articles L.56 et art. 57 ?" -> ["L56", "57"]
+    """
+    references = [normalize_article_number(ref) for ref in QUESTION_ARTICLE_PATTERN.findall(question)]
+    return [ref for ref in dict.fromkeys(references) if ref]
+
+
+def _source_aliases(source_name: str) -> List[str]:
+    """Formes sous lesquelles une source peut être citée dans une question."""
+    name = _strip_accents(source_name)
+    aliases = {name}
+    for suffix in (" du senegal", " de la republique du senegal"):
+        if name.endswith(suffix):
+            aliases.add(name[: -len(suffix)])
+    return sorted(aliases, key=len, reverse=True)
+
+
+class ArticleIndex:
+    """Correspondance (source, numéro d'article normalisé) -> ids des chunks."""
+
+    def __init__(self, sources: Dict[str, Dict[str, List[str]]]):
+        self.sources = sources
+        self._aliases = {name: _source_aliases(name) for name in sources}
+
+    def __len__(self) -> int:
+        return sum(len(articles) for articles in self.sources.values())
+
+    @classmethod
+    def build(cls, ids: List[str], metadatas: List[dict]) -> "ArticleIndex":
+        """
+        Construit l'index à partir des métadonnées des chunks.
+
+        Args:
+            ids: Identifiants Chroma des chunks
+            metadatas: Métadonnées correspondantes
+
+        Returns:
+            ArticleIndex (les parties d'un article sont triées par part_number)
+        """
+        entries: Dict[str, Dict[str, List[tuple]]] = {}
+        for position, (chunk_id, metadata) in enumerate(zip(ids, metadatas)):
+            metadata = metadata or {}
+            source_name = metadata.get("source_name")
+            number = normalize_article_number(metadata.get("article", ""))
+            if not source_name or not number:
+                continue
+            part = metadata.get("part_number") or 1
+            entries.setdefault(source_name, {}).setdefault(number, []).append((part, position, chunk_id))
+
+        sources = {
+            source_name: {
+                number: [chunk_id for _, _, chunk_id in sorted(parts)]
+                for number, parts in articles.items()
+            }
+            for source_name, articles in entries.items()
+        }
+        return cls(sources)
+
+    def detect_source(self, question: str) -> Optional[str]:
+        """Source explicitement citée dans la question, si elle est indexée."""
+        question_norm = _strip_accents(question)
+        for source_name, aliases in self._aliases.items():
+            if any(alias in question_norm for alias in aliases):
+                return source_name
+        return None
+
+    def lookup(self, question: str, max_articles: int = 3) -> List[str]:
+        """
+        Ids des chunks des articles cités dans la question.
+
+        Un article n'est retenu que si sa source est non ambiguë: source citée
+        dans la question, ou numéro présent dans une seule source.
+
+        Args:
+            question: Question de l'utilisateur
+            max_articles: Nombre maximum d'articles retenus
+
+        Returns:
+            Ids des chunks (toutes les parties, dans l'ordre), liste vide sinon
+        """
+        references = extract_article_references(question)
+        if not references:
+            return []
+
+        cited_source = self.detect_source(question)
+        chunk_ids: List[str] = []
+
+        for number in references[:max_articles]:
+            candidates = [name for name, articles in self.sources.items() if number in articles]
+            if cited_source in candidates:
+                source_name = cited_source
+            elif len(candidates) == 1:
+                source_name = candidates[0]
+            else:
+                # Article inconnu ou ambigu: laisser la recherche classique trancher
+                continue
+            chunk_ids.extend(self.sources[source_name][number])
+
+        return chunk_ids
+
+    def save(self, db_path: Path) -> None:
+        """Sauvegarde l'index à côté de la base Chroma."""
+        (Path(db_path) / ARTICLE_INDEX_FILENAME).write_text(
+            json.dumps({"sources": self.sources}, ensure_ascii=False),
+            encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, db_path: Path) -> "ArticleIndex":
+        """Charge l'index d'une base Chroma."""
+        data = json.loads((Path(db_path) / ARTICLE_INDEX_FILENAME).read_text(encoding="utf-8"))
+        return cls(data["sources"])
+
+
+def build_article_index(collection, db_path: Path, batch_size: int = 1000) -> ArticleIndex:
+    """
+    Construit et sauvegarde l'index des articles d'une collection Chroma.
+
+    Args:
+        collection: Collection chromadb (ex: Chroma(...)._collection)
+        db_path: Répertoire de la base
+        batch_size: Taille des pages lues dans la collection
+
+    Returns:
+        L'index construit
+    """
+    ids: List[str] = []
+    metadatas: List[dict] = []
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        ids.extend(page["ids"])
+        metadatas.extend(page["metadatas"])
+
+    index = ArticleIndex.build(ids, metadatas)
+    index.save(db_path)
+    logger.info(f"✅ Index des articles construit: {len(index)} articles, {len(index.sources)} sources")
+    return index
+
+
+def load_article_index(db_path: Path) -> Optional[ArticleIndex]:
+    """Charge l'index des articles, ou None s'il n'a pas été construit."""
+    if not (Path(db_path) / ARTICLE_INDEX_FILENAME).exists():
+        return None
+    try:
+        return ArticleIndex.load(db_path)
+    except Exception as e:
+        logger.warning(f"⚠️ Index des articles illisible: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    import chromadb
+
+    default_db_path = Path(__file__).resolve().parents[1] / "data" / "chroma_db_with_web"
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_db_path
+
+    client = chromadb.PersistentClient(path=str(db_path))
+    build_article_index(client.get_collection("juridiction_senegal"), db_path)
@@ -0,0 +1,201 @@
+"""
+Cache sémantique des réponses de l'agent.
+
+Les questions quasi identiques (questions suggérées, questions fréquentes)
+partagent la même réponse: la recherche se fait par similarité cosinus entre
+l'embedding normalisé de la question et ceux des questions déjà traitées.
+
+La similarité seule ne distingue pas "l'article L.56" de "l'article L.57":
+une entrée n'est servie que si les articles cités et les autres nombres de
+la question (années, numéros de loi) sont exactement les mêmes.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.article_index import QUESTION_ARTICLE_PATTERN, extract_article_references
+
+NUMBER_PATTERN = re.compile(r"\d+")
+
+# (articles cités, autres nombres): doit être identique pour servir une entrée
+QuestionReferences = Tuple[FrozenSet[str], Tuple[int, ...]]
+
+
+@dataclass
+class _CacheEntry:
+    """Entrée du cache: embedding normalisé + réponse sérialisée."""
+    embedding: np.ndarray
+    references: QuestionReferences
+    payload: dict
+    created_at: float
+
+
+def normalize_question(question: str) -> str:
+    """Normalise une question pour servir de clé (casse, espaces)."""
+    return " ".join(question.lower().split())
+
+
+def question_references(question: str) -> QuestionReferences:
+    """
+    Références exactes d'une question: articles cités (numéros normalisés) et
+    autres nombres, hors numéros d'articles.
+
+    Exemple: "Article L.56 de la loi 2020-05" -> ({"L56"}, (5, 2020))
+    """
+    articles = frozenset(extract_article_references(question))
+    remainder = QUESTION_ARTICLE_PATTERN.sub(" ", question)
+    numbers = tuple(sorted(int(number) for number in NUMBER_PATTERN.findall(remainder)))
+    return articles, numbers
+
+
+class SemanticAnswerCache:
+    """
+    Cache LRU + TTL de réponses, indexé par embedding de question.
+
+    Une entrée est servie si la similarité cosinus avec la question posée
+    dépasse `similarity_threshold` et si ses références (articles, nombres)
+    sont identiques à celles de la question. Le cache est vidé dès que la version
+    d'index renvoyée par `version_provider` change (reconstruction Chroma).
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95,
+        version_provider: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version_provider = version_provider
+
+        self._entries: OrderedDict[str, _CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = version_provider() if version_provider else None
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_version(self) -> None:
+        """Vide le cache si l'index a été reconstruit (appelé sous verrou)."""
+        if not self.version_provider:
+            return
+        version = self.version_provider()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+
+    def lookup(self, question: str, embedding: Sequence[float]) -> Optional[dict]:
+        """
+        Cherche une réponse pour une question proche citant les mêmes références.
+
+        Args:
+            question: Question posée
+            embedding: Embedding de la question posée
+
+        Returns:
+            Copie de la réponse mise en cache, ou None
+        """
+        query = self._normalize(embedding)
+        references = question_references(question)
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+
+            best_key = None
+            best_score = -1.0
+            expired: List[str] = []
+
+            for key, entry in self._entries.items():
+                if now - entry.created_at > self.ttl_seconds:
+                    expired.append(key)
+                    continue
+                if entry.references != references:
+                    continue
+                score = float(np.dot(query, entry.embedding))
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            for key in expired:
+                self._entries.pop(key, None)
+
+            if best_key is None or best_score < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            # Déplacer en fin (LRU)
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return dict(self._entries[best_key].payload)
+
+    def store(self, question: str, embedding: Sequence[float], payload: dict) -> None:
+        """
+        Ajoute une réponse au cache.
+
+        Args:
+            question: Question d'origine
+            embedding: Embedding de la question
+            payload: Réponse sérialisée (QueryResponse.model_dump())
+        """
+        key = normalize_question(question)
+
+        with self._lock:
+            self._check_version()
+            self._entries.pop(key, None)
+            self._entries[key] = _CacheEntry(
+                embedding=self._normalize(embedding),
+                references=question_references(question),
+                payload=payload,
+                created_at=time.time(),
+            )
+
+            # Limiter la taille du cache (LRU)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, question: str, **fields) -> bool:
+        """
+        Met à jour des champs de la réponse en cache pour une question.
+
+        Returns:
+            True si l'entrée existait
+        """
+        key = normalize_question(question)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.payload = {**entry.payload, **fields}
+            return True
+
+    def clear(self) -> None:
+        """Vide le cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Statistiques du cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
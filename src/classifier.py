@@ -0,0 +1,160 @@
+"""
+Classification locale des questions (juridique / hors-sujet) par centroïdes.
+
+Quand aucun mot-clé juridique ne correspond, la question partait vers le
+LLM de routage (aller-retour réseau de plusieurs centaines de ms). Ici,
+l'embedding de la question (déjà calculé et mis en cache pour la recherche)
+est comparé aux centroïdes d'exemples juridiques et hors-sujet:
+
+    marge = cos(q, centroïde juridique) - cos(q, centroïde hors-sujet)
+
+Au-dessus de `band_high`: JURIDIQUE, sans appel au LLM. Sinon la décision
+est déléguée au LLM de routage (escalade comptabilisée): en cas de doute,
+la règle historique est JURIDIQUE, et une question juridique mal placée
+par les centroïdes ne doit pas être refusée sans avis du LLM. Une décision
+AUTRE locale n'est prise que si `band_low` est fixé explicitement (seuil
+calibré sur des questions réelles).
+"""
+
+import threading
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+LEGAL_EXAMPLES = [
+    "Quels sont mes droits si je suis licencié ?",
+    "Combien de jours de congé ai-je droit par an ?",
+    "Mon patron refuse de me payer mes heures supplémentaires",
+    "Quelle est la peine pour un vol avec violence ?",
+    "Comment porter plainte au commissariat ?",
+    "Qui peut se présenter à l'élection présidentielle ?",
+    "Quelle est la durée du mandat des députés ?",
+    "Comment se passe un divorce ?",
+    "Quels sont les droits de l'enfant ?",
+    "Puis-je être arrêté sans mandat ?",
+    "Combien de temps dure une garde à vue ?",
+    "Quelles sont les conditions pour créer une association ?",
+    "Mon propriétaire peut-il m'expulser sans préavis ?",
+    "Que risque-t-on pour conduite sans permis ?",
+    "Quelles sont les obligations d'un commerçant ?",
+    "Comment contester une amende ?",
+    "Est-ce qu'une femme enceinte peut être renvoyée ?",
+    "Quelles sont les règles de succession quand un parent décède ?",
+    "Un mineur peut-il travailler ?",
+    "Quel est le rôle du Conseil constitutionnel ?",
+]
+
+OFF_TOPIC_EXAMPLES = [
+    "Quel temps fera-t-il demain à Dakar ?",
+    "Donne-moi une recette de thiéboudienne",
+    "Qui a gagné le match de football hier soir ?",
+    "Bonjour, comment vas-tu ?",
+    "Raconte-moi une blague",
+    "Combien font 25 fois 48 ?",
+    "Écris un poème sur la mer",
+    "Comment installer Python sur mon ordinateur ?",
+    "Quel est le meilleur téléphone à acheter ?",
+    "Traduis cette phrase en anglais",
+    "Quelle est la capitale du Japon ?",
+    "Comment perdre du poids rapidement ?",
+    "Recommande-moi un bon film",
+    "Quelle heure est-il ?",
+    "Explique-moi la photosynthèse",
+    "Quels sont les horaires de la plage ?",
+    "Comment faire pousser des tomates ?",
+    "Qui es-tu ?",
+    "Quel est le prix du riz au marché ?",
+    "Aide-moi à écrire un message d'anniversaire",
+]
+
+
+def _centroid(vectors: Sequence[Sequence[float]]) -> np.ndarray:
+    """Moyenne normalisée des vecteurs."""
+    mean = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm > 0 else mean
+
+
+class CentroidClassifier:
+    """Classifieur juridique / hors-sujet avec bande d'incertitude."""
+
+    def __init__(
+        self,
+        embed_documents: Callable[[List[str]], List[List[float]]],
+        legal_examples: Sequence[str] = LEGAL_EXAMPLES,
+        off_topic_examples: Sequence[str] = OFF_TOPIC_EXAMPLES,
+        band_low: Optional[float] = None,
+        band_high: float = 0.05,
+    ):
+        """
+        Args:
+            embed_documents: Fonction d'embedding (même modèle que les requêtes)
+            legal_examples: Exemples de questions juridiques
+            off_topic_examples: Exemples de questions hors-sujet
+            band_low: Marge en dessous de laquelle la question est hors-sujet
+                (None: jamais de décision AUTRE locale, escalade vers le LLM)
+            band_high: Marge au-dessus de laquelle la question est juridique
+        """
+        self.embed_documents = embed_documents
+        self.legal_examples = list(legal_examples)
+        self.off_topic_examples = list(off_topic_examples)
+        self.band_low = band_low
+        self.band_high = band_high
+
+        self._legal_centroid: Optional[np.ndarray] = None
+        self._off_topic_centroid: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+        self.juridique = 0
+        self.autre = 0
+        self.escalations = 0
+
+    def _ensure_centroids(self) -> None:
+        """Calcule les centroïdes au premier appel (un seul lot d'embeddings)."""
+        with self._lock:
+            if self._legal_centroid is not None:
+                return
+            vectors = self.embed_documents(self.legal_examples + self.off_topic_examples)
+            split = len(self.legal_examples)
+            self._legal_centroid = _centroid(vectors[:split])
+            self._off_topic_centroid = _centroid(vectors[split:])
+
+    def margin(self, embedding: Sequence[float]) -> float:
+        """Marge cos(juridique) - cos(hors-sujet) pour un embedding de question."""
+        self._ensure_centroids()
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        return float(np.dot(query, self._legal_centroid) - np.dot(query, self._off_topic_centroid))
+
+    def classify(self, embedding: Sequence[float]) -> Optional[str]:
+        """
+        Classe une question à partir de son embedding.
+
+        Returns:
+            "JURIDIQUE", "AUTRE" (seulement si `band_low` est fixé), ou None
+            si la décision revient au LLM (escalade)
+        """
+        margin = self.margin(embedding)
+        with self._lock:
+            if margin >= self.band_high:
+                self.juridique += 1
+                return "JURIDIQUE"
+            if self.band_low is not None and margin <= self.band_low:
+                self.autre += 1
+                return "AUTRE"
+            self.escalations += 1
+            return None
+
+    def stats(self) -> dict:
+        """Décisions locales et taux d'escalade vers le LLM."""
+        with self._lock:
+            total = self.juridique + self.autre + self.escalations
+            return {
+                "juridique": self.juridique,
+                "autre": self.autre,
+                "escalations": self.escalations,
+                "escalation_rate": round(self.escalations / total, 4) if total else 0.0,
+                "band": [self.band_low, self.band_high],
+            }
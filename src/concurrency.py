@@ -0,0 +1,166 @@
+"""
+Primitives de concurrence de l'API.
+
+`SingleFlight`: les requêtes concurrentes portant la même clé (ex: même
+question suggérée cliquée par plusieurs utilisateurs dans la même seconde)
+partagent une seule exécution du pipeline et reçoivent toutes son résultat.
+
+`InstrumentedExecutor`: pool de threads dimensionné explicitement, avec
+profondeur de file et temps d'attente. Le travail CPU des modèles
+(embeddings, Chroma, reranking) et les appels réseau bloquants ont chacun le
+leur: un pic de l'un ne prive plus l'autre de threads.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+from src.metrics import observe_stage
+
+logger = logging.getLogger("api")
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Regroupement des exécutions concurrentes identiques (event loop unique).
+
+    L'exécution partagée tourne dans sa propre tâche: l'annulation d'un
+    appelant (client déconnecté) n'interrompt pas les autres.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """
+        Exécute `func` ou rejoint l'exécution en cours pour la même clé.
+
+        Args:
+            key: Clé de regroupement
+            func: Fabrique de la coroutine à exécuter
+
+        Returns:
+            (résultat, True si l'appel a rejoint une exécution déjà en cours).
+            Une exception levée par l'exécution est propagée à tous les appelants.
+        """
+        task = self._in_flight.get(key)
+        shared = task is not None
+
+        if shared:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+
+        return await asyncio.shield(task), shared
+
+    def _on_done(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Marquer l'exception comme récupérée si tous les appelants sont partis
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """Statistiques de regroupement."""
+        total = self.executions + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+        }
+
+
+class InstrumentedExecutor:
+    """
+    Pool de threads borné avec métriques de file.
+
+    L'attente de chaque tâche (soumission -> démarrage) est enregistrée comme
+    étape `<nom>_queue` (histogramme et Server-Timing de la requête). Le
+    contexte de l'appelant (contextvars) est propagé au thread, comme avec
+    `asyncio.to_thread`.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        Args:
+            name: Nom du pool ("cpu", "io"), préfixe des métriques
+            max_workers: Nombre de threads
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._lock = threading.Lock()
+
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def submit(self, func: Callable[..., T], *args) -> "Future[T]":
+        """Soumet `func(*args)` au pool (dans le contexte de l'appelant)."""
+        context = contextvars.copy_context()
+        submitted_at = time.perf_counter()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def run() -> T:
+            wait = time.perf_counter() - submitted_at
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                context.run(observe_stage, f"{self.name}_queue", wait)
+                return context.run(func, *args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        future = self._executor.submit(run)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        # Tâche annulée avant son démarrage (appelant annulé): elle quitte la file
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Exécute `func(*args)` dans le pool et attend le résultat."""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def shutdown(self) -> None:
+        """Arrête le pool (tâches en attente annulées)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        """Profondeur de file, threads actifs et temps d'attente."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "max_queued": self.max_queued,
+                "mean_wait_ms": round(self.total_wait / self.completed * 1000, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
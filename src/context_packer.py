@@ -0,0 +1,154 @@
+"""
+Assemblage du contexte de génération sous budget de tokens.
+
+Le contexte était construit avec exactement trois documents coupés à 500
+caractères: budget gaspillé sur les chunks courts, articles longs coupés en
+pleine phrase. Le packer remplit un budget de tokens (compté avec un vrai
+tokenizer) avec les chunks dans l'ordre du reranking, et coupe le dernier à
+une frontière de phrase.
+
+Tokenizer: tiktoken `cl100k_base` (proche du tokenizer Llama 3 servi par
+Groq pour le français). Sans tiktoken, estimation à 4 caractères par token.
+L'encodage est chargé au premier comptage (son premier chargement télécharge
+le fichier BPE): importer le module ne fait aucun accès réseau.
+"""
+
+import functools
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# Fin de phrase: ponctuation forte suivie d'un espace, ou saut de ligne
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+SEPARATOR = "=" * 60
+
+
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    """Encodage tiktoken, chargé une seule fois (None en cas d'échec, également mis en cache)."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:  # tiktoken absent ou encodage non téléchargeable
+        logger.warning(f"⚠️ tiktoken indisponible ({e}): estimation du nombre de tokens")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens d'un texte."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def split_sentences(text: str) -> List[str]:
+    """Découpe un texte en phrases (ponctuation conservée)."""
+    return [sentence for sentence in SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Tronque un texte à `max_tokens` en s'arrêtant à une fin de phrase.
+
+    Si même la première phrase dépasse le budget, elle est coupée entre deux
+    mots (un extrait vaut mieux qu'une source vide).
+
+    Returns:
+        Texte tronqué
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    kept: List[str] = []
+    used = 0
+    for sentence in split_sentences(text):
+        # +1: espace séparateur
+        sentence_tokens = count_tokens(sentence) + 1
+        if used + sentence_tokens > max_tokens:
+            break
+        kept.append(sentence)
+        used += sentence_tokens
+
+    if not kept:
+        for word in text.split():
+            word_tokens = count_tokens(word) + 1
+            if used + word_tokens > max_tokens:
+                break
+            kept.append(word)
+            used += word_tokens
+    return " ".join(kept)
+
+
+@dataclass
+class PackedContext:
+    """Contexte assemblé et documents effectivement utilisés."""
+    text: str
+    documents: List[dict] = field(default_factory=list)
+    tokens: int = 0
+
+
+def format_header(idx: int, doc: dict) -> str:
+    """En-tête de source: numéro, titre, article et section."""
+    header = f"SOURCE {idx}: {doc['title']}"
+    if doc.get('article'):
+        header += f" - {doc['article']}"
+    if doc.get('breadcrumb'):
+        header += f" (Section: {doc['breadcrumb']})"
+    return header
+
+
+def pack_context(documents: List[dict], budget_tokens: int, min_chunk_tokens: int = 40) -> PackedContext:
+    """
+    Remplit le budget avec les documents, dans l'ordre (meilleur en premier).
+
+    Un document qui ne tient pas entièrement est tronqué à une fin de phrase
+    si au moins `min_chunk_tokens` restent disponibles; l'assemblage s'arrête
+    ensuite.
+
+    Args:
+        documents: Sources (clés title, article, breadcrumb; texte intégral
+            dans "text", sinon "content")
+        budget_tokens: Budget de tokens du contexte
+        min_chunk_tokens: Taille minimale utile d'un extrait tronqué
+
+    Returns:
+        PackedContext (texte, documents retenus, tokens utilisés)
+    """
+    parts: List[str] = []
+    used_docs: List[dict] = []
+    used = 0
+
+    for doc in documents:
+        idx = len(parts) + 1
+        prefix = f"{format_header(idx, doc)}\n{SEPARATOR}\n"
+        # Séparateur entre sources ("\n\n") compté avec l'en-tête
+        overhead = count_tokens(prefix) + (1 if parts else 0)
+        remaining = budget_tokens - used - overhead
+        if remaining < min_chunk_tokens:
+            break
+
+        content = (doc.get("text") or doc.get("content") or "").strip()
+        content_tokens = count_tokens(content)
+        truncated = content_tokens > remaining
+        if truncated:
+            content = trim_to_tokens(content, remaining - 1)
+            if not content:
+                break
+            content += "…"
+            content_tokens = count_tokens(content)
+
+        parts.append(prefix + content)
+        used_docs.append(doc)
+        used += overhead + content_tokens
+
+        if truncated:
+            break
+
+    return PackedContext(text="\n\n".join(parts), documents=used_docs, tokens=used)
@@ -0,0 +1,238 @@
+"""
+Historique des conversations côté serveur, par jeton de thread.
+
+/ask démarrait toujours le graphe avec `messages: []`: les questions de
+suivi n'avaient aucun contexte. Ce store conserve pour chaque thread un
+historique compact, déjà tronqué comme le prompt de génération l'utilise
+(derniers messages, questions et réponses coupées): le client n'a rien à
+renvoyer et le serveur rien à reparser.
+
+Un thread est désigné par un jeton opaque émis par le serveur (et non par
+le `thread_id` choisi par le client): la réponse renvoie `thread_token`,
+que le client présente à la question suivante. Un jeton inconnu ou expiré
+n'est jamais adopté: un nouveau jeton est émis.
+
+Éviction LRU (nombre de threads) et TTL (inactivité). Avec `spill_path`, les
+threads évincés par la limite de taille (et tous les threads à l'arrêt) sont
+écrits dans SQLite et rechargés à la demande. En mode `shared` (plusieurs
+workers uvicorn), SQLite est la seule source: chaque lecture et chaque
+écriture y passent, quel que soit le worker qui reçoit la requête.
+"""
+
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+
+@dataclass
+class _Conversation:
+    """Historique compact d'un thread: [(rôle, contenu tronqué), ...]."""
+    turns: List[Tuple[str, str]]
+    updated_at: float
+
+
+def new_thread_token() -> str:
+    """Jeton de thread opaque et non devinable."""
+    return secrets.token_urlsafe(24)
+
+
+class ConversationStore:
+    """Store LRU + TTL des historiques compacts, avec débordement SQLite optionnel."""
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        ttl_seconds: float = 3600,
+        max_messages: int = 4,
+        user_chars: int = 100,
+        assistant_chars: int = 150,
+        spill_path: Optional[Path] = None,
+        shared: bool = False,
+    ):
+        """
+        Args:
+            max_threads: Nombre maximum de threads en mémoire
+            ttl_seconds: Durée d'inactivité avant expiration d'un thread
+            max_messages: Messages conservés par thread (les plus récents)
+            user_chars: Longueur maximale conservée d'une question
+            assistant_chars: Longueur maximale conservée d'une réponse
+            spill_path: Fichier SQLite de débordement (désactivé si None)
+            shared: Threads lus et écrits directement dans SQLite, sans cache
+                mémoire (état partagé entre processus; spill_path requis)
+        """
+        if shared and not spill_path:
+            raise ValueError("Le mode partagé nécessite spill_path")
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.user_chars = user_chars
+        self.assistant_chars = assistant_chars
+        self.shared = shared
+
+        self._threads: OrderedDict[str, _Conversation] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._db: Optional[sqlite3.Connection] = None
+        if spill_path:
+            Path(spill_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(spill_path), check_same_thread=False, timeout=5)
+            # WAL: lectures des autres workers non bloquées par une écriture
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_threads ("
+                "thread_token TEXT PRIMARY KEY, turns TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+        self.spilled = 0
+        self.restored = 0
+        self.expired = 0
+        self.issued = 0
+
+    def _is_expired(self, conversation: _Conversation, now: float) -> bool:
+        return now - conversation.updated_at > self.ttl_seconds
+
+    def _load_spilled(self, token: str, now: float, keep: bool = False) -> Optional[_Conversation]:
+        """Recharge un thread écrit sur disque, retiré du disque sauf si `keep` (appelé sous verrou)."""
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT turns, updated_at FROM conversation_threads WHERE thread_token = ?", (token,)
+        ).fetchone()
+        if row is None:
+            return None
+        conversation = _Conversation([tuple(turn) for turn in json.loads(row[0])], row[1])
+        expired = self._is_expired(conversation, now)
+        if expired or not keep:
+            self._db.execute("DELETE FROM conversation_threads WHERE thread_token = ?", (token,))
+            self._db.commit()
+        if expired:
+            self.expired += 1
+            return None
+        if not keep:
+            self.restored += 1
+        return conversation
+
+    def _spill(self, entries: List[Tuple[str, _Conversation]]) -> None:
+        """Écrit des threads évincés sur disque (appelé sous verrou)."""
+        if self._db is None or not entries:
+            return
+        self._write(entries)
+        self.spilled += len(entries)
+
+    def _write(self, entries: List[Tuple[str, _Conversation]]) -> None:
+        """Écrit des threads dans SQLite (appelé sous verrou)."""
+        self._db.executemany(
+            "INSERT OR REPLACE INTO conversation_threads (thread_token, turns, updated_at) VALUES (?, ?, ?)",
+            [
+                (token, json.dumps(conversation.turns, ensure_ascii=False), conversation.updated_at)
+                for token, conversation in entries
+            ]
+        )
+        self._db.commit()
+
+    def _get(self, token: Optional[str], now: float) -> Optional[_Conversation]:
+        """Thread en mémoire ou rechargé du disque, None si absent/expiré (sous verrou)."""
+        if not token:
+            return None
+        if self.shared:
+            return self._load_spilled(token, now, keep=True)
+        conversation = self._threads.get(token)
+        if conversation is not None and self._is_expired(conversation, now):
+            del self._threads[token]
+            self.expired += 1
+            conversation = None
+        if conversation is None:
+            conversation = self._load_spilled(token, now)
+            if conversation is not None:
+                self._threads[token] = conversation
+        if conversation is not None:
+            self._threads.move_to_end(token)
+        return conversation
+
+    def messages(self, thread_token: Optional[str]) -> List[BaseMessage]:
+        """
+        Historique compact d'un thread, prêt à injecter dans l'état de l'agent.
+
+        Returns:
+            Liste de HumanMessage / AIMessage (vide sans jeton ou pour un jeton inconnu)
+        """
+        with self._lock:
+            conversation = self._get(thread_token, time.time())
+            turns = list(conversation.turns) if conversation else []
+
+        return [
+            HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+            for role, content in turns
+        ]
+
+    def append(self, thread_token: Optional[str], question: str, answer: str) -> str:
+        """
+        Ajoute un échange (question, réponse) tronqué à l'historique du thread.
+
+        Returns:
+            Jeton du thread: celui présenté s'il est connu, sinon un nouveau jeton
+        """
+        now = time.time()
+        with self._lock:
+            conversation = self._get(thread_token, now)
+            if conversation is None:
+                thread_token = new_thread_token()
+                conversation = _Conversation([], now)
+                if not self.shared:
+                    self._threads[thread_token] = conversation
+                self.issued += 1
+
+            conversation.turns.append(("user", question[:self.user_chars]))
+            conversation.turns.append(("assistant", answer[:self.assistant_chars]))
+            conversation.turns = conversation.turns[-self.max_messages:]
+            conversation.updated_at = now
+
+            if self.shared:
+                self._write([(thread_token, conversation)])
+                return thread_token
+
+            # Limiter le nombre de threads en mémoire (LRU), débordement sur disque
+            evicted = []
+            while len(self._threads) > self.max_threads:
+                evicted.append(self._threads.popitem(last=False))
+            self._spill([
+                (evicted_token, evicted_conversation) for evicted_token, evicted_conversation in evicted
+                if not self._is_expired(evicted_conversation, now)
+            ])
+        return thread_token
+
+    def close(self) -> None:
+        """Écrit les threads actifs sur disque (si activé) et ferme la base."""
+        if self._db is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._spill([
+                (token, conversation) for token, conversation in self._threads.items()
+                if not self._is_expired(conversation, now)
+            ])
+            # Purger les threads expirés sur disque
+            self._db.execute("DELETE FROM conversation_threads WHERE updated_at < ?", (now - self.ttl_seconds,))
+            self._db.commit()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        """Statistiques du store."""
+        with self._lock:
+            return {
+                "threads": len(self._threads),
+                "issued": self.issued,
+                "spilled": self.spilled,
+                "restored": self.restored,
+                "expired": self.expired,
+            }
@@ -0,0 +1,467 @@
+"""
+Embeddings des requêtes avec cache.
+
+Chaque `embed_query` exécute le modèle MiniLM sur CPU: la même requête
+(questions fréquentes, requêtes thématiques de la page d'accueil, cache
+sémantique puis recherche pour la même question) est recalculée à chaque
+appel. `CachedEmbeddings` enveloppe le modèle avec un cache LRU borné et
+thread-safe, et un niveau optionnel sur disque (SQLite) qui survit aux
+redémarrages.
+
+Deux backends servent le même modèle (sélection par `EMBEDDING_BACKEND`):
+- "torch": sentence-transformers / PyTorch (par défaut)
+- "onnx": export ONNX quantifié en int8 (quantification dynamique), exécuté
+  par ONNX Runtime sans charger PyTorch: RSS et latence réduits sur les
+  conteneurs 1 Go / 1-2 vCPU
+
+Les vecteurs int8 restent très proches des vecteurs torch (la base existante
+reste utilisable); pour un index parfaitement cohérent, ré-encoder la base.
+
+Usage:
+    python -m src.embeddings export [répertoire_modèle]
+        export + quantification ONNX
+    python -m src.embeddings reembed [chemin_base_chroma]
+        ré-encode la base avec EMBEDDING_BACKEND
+"""
+
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+EMBEDDING_MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+EMBEDDING_MAX_LENGTH = 128  # max_seq_length du modèle sentence-transformers
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()  # torch | onnx
+ONNX_MODEL_DIR = Path(
+    os.getenv("ONNX_MODEL_DIR", str(BASE_DIR / "data" / "models" / "minilm-onnx-int8"))
+)
+ONNX_MODEL_FILENAME = "model_quantized.onnx"
+
+
+def normalize_query_text(text: str) -> str:
+    """Normalise une requête pour servir de clé de cache (Unicode NFC, espaces)."""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Modèle MiniLM exporté en ONNX (int8) et exécuté par ONNX Runtime.
+
+    Reproduit le pipeline sentence-transformers: tokenisation (128 tokens max),
+    mean pooling masqué puis normalisation L2.
+    """
+
+    def __init__(
+        self,
+        model_dir: Path = ONNX_MODEL_DIR,
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+    ):
+        """
+        Args:
+            model_dir: Répertoire produit par `python -m src.embeddings export`
+            batch_size: Taille des lots d'encodage
+            num_threads: Threads intra-op (défaut: OMP_NUM_THREADS)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        self.batch_size = batch_size
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=EMBEDDING_MAX_LENGTH)
+        has_pad = self.tokenizer.token_to_id("<pad>") is not None
+        pad_token = "<pad>" if has_pad else "[PAD]"
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token
+        )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = (
+            num_threads or int(os.getenv("OMP_NUM_THREADS", "1"))
+        )
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_dir / ONNX_MODEL_FILENAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+
+        # Mean pooling sur les tokens réels, puis normalisation L2
+        mask = attention_mask[..., None].astype(np.float32)
+        token_counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = (token_embeddings * mask).sum(axis=1) / token_counts
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return pooled / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            vectors.extend(self._encode_batch(batch).tolist())
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode_batch([text])[0].tolist()
+
+
+def build_embedding_model(backend: Optional[str] = None) -> Embeddings:
+    """
+    Instancie le modèle d'embeddings du backend configuré.
+
+    Si le backend "onnx" est demandé mais que le modèle n'a pas été exporté
+    (ou qu'onnxruntime est absent), le backend torch est utilisé.
+
+    Args:
+        backend: "torch" ou "onnx" (défaut: EMBEDDING_BACKEND)
+
+    Returns:
+        Modèle d'embeddings LangChain
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+
+    if backend == "onnx":
+        try:
+            model = OnnxEmbeddings(ONNX_MODEL_DIR)
+            logger.info(f"✅ Embeddings ONNX int8 chargés ({ONNX_MODEL_DIR})")
+            return model
+        except Exception as e:
+            logger.warning(
+                f"⚠️ Backend ONNX indisponible ({type(e).__name__}: {e}), "
+                f"lancer `python -m src.embeddings export` - utilisation de torch"
+            )
+    elif backend != "torch":
+        logger.warning(
+            f"⚠️ EMBEDDING_BACKEND inconnu: {backend} - utilisation de torch"
+        )
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    return HuggingFaceEmbeddings(
+        model_name=EMBEDDING_MODEL_NAME,
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={
+            'normalize_embeddings': True,
+            'batch_size': 32
+        }
+    )
+
+
+def embedding_namespace(model: Embeddings) -> str:
+    """Identifiant modèle + backend (clé du cache disque)."""
+    if getattr(model, "namespace", None):
+        return model.namespace
+    backend = "onnx-int8" if isinstance(model, OnnxEmbeddings) else "torch"
+    return f"{EMBEDDING_MODEL_NAME}:{backend}"
+
+
+def export_onnx_model(output_dir: Path = ONNX_MODEL_DIR) -> Path:
+    """
+    Exporte le modèle en ONNX puis le quantifie en int8 (dynamique).
+
+    Nécessite `optimum[onnxruntime]` (uniquement pour l'export).
+
+    Args:
+        output_dir: Répertoire de sortie
+
+    Returns:
+        Chemin du modèle quantifié
+    """
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"🔄 Export ONNX de {EMBEDDING_MODEL_NAME}...")
+    model = ORTModelForFeatureExtraction.from_pretrained(
+        EMBEDDING_MODEL_NAME, export=True
+    )
+    model.save_pretrained(output_dir)
+    AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME).save_pretrained(output_dir)
+
+    logger.info("🔄 Quantification dynamique int8...")
+    quantizer = ORTQuantizer.from_pretrained(output_dir)
+    quantizer.quantize(
+        save_dir=output_dir,
+        quantization_config=AutoQuantizationConfig.avx2(
+            is_static=False, per_channel=False
+        )
+    )
+
+    model_path = output_dir / ONNX_MODEL_FILENAME
+    logger.info(f"✅ Modèle ONNX int8 exporté: {model_path}")
+    return model_path
+
+
+def _reembed_texts(collection, model: Embeddings, batch_size: int) -> int:
+    """Remplace les vecteurs d'une collection Chroma par ceux de `model`."""
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        texts = [doc or "" for doc in page["documents"]]
+        collection.update(ids=page["ids"], embeddings=model.embed_documents(texts))
+        done = min(offset + batch_size, total)
+        logger.info(f"   ⏳ {collection.name}: {done}/{total}")
+    return total
+
+
+def reembed_collection(
+    db_path: Path, backend: Optional[str] = None, batch_size: int = 256
+) -> int:
+    """
+    Ré-encode tous les chunks d'une base Chroma avec le backend choisi.
+
+    Les ids, textes et métadonnées sont conservés: seuls les vecteurs changent.
+    La banque de questions (collection annexe `question_bank`), comparée aux
+    embeddings des requêtes, est ré-encodée avec le même modèle. La version de
+    l'index est mise à jour (invalidation des caches de l'API).
+
+    Args:
+        db_path: Répertoire de la base Chroma
+        backend: Backend d'embeddings (défaut: EMBEDDING_BACKEND)
+        batch_size: Taille des lots lus et réécrits
+
+    Returns:
+        Nombre de chunks ré-encodés
+    """
+    import chromadb
+    from src.index_version import write_index_version
+    from src.question_bank import QUESTION_BANK_COLLECTION, SOURCE_COLLECTION
+
+    model = build_embedding_model(backend)
+    client = chromadb.PersistentClient(path=str(db_path))
+    collection = client.get_collection(SOURCE_COLLECTION)
+
+    logger.info(
+        f"🔄 Ré-encodage de {collection.count()} chunks "
+        f"({embedding_namespace(model)})..."
+    )
+    total = _reembed_texts(collection, model, batch_size)
+
+    try:
+        question_bank = client.get_collection(QUESTION_BANK_COLLECTION)
+    except Exception:
+        question_bank = None  # Banque non construite
+    if question_bank is not None:
+        questions = _reembed_texts(question_bank, model, batch_size)
+        logger.info(f"✅ Banque de questions ré-encodée ({questions} questions)")
+
+    write_index_version(db_path)
+    logger.info("✅ Base ré-encodée")
+    return total
+
+
+class _DiskEmbeddingStore:
+    """Niveau disque du cache: table SQLite (namespace, texte) -> vecteur float32."""
+
+    def __init__(self, path: Path, namespace: str):
+        self.namespace = namespace
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "namespace TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (namespace, text))"
+            )
+            self._conn.commit()
+
+    def get(self, text: str) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM query_embeddings WHERE namespace = ? AND text = ?",
+                (self.namespace, text)
+            ).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, text: str, vector: List[float]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (namespace, text, vector) "
+                "VALUES (?, ?, ?)",
+                (self.namespace, text, array("f", vector).tobytes())
+            )
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Enveloppe un modèle d'embeddings avec un cache des requêtes.
+
+    Seul `embed_query` est mis en cache: `embed_documents` (ingestion, lots)
+    est délégué tel quel.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_entries: int = 2048,
+        disk_path: Optional[Path] = None,
+        namespace: str = EMBEDDING_MODEL_NAME,
+    ):
+        """
+        Args:
+            embeddings: Modèle sous-jacent
+            max_entries: Taille maximale du cache mémoire (LRU)
+            disk_path: Fichier SQLite du niveau disque (désactivé si None)
+            namespace: Identifiant du modèle (les vecteurs de modèles différents
+                ne sont pas mélangés sur disque)
+        """
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, List[float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _DiskEmbeddingStore(disk_path, namespace) if disk_path else None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            # Limiter la taille du cache (LRU)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query_text(text)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+
+        if self._disk is not None:
+            vector = self._disk.get(key)
+            if vector is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, vector)
+                return list(vector)
+
+        # Calcul hors verrou: le modèle peut prendre plusieurs dizaines de ms
+        vector = self.embeddings.embed_query(key)
+        with self._lock:
+            self.misses += 1
+        self._remember(key, vector)
+        if self._disk is not None:
+            self._disk.put(key, vector)
+        return list(vector)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings de plusieurs requêtes: les absentes du cache sont calculées
+        en un seul lot (une passe du modèle).
+
+        Args:
+            texts: Requêtes
+
+        Returns:
+            Un vecteur par requête (même ordre)
+        """
+        keys = [normalize_query_text(text) for text in texts]
+        vectors: Dict[str, List[float]] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None and key not in vectors:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if self._disk is not None:
+            for key in list(missing):
+                vector = self._disk.get(key)
+                if vector is not None:
+                    with self._lock:
+                        self.disk_hits += 1
+                    self._remember(key, vector)
+                    vectors[key] = vector
+                    missing.remove(key)
+
+        if missing:
+            # Les requêtes sont encodées comme des documents
+            # (même modèle, même normalisation)
+            computed = self.embeddings.embed_documents(missing)
+            with self._lock:
+                self.misses += len(missing)
+            for key, vector in zip(missing, computed):
+                self._remember(key, vector)
+                if self._disk is not None:
+                    self._disk.put(key, vector)
+                vectors[key] = vector
+
+        return [list(vectors[key]) for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def stats(self) -> dict:
+        """Statistiques du cache."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "export":
+        export_onnx_model(Path(sys.argv[2]) if len(sys.argv) > 2 else ONNX_MODEL_DIR)
+    elif command == "reembed":
+        default_db_path = BASE_DIR / "data" / "chroma_db_with_web"
+        reembed_collection(Path(sys.argv[2]) if len(sys.argv) > 2 else default_db_path)
+    else:
+        print(
+            "Usage: python -m src.embeddings "
+            "export [répertoire_modèle] | reembed [chemin_base_chroma]"
+        )
+        sys.exit(1)
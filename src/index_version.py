@@ -0,0 +1,46 @@
+"""
+Marqueur de version de l'index vectoriel.
+
+`ingest_documents` reconstruit la collection Chroma dans un processus séparé.
+Il écrit un marqueur de version dans le répertoire de la base à chaque
+reconstruction; les caches en mémoire de l'API comparent cette version pour
+s'invalider automatiquement.
+"""
+
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+INDEX_VERSION_FILENAME = "index_version"
+
+
+def write_index_version(db_path: Path) -> str:
+    """
+    Écrit une nouvelle version d'index dans le répertoire de la base.
+
+    Args:
+        db_path: Répertoire de la base Chroma
+
+    Returns:
+        La version écrite
+    """
+    version = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+    (Path(db_path) / INDEX_VERSION_FILENAME).write_text(version, encoding="utf-8")
+    return version
+
+
+def read_index_version(db_path: Path) -> Optional[str]:
+    """
+    Lit la version courante de l'index.
+
+    Args:
+        db_path: Répertoire de la base Chroma
+
+    Returns:
+        La version, ou None si la base n'a pas encore de marqueur
+    """
+    try:
+        return (Path(db_path) / INDEX_VERSION_FILENAME).read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
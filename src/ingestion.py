@@ -9,18 +9,29 @@ from dotenv import load_dotenv
 from langchain_community.document_loaders import DirectoryLoader, PyPDFLoader, WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+import os
 import shutil
 import warnings
 import logging
 import re
 import gc
+import sys
 import time
 
+# Permettre l'exécution directe du script (python src/ingestion.py)
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.article_index import build_article_index
+from src.embeddings import build_embedding_model, embedding_namespace
+from src.index_version import write_index_version
+from src.lexical_index import build_lexical_index
+from src.question_bank import build_question_bank
+
 load_dotenv()
 
 # Configuration du logging
@@ -39,6 +50,12 @@ BASE_DIR = Path(__file__).resolve().parents[1]
 DATA_PATH = BASE_DIR / "data"
 DATA_DB_PATH = BASE_DIR / "data" / "chroma_db"
 
+# Banque de questions citoyennes (src/question_bank.py): un appel LLM par chunk
+# d'article à l'ingestion, puis aucune génération LLM pour les suggestions
+QUESTION_BANK_AT_INGEST = os.getenv("QUESTION_BANK_AT_INGEST", "false").lower() == "true"
+QUESTION_BANK_PER_CHUNK = int(os.getenv("QUESTION_BANK_PER_CHUNK", "3"))
+QUESTION_BANK_WORKERS = int(os.getenv("QUESTION_BANK_WORKERS", "4"))
+
 # =================================================================
 # MAPPING DES NOMS DE SOURCES OFFICIELS
 # =================================================================
@@ -810,12 +827,9 @@ def ingest_documents():
     # 5. CRÉATION DES EMBEDDINGS (Modèle multilingue optimisé)
     # =================================================================
     logger.info("🔄 Initialisation du modèle d'embeddings multilingue...")
-    embedding_model = HuggingFaceEmbeddings(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-    )
-    logger.info("✅ Modèle paraphrase-multilingual-MiniLM-L12-v2 chargé")
+    # Backend choisi par EMBEDDING_BACKEND (torch ou onnx), le même que l'API
+    embedding_model = build_embedding_model()
+    logger.info(f"✅ Modèle {embedding_namespace(embedding_model)} chargé")
     
     # =================================================================
     # 6. INSERTION PAR LOTS DANS CHROMADB
@@ -853,6 +867,39 @@ def ingest_documents():
         
         logger.info("✅ Base de données Chroma créée avec succès.")
         
+        # Index lexical BM25 (recherche hybride), construit depuis la collection
+        # pour partager les mêmes identifiants de chunks
+        try:
+            logger.info("🔄 Construction de l'index lexical BM25...")
+            build_lexical_index(db._collection, new_db_path)
+        except Exception as e:
+            logger.error(f"⚠️ Index BM25 non construit (recherche vectorielle seule): {e}")
+        
+        # Index direct (source, article) -> chunks pour les questions citant un article
+        try:
+            logger.info("🔄 Construction de l'index des articles...")
+            build_article_index(db._collection, new_db_path)
+        except Exception as e:
+            logger.error(f"⚠️ Index des articles non construit: {e}")
+        
+        # Questions citoyennes par article (suggestions sans appel LLM à la réponse)
+        if QUESTION_BANK_AT_INGEST:
+            try:
+                logger.info("🔄 Génération de la banque de questions...")
+                build_question_bank(
+                    db._collection,
+                    new_db_path,
+                    embedding_model,
+                    questions_per_chunk=QUESTION_BANK_PER_CHUNK,
+                    workers=QUESTION_BANK_WORKERS
+                )
+            except Exception as e:
+                logger.error(f"⚠️ Banque de questions non construite (suggestions par LLM): {e}")
+        
+        # Marquer la nouvelle version de l'index (invalide les caches de l'API)
+        index_version = write_index_version(new_db_path)
+        logger.info(f"   🏷️ Version de l'index: {index_version}")
+        
     except Exception as e:
         logger.error(f"❌ Erreur lors de la création: {e}")
         import traceback
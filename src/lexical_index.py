@@ -0,0 +1,334 @@
+"""
+Index lexical BM25 des chunks juridiques et recherche hybride.
+
+Les embeddings MiniLM lissent les termes exacts dont dépendent souvent les
+questions juridiques ("préavis", "L.2", "licenciement abusif"). Cet index
+inversé, construit à l'ingestion à partir des textes de la collection Chroma,
+est fusionné avec la recherche vectorielle par Reciprocal Rank Fusion (RRF)
+avant le reranking FlashRank.
+
+Format sur disque (répertoire `bm25/` à côté de la base Chroma):
+- meta.json: paramètres BM25, vocabulaire (terme -> indice) et ids des chunks
+- term_offsets.npy / posting_docs.npy / posting_weights.npy: listes de
+  postings au format CSR, chargées en memory-map au démarrage
+
+Les poids BM25 de chaque posting sont précalculés: une requête se réduit à
+quelques additions vectorielles.
+
+Usage (reconstruire l'index d'une base existante):
+    python -m src.lexical_index [chemin_base_chroma]
+"""
+
+import json
+import logging
+import re
+import sys
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+BM25_DIRNAME = "bm25"
+
+# Tokens: mots et références numérotées ("l.2", "l.56", "320")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+
+FRENCH_STOPWORDS = frozenset("""
+a ai au aux avec ce ces cet cette dans de des du elle en est et eux il ils je
+la le les leur lui ma mais me meme mes moi mon ne nos notre nous on ou par pas
+pour qu que qui sa se ses son sont sur ta te tes toi ton tu un une vos votre
+vous y d l j m n s t c quel quelle quels quelles
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découpe un texte en termes normalisés (minuscules, sans accents).
+
+    Args:
+        text: Texte à découper
+
+    Returns:
+        Liste de termes (mots vides exclus)
+    """
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    normalized = "".join(c for c in normalized if not unicodedata.combining(c))
+    return [
+        token for token in TOKEN_PATTERN.findall(normalized)
+        if token not in FRENCH_STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class BM25Index:
+    """Index inversé BM25 (postings CSR, poids précalculés)."""
+
+    def __init__(
+        self,
+        doc_ids: List[str],
+        vocabulary: Dict[str, int],
+        term_offsets: np.ndarray,
+        posting_docs: np.ndarray,
+        posting_weights: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.doc_ids = doc_ids
+        self.vocabulary = vocabulary
+        self.term_offsets = term_offsets
+        self.posting_docs = posting_docs
+        self.posting_weights = posting_weights
+        self.k1 = k1
+        self.b = b
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @classmethod
+    def build(cls, doc_ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """
+        Construit l'index à partir des textes des chunks.
+
+        Args:
+            doc_ids: Identifiants Chroma des chunks
+            texts: Contenus des chunks (même ordre)
+            k1: Saturation de la fréquence des termes
+            b: Normalisation par la longueur du document
+
+        Returns:
+            BM25Index
+        """
+        term_freqs: List[Counter] = [Counter(tokenize(text)) for text in texts]
+        doc_lengths = np.array([sum(tf.values()) for tf in term_freqs], dtype=np.float32)
+        avgdl = float(doc_lengths.mean()) if len(doc_lengths) and doc_lengths.mean() > 0 else 1.0
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for doc_idx, tf in enumerate(term_freqs):
+            for term, freq in tf.items():
+                postings.setdefault(term, []).append((doc_idx, freq))
+
+        vocabulary = {term: idx for idx, term in enumerate(sorted(postings))}
+        n_docs = len(texts)
+
+        term_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        for term, idx in vocabulary.items():
+            term_offsets[idx + 1] = len(postings[term])
+        term_offsets = np.cumsum(term_offsets)
+
+        posting_docs = np.empty(int(term_offsets[-1]), dtype=np.int32)
+        posting_weights = np.empty(int(term_offsets[-1]), dtype=np.float32)
+
+        for term, idx in vocabulary.items():
+            entries = postings[term]
+            start = term_offsets[idx]
+            docs = np.array([d for d, _ in entries], dtype=np.int32)
+            tfs = np.array([f for _, f in entries], dtype=np.float32)
+            # IDF BM25 (variante toujours positive)
+            idf = np.log(1.0 + (n_docs - len(entries) + 0.5) / (len(entries) + 0.5))
+            norm = k1 * (1.0 - b + b * doc_lengths[docs] / avgdl)
+            posting_docs[start:start + len(entries)] = docs
+            posting_weights[start:start + len(entries)] = idf * tfs * (k1 + 1.0) / (tfs + norm)
+
+        return cls(list(doc_ids), vocabulary, term_offsets, posting_docs, posting_weights, k1, b)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """
+        Recherche les chunks les plus pertinents pour une requête.
+
+        Args:
+            query: Texte de la requête
+            k: Nombre de résultats
+
+        Returns:
+            Liste de (id du chunk, score BM25) triée par score décroissant
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids or not self.doc_ids:
+            return []
+
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            # Un document apparaît au plus une fois par liste de postings
+            scores[self.posting_docs[start:end]] += self.posting_weights[start:end]
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in ranked]
+
+    def save(self, directory: Path) -> None:
+        """Sauvegarde l'index dans un répertoire."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        np.save(directory / "term_offsets.npy", self.term_offsets)
+        np.save(directory / "posting_docs.npy", self.posting_docs)
+        np.save(directory / "posting_weights.npy", self.posting_weights)
+        (directory / "meta.json").write_text(
+            json.dumps({
+                "k1": self.k1,
+                "b": self.b,
+                "doc_ids": self.doc_ids,
+                "vocabulary": self.vocabulary,
+            }, ensure_ascii=False),
+            encoding="utf-8"
+        )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "BM25Index":
+        """Charge un index sauvegardé (tableaux en memory-map par défaut)."""
+        directory = Path(directory)
+        mmap_mode = "r" if mmap else None
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        return cls(
+            doc_ids=meta["doc_ids"],
+            vocabulary=meta["vocabulary"],
+            term_offsets=np.load(directory / "term_offsets.npy", mmap_mode=mmap_mode),
+            posting_docs=np.load(directory / "posting_docs.npy", mmap_mode=mmap_mode),
+            posting_weights=np.load(directory / "posting_weights.npy", mmap_mode=mmap_mode),
+            k1=meta["k1"],
+            b=meta["b"],
+        )
+
+
+def build_lexical_index(collection, db_path: Path, batch_size: int = 1000) -> BM25Index:
+    """
+    Construit et sauvegarde l'index BM25 d'une collection Chroma.
+
+    Args:
+        collection: Collection chromadb (ex: Chroma(...)._collection)
+        db_path: Répertoire de la base (l'index est écrit dans db_path/bm25)
+        batch_size: Taille des pages lues dans la collection
+
+    Returns:
+        L'index construit
+    """
+    doc_ids: List[str] = []
+    texts: List[str] = []
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(include=["documents"], limit=batch_size, offset=offset)
+        doc_ids.extend(page["ids"])
+        texts.extend(doc or "" for doc in page["documents"])
+
+    index = BM25Index.build(doc_ids, texts)
+    index.save(Path(db_path) / BM25_DIRNAME)
+    logger.info(f"✅ Index BM25 construit: {len(doc_ids)} chunks, {len(index.vocabulary)} termes")
+    return index
+
+
+def load_lexical_index(db_path: Path) -> Optional[BM25Index]:
+    """Charge l'index BM25 d'une base, ou None s'il n'a pas été construit."""
+    directory = Path(db_path) / BM25_DIRNAME
+    if not (directory / "meta.json").exists():
+        return None
+    try:
+        return BM25Index.load(directory)
+    except Exception as e:
+        logger.warning(f"⚠️ Index BM25 illisible ({directory}): {e}")
+        return None
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Document]], k: int = 60) -> List[Document]:
+    """
+    Fusionne plusieurs classements par Reciprocal Rank Fusion.
+
+    score(d) = somme sur les classements de 1 / (k + rang(d))
+
+    Args:
+        result_lists: Classements de documents (meilleur en premier)
+        k: Constante d'amortissement RRF (60 dans l'article original)
+
+    Returns:
+        Documents uniques triés par score RRF décroissant
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+
+    return [documents[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """Retriever fusionnant la recherche vectorielle Chroma et BM25 (RRF)."""
+
+    vectorstore: Any
+    lexical_index: Any
+    k: int = 10
+    fetch_k: int = 10
+    rrf_k: int = 60
+
+    def _lexical_documents(self, query: str) -> List[Document]:
+        """Résultats BM25 convertis en Documents (ordre du classement conservé)."""
+        hits = self.lexical_index.search(query, self.fetch_k)
+        if not hits:
+            return []
+        ids = [doc_id for doc_id, _ in hits]
+        by_id = {doc.id: doc for doc in self.vectorstore.get_by_ids(ids)}
+        return [by_id[doc_id] for doc_id in ids if doc_id in by_id]
+
+    def fuse_many(self, queries: Sequence[str], dense_results: Sequence[List[Document]]) -> List[List[Document]]:
+        """
+        Fusionne des résultats vectoriels déjà calculés avec BM25, pour plusieurs requêtes.
+
+        Les documents BM25 de toutes les requêtes sont lus en un seul `get_by_ids`.
+
+        Args:
+            queries: Requêtes
+            dense_results: Résultats vectoriels de chaque requête (même ordre)
+
+        Returns:
+            Un classement fusionné (RRF) par requête
+        """
+        try:
+            hits = [self.lexical_index.search(query, self.fetch_k) for query in queries]
+            ids = list(dict.fromkeys(doc_id for query_hits in hits for doc_id, _ in query_hits))
+            by_id = {doc.id: doc for doc in self.vectorstore.get_by_ids(ids)} if ids else {}
+        except Exception as e:
+            logger.warning(f"⚠️ Recherche BM25 indisponible: {e}")
+            return [list(dense)[:self.k] for dense in dense_results]
+
+        return [
+            reciprocal_rank_fusion(
+                [dense, [by_id[doc_id] for doc_id, _ in query_hits if doc_id in by_id]],
+                k=self.rrf_k
+            )[:self.k]
+            for dense, query_hits in zip(dense_results, hits)
+        ]
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense = self.vectorstore.similarity_search(query, k=self.fetch_k)
+        try:
+            lexical = self._lexical_documents(query)
+        except Exception as e:
+            logger.warning(f"⚠️ Recherche BM25 indisponible: {e}")
+            lexical = []
+        return reciprocal_rank_fusion([dense, lexical], k=self.rrf_k)[:self.k]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    import chromadb
+
+    default_db_path = Path(__file__).resolve().parents[1] / "data" / "chroma_db_with_web"
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_db_path
+
+    client = chromadb.PersistentClient(path=str(db_path))
+    build_lexical_index(client.get_collection("juridiction_senegal"), db_path)
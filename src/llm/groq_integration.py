@@ -4,6 +4,7 @@ Utilise le middleware de crédits pour gérer automatiquement les coûts
 """
 
 import logging
+import os
 from typing import Optional, Dict, Any, List
 from groq import Groq
 
@@ -12,12 +13,15 @@ from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# API compatible Groq/OpenAI alternative (ex: benchmarks/mock_groq.py)
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+
 
 class GroqWithCredits:
     """Client Groq avec gestion automatique des crédits"""
 
     def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
+        self.client = Groq(api_key=api_key, base_url=GROQ_BASE_URL)
         self.model = "llama-3-8b-instant"  # Modèle optimisé pour les coûts
 
     @credit_middleware.wrap_llm_call
@@ -0,0 +1,209 @@
+"""
+Métriques de latence par étape et compteurs d'événements (format Prometheus).
+
+Le middleware de logs ne donnait que le temps total des requêtes de plus
+d'une seconde: impossible de savoir si une requête lente avait attendu la
+classification, l'embedding, Chroma, FlashRank, la génération ou les
+suggestions. Chaque étape est mesurée par `stage_timer`:
+
+    with stage_timer("rerank"):
+        docs = rerank_documents(docs, question)
+
+- histogramme `yoonassist_stage_duration_seconds{stage=...}` (processus);
+- durées de la requête en cours (contextvar) reprises dans l'en-tête
+  `Server-Timing` par `ServerTimingMiddleware` (src/middleware.py).
+
+Les événements (cache, fallbacks, timeouts) sont comptés par `record_event`.
+Le registre est implémenté ici (pas de dépendance prometheus_client):
+quelques histogrammes et compteurs suffisent.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+
+METRIC_PREFIX = "yoonassist"
+
+# Bornes (secondes): du cache mémoire (ms) à la génération 70B (dizaines de s)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Durées (ms) des étapes de la requête en cours, pour l'en-tête Server-Timing.
+# Le dict est partagé avec les tâches et threads (asyncio.to_thread, pools de
+# src/concurrency.py) créés pendant la requête, qui héritent du contexte.
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Histogramme cumulatif à étiquettes (thread-safe)."""
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(buckets))
+        # étiquettes -> [compteurs par borne..., +Inf], somme
+        self._series: Dict[Tuple[Tuple[str, str], ...], Tuple[list, list]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            counts, total = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += 1
+            total[0] += value
+
+    def summary(self) -> Dict[str, dict]:
+        """Nombre d'observations et moyenne par série (pour /stats)."""
+        with self._lock:
+            return {
+                ",".join(f"{k}={v}" for k, v in key) or "all": {
+                    "count": counts[-1],
+                    "mean_seconds": round(total[0] / counts[-1], 4) if counts[-1] else 0.0,
+                }
+                for key, (counts, total) in self._series.items()
+            }
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, counts):
+                    labels = _format_labels(key + (("le", _format_value(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {counts[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+        return "\n".join(lines)
+
+
+class Counter:
+    """Compteur monotone à étiquettes (thread-safe)."""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[str, float]:
+        with self._lock:
+            return {",".join(f"{k}={v}" for k, v in key) or "all": value for key, value in self._values.items()}
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+# =============================================================================
+# MÉTRIQUES DE L'API
+# =============================================================================
+
+STAGE_DURATION = Histogram(
+    f"{METRIC_PREFIX}_stage_duration_seconds",
+    "Durée des étapes du pipeline (nœuds LangGraph et appels externes)."
+)
+REQUEST_DURATION = Histogram(
+    f"{METRIC_PREFIX}_http_request_duration_seconds",
+    "Durée des requêtes HTTP par route."
+)
+EVENTS = Counter(
+    f"{METRIC_PREFIX}_events_total",
+    "Événements du pipeline: cache, fallbacks, erreurs et timeouts."
+)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Enregistre la durée d'une étape (histogramme + Server-Timing de la requête)."""
+    STAGE_DURATION.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds * 1000
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Mesure la durée du bloc (exceptions comprises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def record_event(event: str, amount: int = 1) -> None:
+    """Incrémente le compteur d'un événement (ex: answer_cache_hit, rerank_fallback)."""
+    EVENTS.inc(amount, event=event)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Active la collecte des durées pour la requête (contexte) courante."""
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Valeur de l'en-tête Server-Timing: `classify;dur=12.3, retrieve;dur=45.0`."""
+    return ", ".join(f"{stage};dur={duration:.1f}" for stage, duration in timings.items())
+
+
+def _gauge_lines(name: str, value: float) -> str:
+    return f"# TYPE {name} gauge\n{name} {_format_value(value)}"
+
+
+def render_metrics(gauges: Optional[Dict[str, dict]] = None) -> str:
+    """
+    Exposition au format texte Prometheus.
+
+    Args:
+        gauges: Statistiques internes par section ({"answer_cache": {"hits": 3}, ...});
+            chaque valeur numérique devient une jauge `yoonassist_<section>_<clé>`
+
+    Returns:
+        Texte Prometheus (version 0.0.4)
+    """
+    blocks = [STAGE_DURATION.render(), REQUEST_DURATION.render(), EVENTS.render()]
+    for section, values in (gauges or {}).items():
+        for key, value in values.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            blocks.append(_gauge_lines(f"{METRIC_PREFIX}_{section}_{key}", value))
+    return "\n".join(blocks) + "\n"
+
+
+def metrics_summary() -> dict:
+    """Résumé JSON (nombre d'appels et durée moyenne par étape, compteurs)."""
+    return {
+        "stages": STAGE_DURATION.summary(),
+        "events": EVENTS.values(),
+    }
@@ -10,6 +10,7 @@ from fastapi.middleware.gzip import GZipMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 from .security import rate_limit_check, get_client_id
+from .metrics import REQUEST_DURATION, format_server_timing, start_request_timings
 
 logger = logging.getLogger("api")
 
@@ -45,7 +46,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
     
     async def dispatch(self, request: Request, call_next):
         # Ignorer le rate limiting pour les routes de santé
-        if request.url.path in ["/health", "/docs", "/openapi.json", "/redoc"]:
+        if request.url.path in ["/health", "/ready", "/metrics", "/docs", "/openapi.json", "/redoc"]:
             return await call_next(request)
         
         client_id = get_client_id(request)
@@ -113,4 +114,34 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
                 f"{response.status_code} - {process_time:.3f}s"
             )
         
-        return response
\ No newline at end of file
+        return response
+
+
+class ServerTimingMiddleware(BaseHTTPMiddleware):
+    """
+    Mesure la durée des requêtes par route et ajoute l'en-tête Server-Timing
+    (durées des étapes du pipeline enregistrées pendant la requête).
+
+    Pour /ask/stream, seules les étapes terminées avant l'envoi des en-têtes
+    y figurent; l'histogramme reçoit toutes les étapes.
+    """
+    
+    async def dispatch(self, request: Request, call_next):
+        start_time = time.perf_counter()
+        timings = start_request_timings()
+        
+        response = await call_next(request)
+        
+        process_time = time.perf_counter() - start_time
+        # Gabarit de la route (pas le chemin brut) pour borner le nombre de séries
+        route = request.scope.get("route")
+        REQUEST_DURATION.observe(
+            process_time,
+            route=getattr(route, "path", "other"),
+            method=request.method,
+            status=str(response.status_code)
+        )
+        
+        timings["total"] = process_time * 1000
+        response.headers["Server-Timing"] = format_server_timing(timings)
+        return response
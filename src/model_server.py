@@ -0,0 +1,357 @@
+"""
+Serveur de modèles local (embeddings + reranking) sur socket Unix.
+
+Chaque worker uvicorn chargeait sa propre copie de MiniLM et de FlashRank:
+dans un conteneur de 1 Go, l'API était limitée à un seul worker
+(WEB_CONCURRENCY=1). Ce processus possède une unique copie des modèles et
+sert tous les workers; les requêtes concurrentes sont regroupées en lots
+(embeddings et reranking) avant chaque appel aux modèles. L'état de l'API
+consulté d'un worker à l'autre (conversations, suggestions) passe alors par
+SQLite (voir src/server.py).
+
+Protocole: messages JSON préfixés par leur longueur (4 octets, big-endian).
+    {"op": "embed", "texts": [...]}     -> {"vectors": [[...], ...]}
+    {"op": "rerank", "query": "...", "passages": [...]}
+                                        -> {"scores": [...]}
+    {"op": "stats"}                     -> {"embedding_cache": {...},
+                                            "rerank_batcher": {...}}
+    {"op": "ping"}                      -> {"ok": true}
+    erreur                              -> {"error": "..."}
+
+Usage:
+    python -m src.model_server [--socket /tmp/yoonassist-models.sock]
+puis, côté API: MODEL_SERVER_SOCKET=/tmp/yoonassist-models.sock
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# Permettre l'exécution directe du script (python src/model_server.py)
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.embeddings import (
+    CachedEmbeddings,
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL_NAME,
+    build_embedding_model,
+    embedding_namespace,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/yoonassist-models.sock"
+HEADER = struct.Struct(">I")
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+
+# =============================================================================
+# PROTOCOLE
+# =============================================================================
+
+def _encode(message: dict) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return HEADER.pack(len(payload)) + payload
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Connexion au serveur de modèles fermée")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+async def _read_message(reader: asyncio.StreamReader) -> dict:
+    (size,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"Message trop volumineux ({size} octets)")
+    return json.loads(await reader.readexactly(size))
+
+
+# =============================================================================
+# CLIENT (workers de l'API)
+# =============================================================================
+
+class ModelServerClient:
+    """Client synchrone (une connexion par thread, reconnexion automatique)."""
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float = 30):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    def call(self, message: dict) -> dict:
+        """
+        Envoie une requête et attend la réponse.
+
+        Une seule nouvelle tentative, et uniquement si la requête n'a pas pu
+        être transmise (connexion impossible, ou connexion réutilisée déjà
+        fermée par le serveur). Après l'envoi, une erreur ou un timeout est
+        propagé: le serveur traite peut-être encore la requête.
+        """
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(_encode(message))
+            except (ConnectionError, FileNotFoundError, socket.timeout):
+                self._close()
+                if attempt:
+                    raise
+                continue
+            try:
+                (size,) = HEADER.unpack(_recv_exact(sock, HEADER.size))
+                response = json.loads(_recv_exact(sock, size))
+            except Exception:
+                # Réponse perdue: la connexion est abandonnée, pas de renvoi
+                self._close()
+                raise
+            break
+        if "error" in response:
+            raise RuntimeError(f"Serveur de modèles: {response['error']}")
+        return response
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.call({"op": "embed", "texts": list(texts)})["vectors"]
+
+    def rerank(self, query: str, passages: List[str]) -> List[float]:
+        message = {"op": "rerank", "query": query, "passages": list(passages)}
+        return self.call(message)["scores"]
+
+    def stats(self) -> dict:
+        return self.call({"op": "stats"})
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings calculés par le serveur de modèles."""
+
+    def __init__(self, client: ModelServerClient):
+        self.client = client
+        # Clé du cache disque local: vecteurs du backend configuré côté serveur
+        self.namespace = f"{EMBEDDING_MODEL_NAME}:remote-{EMBEDDING_BACKEND}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.client.embed(texts) if texts else []
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.client.embed([text])[0]
+
+
+class RemoteReranker:
+    """Reranker distant, même interface que FlashrankRerank pour l'agent."""
+
+    def __init__(self, client: ModelServerClient, top_n: int = 3):
+        self.client = client
+        self.top_n = top_n
+
+    def compress_documents(
+        self, documents: List[Document], query: str
+    ) -> List[Document]:
+        if not documents:
+            return []
+        scores = self.client.rerank(query, [doc.page_content for doc in documents])
+        ranked = sorted(zip(documents, scores), key=lambda item: item[1], reverse=True)
+        results = []
+        for doc, score in ranked[:self.top_n]:
+            metadata = dict(doc.metadata)
+            metadata["relevance_score"] = float(score)
+            results.append(
+                Document(id=doc.id, page_content=doc.page_content, metadata=metadata)
+            )
+        return results
+
+
+# =============================================================================
+# SERVEUR
+# =============================================================================
+
+class ModelServer:
+    """Possède les modèles et sert les requêtes des workers par lots."""
+
+    def __init__(
+        self, socket_path: str, max_batch_size: int = 64, max_wait_ms: float = 5
+    ):
+        from src.reranking import RerankBatcher
+        from langchain_community.document_compressors import FlashrankRerank
+
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        model = build_embedding_model()
+        self.embeddings = CachedEmbeddings(model, namespace=embedding_namespace(model))
+        self.rerank_batcher = RerankBatcher(
+            FlashrankRerank(top_n=3, model="ms-marco-MiniLM-L-12-v2"),
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms
+        )
+        self._embed_queue: Optional[asyncio.Queue] = None
+
+    async def serve(self) -> None:
+        """Démarre le serveur (jusqu'à interruption)."""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        self._embed_queue = asyncio.Queue()
+        batch_task = asyncio.create_task(self._embed_loop())
+
+        server = await asyncio.start_unix_server(
+            self._handle_connection, path=self.socket_path
+        )
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"🧠 Serveur de modèles prêt: {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                try:
+                    message = await _read_message(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    response = await self._dispatch(message)
+                except Exception as e:
+                    response = {"error": f"{type(e).__name__}: {e}"}
+                writer.write(_encode(response))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, message: dict) -> dict:
+        op = message.get("op")
+        if op == "embed":
+            future = asyncio.get_running_loop().create_future()
+            await self._embed_queue.put((list(message["texts"]), future))
+            return {"vectors": await future}
+        if op == "rerank":
+            passages = message["passages"]
+            query = message["query"]
+            docs = [
+                Document(id=str(i), page_content=text)
+                for i, text in enumerate(passages)
+            ]
+            # Dépôt non bloquant: la taille des lots suit le nombre de
+            # connexions concurrentes
+            future = self.rerank_batcher.submit(query, docs, len(docs))
+            try:
+                ranked = await asyncio.wait_for(
+                    asyncio.wrap_future(future), timeout=self.rerank_batcher.timeout
+                )
+            except Exception as e:
+                ranked = await asyncio.to_thread(
+                    self.rerank_batcher.fallback, query, docs, e, len(docs)
+                )
+            scores = [0.0] * len(passages)
+            for doc in ranked:
+                scores[int(doc.id)] = doc.metadata["relevance_score"]
+            return {"scores": scores}
+        if op == "stats":
+            return {
+                "embedding_cache": self.embeddings.stats(),
+                "rerank_batcher": self.rerank_batcher.stats(),
+            }
+        if op == "ping":
+            return {"ok": True}
+        raise ValueError(f"Opération inconnue: {op}")
+
+    async def _embed_loop(self) -> None:
+        """Regroupe les demandes d'embeddings concurrentes en un appel au modèle."""
+        loop = asyncio.get_running_loop()
+        while True:
+            first = await self._embed_queue.get()
+            batch: List[Tuple[List[str], asyncio.Future]] = [first]
+            text_count = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while text_count < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(
+                        self._embed_queue.get(), timeout=remaining
+                    )
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                text_count += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await asyncio.to_thread(self.embeddings.embed_queries, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Serveur de modèles (embeddings + reranking)"
+    )
+    parser.add_argument(
+        "--socket", default=os.getenv("MODEL_SERVER_SOCKET", DEFAULT_SOCKET_PATH)
+    )
+    parser.add_argument(
+        "--max-batch", type=int, default=int(os.getenv("RERANK_MAX_BATCH", "64"))
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=float(os.getenv("RERANK_MAX_WAIT_MS", "5")),
+    )
+    args = parser.parse_args()
+
+    asyncio.run(ModelServer(args.socket, args.max_batch, args.max_wait_ms).serve())
@@ -0,0 +1,261 @@
+"""
+Banque de questions citoyennes construite à l'ingestion.
+
+`agenerate_suggested_questions` faisait un appel au modèle 70B par réponse
+pour proposer trois questions de suivi. À l'ingestion (option
+QUESTION_BANK_AT_INGEST), quelques questions citoyennes sont générées pour
+chaque chunk d'article et stockées avec leur embedding dans une collection
+Chroma annexe (`question_bank`, métadonnée `chunk_id`).
+
+À la réponse, les suggestions sont les questions rattachées aux chunks
+retenus, classées par proximité avec la question posée, sans ses
+quasi-doublons (similarité cosinus >= seuil) ni doublons entre elles:
+aucun appel LLM.
+
+Usage (construire la banque d'une base existante, GROQ_API_KEY requis):
+    python -m src.question_bank [chemin_base_chroma]
+"""
+
+import logging
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.prompts import ChatPromptTemplate
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_COLLECTION = "question_bank"
+SOURCE_COLLECTION = "juridiction_senegal"
+
+# Chunks produits par SenegalLegalChunker pour les articles de loi
+ARTICLE_CHUNK_TYPES = ("article_complet", "article_partiel")
+
+# Modèle de génération (hors ligne: le modèle rapide suffit pour des questions courtes)
+QUESTION_BANK_MODEL = os.getenv("QUESTION_BANK_MODEL", "llama-3.1-8b-instant")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")
+
+CHUNK_QUESTIONS_PROMPT = ChatPromptTemplate.from_template(
+    """Tu es un assistant juridique sénégalais. \
+Voici un extrait de {source} ({article}):
+
+{content}
+
+Écris {count} questions courtes qu'un citoyen sénégalais pourrait poser \
+et auxquelles cet extrait répond.
+Questions en français simple, une par ligne, sans numérotation ni tirets."""
+)
+
+# Puces ou numérotation en tête de ligne ("1.", "2)", "-", "•")
+LIST_PREFIX = re.compile(r"^\s*(?:\d+\s*[.)]|[-*•])\s*")
+
+
+def _parse_questions(content: str, count: int) -> List[str]:
+    """Questions valides de la sortie du LLM (une par ligne)."""
+    questions = []
+    for line in content.strip().split("\n"):
+        question = LIST_PREFIX.sub("", line).strip()
+        if 10 <= len(question) <= 200 and question.endswith("?"):
+            questions.append(question)
+    return list(dict.fromkeys(questions))[:count]
+
+
+class QuestionBank:
+    """Questions citoyennes rattachées aux chunks (collection Chroma annexe)."""
+
+    def __init__(self, collection, duplicate_threshold: float = 0.9):
+        """
+        Args:
+            collection: Collection chromadb `question_bank`
+            duplicate_threshold: Similarité cosinus à partir de laquelle deux
+                questions sont considérées comme des quasi-doublons
+        """
+        self.collection = collection
+        self.duplicate_threshold = duplicate_threshold
+
+    def __len__(self) -> int:
+        return self.collection.count()
+
+    def suggest(
+        self,
+        question_embedding: Sequence[float],
+        chunk_ids: Sequence[str],
+        count: int = 3,
+    ) -> List[str]:
+        """
+        Questions de suivi pour une réponse.
+
+        Args:
+            question_embedding: Embedding de la question posée
+            chunk_ids: Ids des chunks ayant servi à la réponse
+            count: Nombre maximum de questions
+
+        Returns:
+            Questions les plus proches de la question posée, hors quasi-doublons
+            (liste vide si aucune question n'est rattachée à ces chunks)
+        """
+        chunk_ids = [chunk_id for chunk_id in dict.fromkeys(chunk_ids) if chunk_id]
+        if not chunk_ids:
+            return []
+
+        page = self.collection.get(
+            where={"chunk_id": {"$in": chunk_ids}},
+            include=["documents", "embeddings"]
+        )
+        if not page["ids"]:
+            return []
+
+        vectors = np.asarray(page["embeddings"], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12
+        query = np.asarray(question_embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) + 1e-12
+        similarities = vectors @ query
+
+        picked: List[int] = []
+        for index in np.argsort(-similarities):
+            if similarities[index] >= self.duplicate_threshold:
+                # Reformulation de la question posée
+                continue
+            if any(
+                vectors[index] @ vectors[other] >= self.duplicate_threshold
+                for other in picked
+            ):
+                continue
+            picked.append(int(index))
+            if len(picked) == count:
+                break
+        return [page["documents"][index] for index in picked]
+
+
+def build_question_bank(
+    collection,
+    db_path: Path,
+    embedding_model,
+    questions_per_chunk: int = 3,
+    workers: int = 4,
+    batch_size: int = 500,
+) -> int:
+    """
+    Génère et stocke les questions citoyennes des chunks d'articles.
+
+    Args:
+        collection: Collection chromadb des chunks (ex: Chroma(...)._collection)
+        db_path: Répertoire de la base (la collection annexe y est créée)
+        embedding_model: Modèle d'embeddings de la base (même espace que les requêtes)
+        questions_per_chunk: Questions générées par chunk
+        workers: Appels LLM simultanés
+        batch_size: Taille des pages lues et des lots insérés
+
+    Returns:
+        Nombre de questions stockées
+    """
+    from langchain_chroma import Chroma
+    from langchain_groq import ChatGroq
+
+    chunks = []
+    total = collection.count()
+    for offset in range(0, total, batch_size):
+        page = collection.get(
+            include=["documents", "metadatas"], limit=batch_size, offset=offset
+        )
+        rows = zip(page["ids"], page["documents"], page["metadatas"])
+        for chunk_id, text, metadata in rows:
+            metadata = metadata or {}
+            if text and metadata.get("chunk_type") in ARTICLE_CHUNK_TYPES:
+                chunks.append((chunk_id, text, metadata))
+    logger.info(f"   📄 {len(chunks)} chunks d'articles sur {total}")
+
+    llm = ChatGroq(
+        model_name=QUESTION_BANK_MODEL,
+        temperature=0.3,
+        max_tokens=300,
+        timeout=30,
+        base_url=GROQ_BASE_URL
+    )
+    chain = CHUNK_QUESTIONS_PROMPT | llm
+
+    def generate(chunk: tuple) -> List[str]:
+        _, text, metadata = chunk
+        try:
+            result = chain.invoke({
+                "source": metadata.get("source_name", "la loi"),
+                "article": metadata.get("article", ""),
+                "content": text[:2000],
+                "count": questions_per_chunk,
+            })
+            return _parse_questions(result.content, questions_per_chunk)
+        except Exception as e:
+            article = metadata.get("article", "?")
+            logger.warning(f"⚠️ Questions non générées pour {article}: {e}")
+            return []
+
+    texts: List[str] = []
+    metadatas: List[dict] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = zip(chunks, pool.map(generate, chunks))
+        for done, (chunk, questions) in enumerate(results, 1):
+            chunk_id, _, metadata = chunk
+            for question in questions:
+                texts.append(question)
+                metadatas.append({
+                    "chunk_id": chunk_id,
+                    "source_name": metadata.get("source_name", ""),
+                    "article": metadata.get("article", ""),
+                })
+            if done % 100 == 0:
+                logger.info(f"   ⏳ {done}/{len(chunks)} chunks, {len(texts)} questions")
+
+    bank = Chroma(
+        persist_directory=str(db_path),
+        embedding_function=embedding_model,
+        collection_name=QUESTION_BANK_COLLECTION,
+    )
+    bank.reset_collection()
+    for start in range(0, len(texts), batch_size):
+        end = start + batch_size
+        bank.add_texts(texts[start:end], metadatas=metadatas[start:end])
+
+    logger.info(
+        f"✅ Banque de questions construite: "
+        f"{len(texts)} questions pour {len(chunks)} chunks"
+    )
+    return len(texts)
+
+
+def load_question_bank(
+    client, duplicate_threshold: float = 0.9
+) -> Optional[QuestionBank]:
+    """Banque de questions de la base, ou None si elle n'a pas été construite."""
+    try:
+        collection = client.get_collection(QUESTION_BANK_COLLECTION)
+    except Exception:
+        return None
+    if collection.count() == 0:
+        return None
+    return QuestionBank(collection, duplicate_threshold)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    import chromadb
+
+    from src.embeddings import build_embedding_model
+
+    base_dir = Path(__file__).resolve().parents[1]
+    default_db_path = base_dir / "data" / "chroma_db_with_web"
+    db_path = Path(sys.argv[1]) if len(sys.argv) > 1 else default_db_path
+
+    client = chromadb.PersistentClient(path=str(db_path))
+    build_question_bank(
+        client.get_collection(SOURCE_COLLECTION), db_path, build_embedding_model()
+    )
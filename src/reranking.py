@@ -0,0 +1,209 @@
+"""
+Micro-batching du reranker FlashRank entre requêtes concurrentes.
+
+Chaque requête rerankait seule ses ~10 documents: sous charge, de nombreux
+petits appels au cross-encoder se disputent le même cœur. `RerankBatcher`
+collecte pendant quelques millisecondes les paires (question, passage) des
+requêtes concurrentes, les score en un seul appel ONNX Runtime, puis rend à
+chaque appelant son propre classement.
+
+Les demandes sont déposées dans une file et résolues par un thread dédié via
+un Future. `submit` ne bloque pas: l'API l'appelle depuis l'event loop, sans
+immobiliser un thread du pool CPU pendant l'attente, si bien que la taille
+des lots suit le nombre réel de requêtes concurrentes. `rerank` est la
+variante bloquante. Une demande dont le Future est annulé avant le scoring
+(appelant parti) est retirée du lot.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from copy import deepcopy
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _RerankRequest:
+    """Demande de reranking en attente."""
+    query: str
+    documents: List[Document]
+    top_n: int
+    future: Future = field(default_factory=Future)
+
+
+def score_pairs(ranker, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+    """
+    Score des paires (question, passage) en un seul appel au cross-encoder.
+
+    Reproduit le calcul de `flashrank.Ranker.rerank` (modèles par paires) sur
+    un lot arbitraire de paires.
+
+    Args:
+        ranker: Instance flashrank.Ranker (FlashrankRerank.client)
+        pairs: Paires (question, passage)
+
+    Returns:
+        Scores de pertinence dans [0, 1], dans l'ordre des paires
+    """
+    encodings = ranker.tokenizer.encode_batch([list(pair) for pair in pairs])
+    input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+    attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+    token_type_ids = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+    onnx_input = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if not np.all(token_type_ids == 0):
+        onnx_input["token_type_ids"] = token_type_ids
+
+    logits = ranker.session.run(None, onnx_input)[0]
+    if logits.shape[1] == 1:
+        return 1.0 / (1.0 + np.exp(-logits.flatten()))
+    exp_logits = np.exp(logits)
+    return exp_logits[:, 1] / np.sum(exp_logits, axis=1)
+
+
+class RerankBatcher:
+    """Regroupe les demandes de reranking concurrentes en appels par lots."""
+
+    def __init__(self, reranker, max_batch_size: int = 64, max_wait_ms: float = 5, timeout: float = 10):
+        """
+        Args:
+            reranker: FlashrankRerank (son `client` flashrank.Ranker est utilisé)
+            max_batch_size: Nombre maximum de paires (question, passage) par lot
+            max_wait_ms: Attente maximale pour compléter un lot (millisecondes)
+            timeout: Attente maximale d'un appelant avant repli sur un appel direct
+        """
+        self.reranker = reranker
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+
+        self._queue: "queue.Queue[_RerankRequest]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+        self.batches = 0
+        self.requests = 0
+        self.pairs = 0
+        self.fallbacks = 0
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="rerank-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, query: str, documents: List[Document], top_n: Optional[int] = None) -> "Future[List[Document]]":
+        """
+        Dépose une demande de classement (non bloquant).
+
+        Args:
+            query: Question
+            documents: Documents à classer
+            top_n: Nombre de documents renvoyés (défaut: top_n du reranker)
+
+        Returns:
+            Future des top_n documents, triés par pertinence décroissante
+            (score dans metadata["relevance_score"])
+        """
+        request = _RerankRequest(query, list(documents), top_n or self.reranker.top_n)
+        if not documents:
+            request.future.set_result([])
+            return request.future
+
+        self._ensure_started()
+        self._queue.put(request)
+        return request.future
+
+    def fallback(self, query: str, documents: List[Document], error: Exception, top_n: Optional[int] = None) -> List[Document]:
+        """Repli après échec ou expiration d'un lot: appel direct, non groupé (bloquant)."""
+        with self._stats_lock:
+            self.fallbacks += 1
+        logger.warning(f"⚠️ Reranking groupé indisponible ({type(error).__name__}: {error}), appel direct")
+        return list(self.reranker.compress_documents(documents, query))[:top_n or self.reranker.top_n]
+
+    def rerank(self, query: str, documents: List[Document], top_n: Optional[int] = None) -> List[Document]:
+        """
+        Classe les documents pour une question (bloquant).
+
+        Returns:
+            Les top_n documents, triés par pertinence décroissante
+        """
+        future = self.submit(query, documents, top_n)
+        try:
+            return future.result(timeout=self.timeout)
+        except Exception as e:
+            future.cancel()
+            return self.fallback(query, documents, e, top_n)
+
+    def stats(self) -> dict:
+        """Statistiques du batcher."""
+        with self._stats_lock:
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "pairs": self.pairs,
+                "avg_requests_per_batch": round(self.requests / self.batches, 2) if self.batches else 0,
+                "fallbacks": self.fallbacks,
+                "queue_size": self._queue.qsize(),
+            }
+
+    def _run(self) -> None:
+        """Boucle du thread de scoring: collecte un lot puis le score."""
+        while True:
+            batch = [self._queue.get()]
+            pair_count = len(batch[0].documents)
+            deadline = time.monotonic() + self.max_wait
+
+            while pair_count < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(request)
+                pair_count += len(request.documents)
+
+            # Demandes abandonnées (appelant annulé ou expiré): pas de scoring
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if batch:
+                self._score_batch(batch)
+
+    def _score_batch(self, batch: List[_RerankRequest]) -> None:
+        pair_count = sum(len(request.documents) for request in batch)
+        pairs = [(request.query, doc.page_content) for request in batch for doc in request.documents]
+        try:
+            scores = score_pairs(self.reranker.client, pairs)
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+
+        with self._stats_lock:
+            self.batches += 1
+            self.requests += len(batch)
+            self.pairs += pair_count
+
+        offset = 0
+        for request in batch:
+            request_scores = scores[offset:offset + len(request.documents)]
+            offset += len(request.documents)
+
+            ranked = sorted(zip(request.documents, request_scores), key=lambda item: item[1], reverse=True)
+            results = []
+            for doc, score in ranked[:request.top_n]:
+                # Même format que FlashrankRerank.compress_documents
+                metadata = deepcopy(doc.metadata)
+                metadata["relevance_score"] = float(score)
+                results.append(Document(id=doc.id, page_content=doc.page_content, metadata=metadata))
+            request.future.set_result(results)
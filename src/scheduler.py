@@ -0,0 +1,302 @@
+"""
+Contrôle d'admission de /ask par plan d'abonnement.
+
+Sous charge, toutes les requêtes entraient dans le pipeline dans l'ordre
+d'arrivée: un pic d'utilisateurs FREE dégradait les clients PRO. Le
+planificateur place devant l'agent:
+
+- une limite globale d'exécutions simultanées du pipeline;
+- une limite par plan (un plan ne monopolise pas toutes les places);
+- des files bornées par plan, servies par file d'attente équitable
+  pondérée (start-time fair queuing: chaque requête en file reçoit une
+  étiquette virtuelle `max(temps virtuel, dernière étiquette du plan) +
+  1 / poids`; la plus petite étiquette éligible passe en premier);
+- un refus immédiat (`AdmissionRejected` -> 503 + Retry-After) si la file
+  du plan est pleine ou si l'attente dépasse `max_queue_wait`, au lieu d'un
+  timeout après 90 s.
+
+Les pipelines attendent surtout Groq (graphe asynchrone): les limites sont
+des fractions de la limite globale, dimensionnée en dizaines d'exécutions.
+Désactivé par défaut (ADMISSION_CONTROL): sans jeton, toutes les requêtes
+sont FREE et une priorité par plan n'a pas de sens.
+
+Une seule boucle d'événements: pas de verrou.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, Optional
+
+from src.metrics import observe_stage, record_event
+from src.models.credit_models import PlanType
+
+logger = logging.getLogger("api")
+
+
+@dataclass(frozen=True)
+class PlanPolicy:
+    """Règles d'admission d'un plan."""
+    max_concurrency: int
+    weight: float
+    max_queue: int
+
+
+# Par plan: (part de la limite globale, poids, file en multiple de la limite du plan)
+PLAN_SHARES: Dict[PlanType, tuple] = {
+    PlanType.FREE: (0.5, 1, 2),
+    PlanType.PREMIUM: (0.6, 2, 2),
+    PlanType.PREMIUM_PLUS: (0.75, 4, 3),
+    PlanType.PRO: (1.0, 8, 3),
+}
+
+
+def default_policies(max_concurrency: int) -> Dict[PlanType, PlanPolicy]:
+    """Règles par plan proportionnelles à la limite globale d'exécutions."""
+    policies = {}
+    for plan, (share, weight, queue_factor) in PLAN_SHARES.items():
+        plan_concurrency = max(1, int(max_concurrency * share))
+        policies[plan] = PlanPolicy(
+            max_concurrency=plan_concurrency,
+            weight=weight,
+            max_queue=plan_concurrency * queue_factor,
+        )
+    return policies
+
+
+class AdmissionRejected(Exception):
+    """Requête refusée (file pleine ou attente trop longue)."""
+
+    def __init__(self, plan: PlanType, reason: str, retry_after: int):
+        super().__init__(f"Admission refusée ({plan.value}: {reason})")
+        self.plan = plan
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Waiter:
+    tag: float
+    future: asyncio.Future
+    enqueued_at: float
+
+
+@dataclass
+class _PlanState:
+    policy: PlanPolicy
+    queue: Deque[_Waiter] = field(default_factory=deque)
+    last_tag: float = 0.0
+    running: int = 0
+    admitted: int = 0
+    rejected: int = 0
+    timed_out: int = 0
+    total_wait: float = 0.0
+    # Durée moyenne d'exécution (moyenne mobile), pour estimer Retry-After
+    mean_service: Optional[float] = None
+
+
+class AdmissionScheduler:
+    """Limites de concurrence par plan et file équitable pondérée."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 64,
+        policies: Optional[Dict[PlanType, PlanPolicy]] = None,
+        max_queue_wait: float = 15,
+        enabled: bool = True,
+    ):
+        """
+        Args:
+            max_concurrency: Exécutions simultanées du pipeline, tous plans confondus
+            policies: Règles par plan (défaut: default_policies(max_concurrency))
+            max_queue_wait: Attente maximale en file avant refus (secondes)
+            enabled: Si False, toutes les requêtes sont admises immédiatement
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue_wait = max_queue_wait
+        self.enabled = enabled
+        policies = policies or default_policies(max_concurrency)
+        self._plans = {plan: _PlanState(policy) for plan, policy in policies.items()}
+        self._running = 0
+        self._virtual_time = 0.0
+
+    def _state(self, plan: PlanType) -> _PlanState:
+        return self._plans.get(plan) or self._plans[PlanType.FREE]
+
+    def _can_start(self, state: _PlanState) -> bool:
+        return self._running < self.max_concurrency and state.running < state.policy.max_concurrency
+
+    def _start(self, state: _PlanState, wait: float) -> None:
+        self._running += 1
+        state.running += 1
+        state.admitted += 1
+        state.total_wait += wait
+        observe_stage("admission_queue", wait)
+
+    def retry_after(self, plan: PlanType) -> int:
+        """Délai conseillé (secondes) avant une nouvelle tentative."""
+        state = self._state(plan)
+        if state.mean_service is None:
+            return 5
+        backlog = (len(state.queue) + 1) / max(1, state.policy.max_concurrency)
+        return max(1, min(60, math.ceil(state.mean_service * backlog)))
+
+    def is_saturated(self, plan: PlanType) -> bool:
+        """La prochaine requête du plan serait-elle refusée immédiatement (file pleine) ?"""
+        if not self.enabled:
+            return False
+        state = self._state(plan)
+        return len(state.queue) >= state.policy.max_queue and not self._can_start(state)
+
+    def _reject(self, plan: PlanType, state: _PlanState, reason: str) -> AdmissionRejected:
+        state.rejected += 1
+        record_event(f"admission_rejected_{reason}")
+        return AdmissionRejected(plan, reason, self.retry_after(plan))
+
+    async def acquire(self, plan: PlanType) -> None:
+        """
+        Attend une place d'exécution pour le plan.
+
+        Raises:
+            AdmissionRejected: file du plan pleine ou attente > max_queue_wait
+        """
+        state = self._state(plan)
+        if not self.enabled:
+            state.running += 1
+            state.admitted += 1
+            return
+
+        if not state.queue and self._can_start(state):
+            self._start(state, 0.0)
+            return
+
+        if len(state.queue) >= state.policy.max_queue:
+            raise self._reject(plan, state, "queue_full")
+
+        state.last_tag = max(self._virtual_time, state.last_tag) + 1 / state.policy.weight
+        waiter = _Waiter(state.last_tag, asyncio.get_running_loop().create_future(), time.perf_counter())
+        state.queue.append(waiter)
+
+        try:
+            done, _ = await asyncio.wait({waiter.future}, timeout=self.max_queue_wait)
+        except asyncio.CancelledError:
+            if waiter.future.done():
+                # Place déjà attribuée: la rendre
+                self.release(plan)
+            else:
+                state.queue.remove(waiter)
+                waiter.future.cancel()
+            raise
+
+        if not done:
+            state.queue.remove(waiter)
+            waiter.future.cancel()
+            state.timed_out += 1
+            raise self._reject(plan, state, "queue_timeout")
+
+    def release(self, plan: PlanType, service_seconds: Optional[float] = None) -> None:
+        """Libère la place du plan et admet les requêtes en file suivantes."""
+        state = self._state(plan)
+        state.running -= 1
+        if service_seconds is not None:
+            state.mean_service = (
+                service_seconds if state.mean_service is None
+                else 0.8 * state.mean_service + 0.2 * service_seconds
+            )
+        if not self.enabled:
+            return
+        self._running -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Attribue les places libres aux plus petites étiquettes éligibles."""
+        while self._running < self.max_concurrency:
+            candidates = [
+                state for state in self._plans.values()
+                if state.queue and state.running < state.policy.max_concurrency
+            ]
+            if not candidates:
+                return
+            state = min(candidates, key=lambda s: s.queue[0].tag)
+            waiter = state.queue.popleft()
+            if waiter.future.done():
+                continue
+            self._virtual_time = waiter.tag
+            self._start(state, time.perf_counter() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, plan: PlanType):
+        """`async with scheduler.admit(plan):` autour de l'exécution du pipeline."""
+        await self.acquire(plan)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(plan, time.perf_counter() - start)
+
+    def stats(self) -> dict:
+        """Places occupées et files par plan."""
+        return {
+            "enabled": self.enabled,
+            "running": self._running,
+            "max_concurrency": self.max_concurrency,
+            "plans": {
+                plan.value: {
+                    "running": state.running,
+                    "queued": len(state.queue),
+                    "admitted": state.admitted,
+                    "rejected": state.rejected,
+                    "timed_out": state.timed_out,
+                    "mean_wait_ms": round(state.total_wait / state.admitted * 1000, 2) if state.admitted else 0.0,
+                }
+                for plan, state in self._plans.items()
+            },
+        }
+
+
+class PlanResolver:
+    """Plan d'un utilisateur, mis en cache (LRU + TTL) pour ne pas interroger la base à chaque requête."""
+
+    def __init__(self, lookup: Callable[[str], Optional[PlanType]], ttl_seconds: float = 300, max_entries: int = 10000):
+        """
+        Args:
+            lookup: Fonction bloquante user_id -> plan (None si inconnu)
+            ttl_seconds: Durée de validité d'un plan en cache
+            max_entries: Nombre maximum d'utilisateurs en cache
+        """
+        self.lookup = lookup
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._cache: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, user_id: Optional[str]) -> PlanType:
+        """Plan de l'utilisateur (FREE si anonyme, inconnu ou en cas d'erreur)."""
+        if not user_id:
+            return PlanType.FREE
+
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._cache.move_to_end(user_id)
+                return entry[0]
+
+        try:
+            plan = PlanType(self.lookup(user_id) or PlanType.FREE)
+        except Exception as e:
+            logger.warning(f"⚠️ Plan de {user_id} indisponible: {e}")
+            plan = PlanType.FREE
+
+        with self._lock:
+            self._cache[user_id] = (plan, now)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return plan
@@ -26,6 +26,7 @@ RATE_LIMIT_REQUESTS = 100  # Nombre de requêtes
 RATE_LIMIT_WINDOW = 60  # Fenêtre de temps en secondes
 MAX_QUESTION_LENGTH = 5000  # Longueur maximale de la question
 MAX_THREAD_ID_LENGTH = 100  # Longueur maximale du thread_id
+MAX_THREAD_TOKEN_LENGTH = 64  # Longueur maximale du jeton de thread
 
 
 def sanitize_input(text: str, max_length: Optional[int] = None) -> str:
@@ -181,6 +182,8 @@ class SecureQueryRequest(BaseModel):
     """Modèle Pydantic sécurisé pour les requêtes."""
     question: str = Field(..., min_length=1, max_length=MAX_QUESTION_LENGTH)
     thread_id: str = Field(default="default", max_length=MAX_THREAD_ID_LENGTH)
+    # Jeton opaque émis par le serveur (réponse précédente du thread)
+    thread_token: Optional[str] = Field(default=None, max_length=MAX_THREAD_TOKEN_LENGTH)
     
     @validator('question')
     def validate_question(cls, v):
@@ -211,6 +214,17 @@ class SecureQueryRequest(BaseModel):
         
         return v
     
+    @validator('thread_token')
+    def validate_thread_token(cls, v):
+        """Valide le jeton de thread (format URL-safe)."""
+        if not v:
+            return None
+        
+        if not re.match(r'^[a-zA-Z0-9_-]+$', v):
+            raise ValueError('Jeton de thread invalide')
+        
+        return v
+    
     class Config:
         """Configuration Pydantic."""
         str_strip_whitespace = True
@@ -12,20 +12,26 @@ os.environ["NUMEXPR_NUM_THREADS"] = "1"
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 os.environ["TRANSFORMERS_CACHE"] = "/tmp/transformers_cache"
 os.environ["SENTENCE_TRANSFORMERS_CACHE_FOLDER"] = "/tmp/st_cache"
-os.environ["WEB_CONCURRENCY"] = "1"
+# Un seul worker, sauf avec un serveur de modèles partagé (MODEL_SERVER_SOCKET):
+# sans lui, chaque worker chargerait sa propre copie des modèles. Avec plusieurs
+# workers, conversations et suggestions passent par SQLite (SHARED_STATE_DIR)
+if not os.getenv("MODEL_SERVER_SOCKET"):
+    os.environ["WEB_CONCURRENCY"] = "1"
 
 import asyncio
 import json
 import logging
+import time
 import traceback
 import sys
 from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from langchain_core.messages import HumanMessage, AIMessage
 
@@ -33,12 +39,39 @@ from langchain_core.messages import HumanMessage, AIMessage
 if __name__ == "__main__":
     sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.agent import agent_app
+from src.agent import (
+    agent_app,
+    awarm_up_llm_clients,
+    cpu_executor,
+    embed_question,
+    get_model_server_client,
+    io_executor,
+    model_executor,
+    model_stats,
+    suggestions_allowed,
+    warm_up,
+    get_question_classifier,
+    ANSWER_STREAM_TAG,
+    CHROMA_DB_PATH,
+    CITIZEN_QUESTIONS,
+    HISTORY_ASSISTANT_CHARS,
+    HISTORY_MAX_MESSAGES,
+    HISTORY_USER_CHARS,
+)
+from src.cache import SemanticAnswerCache, normalize_question
+from src.concurrency import SingleFlight
+from src.conversation_store import ConversationStore
+from src.index_version import read_index_version
+from src.metrics import metrics_summary, record_event, render_metrics, stage_timer
+from src.models.credit_models import PlanType
+from src.scheduler import AdmissionRejected, AdmissionScheduler, PlanResolver
 from src.security import SecureQueryRequest
+from src.suggestions import InitialQuestionPool, SuggestionService
 from src.middleware import (
     SecurityHeadersMiddleware,
     RateLimitMiddleware,
     RequestLoggingMiddleware,
+    ServerTimingMiddleware,
 )
 
 # =============================================================================
@@ -62,7 +95,51 @@ ALLOWED_ORIGINS = os.getenv(
 ).split(",")
 
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", "90"))  # 90 secondes par défaut (optimisé)
-MAX_WORKERS = int(os.getenv("MAX_WORKERS", "4"))  # Nombre de workers pour le thread pool
+# L'échéance (REQUEST_TIMEOUT) est transmise au graphe, qui se dégrade de lui-même;
+# le timeout global n'est plus qu'un filet de sécurité, déclenché après ce délai
+DEADLINE_GRACE_SECONDS = 5
+
+# Préchauffage des modèles au démarrage (/ready renvoie 503 jusqu'à la fin)
+WARM_UP_ON_STARTUP = os.getenv("WARM_UP_ON_STARTUP", "true").lower() == "true"
+
+# Cache sémantique des réponses (questions quasi identiques)
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000"))
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))  # 1 heure
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))  # Similarité cosinus minimale
+
+# Workers uvicorn: au-delà d'un, l'état consulté par d'autres requêtes que celle
+# qui l'a créé (historique, suggestions) est partagé via SQLite. Cache de
+# réponses et regroupement restent par worker (seulement moins efficaces);
+# les limites d'admission sont réparties entre workers.
+WEB_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+SHARED_STATE_DIR = os.getenv("SHARED_STATE_DIR", "data/cache")
+
+# Regroupement des requêtes identiques simultanées (une seule exécution du pipeline)
+REQUEST_COALESCING = os.getenv("REQUEST_COALESCING", "true").lower() == "true"
+
+# Contrôle d'admission par plan (limites par plan, file équitable pondérée, 503 rapide)
+# Désactivé par défaut: sans jeton (frontend actuel), toutes les requêtes sont FREE
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "false").lower() == "true"
+# Pipelines simultanés (surtout en attente de Groq); limites par plan proportionnelles
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+ADMISSION_MAX_QUEUE_WAIT = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", "15"))  # Attente maximale en file (s)
+PLAN_CACHE_TTL = int(os.getenv("PLAN_CACHE_TTL", "300"))  # Plan utilisateur en cache (s)
+
+# Historique des conversations par jeton de thread émis par le serveur (LRU + TTL, débordement SQLite optionnel)
+CONVERSATION_MAX_THREADS = int(os.getenv("CONVERSATION_MAX_THREADS", "1000"))
+CONVERSATION_TTL = int(os.getenv("CONVERSATION_TTL", "3600"))  # 1 heure d'inactivité
+CONVERSATION_SPILL_PATH = os.getenv("CONVERSATION_SPILL_PATH")  # ex: data/cache/conversations.sqlite
+
+# Questions suggérées générées en arrière-plan (file bornée)
+SUGGESTIONS_QUEUE_SIZE = int(os.getenv("SUGGESTIONS_QUEUE_SIZE", "100"))
+SUGGESTIONS_WORKERS = int(os.getenv("SUGGESTIONS_WORKERS", "2"))
+SUGGESTIONS_MAX_WAIT = 30  # Attente maximale (secondes) côté endpoint
+
+# Pool de questions d'accueil rafraîchi en arrière-plan
+INITIAL_QUESTIONS_POOL_SIZE = int(os.getenv("INITIAL_QUESTIONS_POOL_SIZE", "40"))
+INITIAL_QUESTIONS_ROUNDS = int(os.getenv("INITIAL_QUESTIONS_ROUNDS", "3"))  # Générations par rafraîchissement
+INITIAL_QUESTIONS_REFRESH = int(os.getenv("INITIAL_QUESTIONS_REFRESH", "1800"))  # 30 minutes
 
 
 # =============================================================================
@@ -93,6 +170,10 @@ class QueryResponse(BaseModel):
     sources: List[SourceModel] = []
     history: List[MessageHistory] = []
     suggested_questions: List[str] = []
+    # Identifiant pour récupérer les questions suggérées générées en arrière-plan
+    response_id: Optional[str] = None
+    # Jeton opaque du thread, à renvoyer avec la question suivante (historique)
+    thread_token: Optional[str] = None
 
 
 # =============================================================================
@@ -191,21 +272,299 @@ def parse_sources(raw_sources: List) -> List[SourceModel]:
     return parsed_sources
 
 
+def build_query_response(final_state: dict) -> QueryResponse:
+    """
+    Construit la réponse API à partir de l'état final de l'agent.
+    
+    Args:
+        final_state: État retourné par le graphe LangGraph
+        
+    Returns:
+        QueryResponse validée (sources parsées, historique et réponse tronqués)
+    """
+    # =================================================================
+    # PARSING DES SOURCES (JSON → SourceModel)
+    # =================================================================
+    raw_sources = final_state.get("sources", [])
+    parsed_sources = parse_sources(raw_sources)
+    
+    logger.info(f"📚 {len(parsed_sources)} sources parsées")
+    if final_state.get("prompt_tokens"):
+        logger.info(f"🧮 {final_state['prompt_tokens']} tokens de prompt")
+    
+    # =================================================================
+    # EXTRACTION DE L'HISTORIQUE
+    # =================================================================
+    # Uniquement l'échange courant (à partir de la dernière question): les
+    # tours stockés côté serveur et injectés dans l'état ne sont pas renvoyés
+    messages = final_state.get("messages", [])
+    history: List[MessageHistory] = []
+    
+    last_question = max(
+        (idx for idx, msg in enumerate(messages) if isinstance(msg, HumanMessage)),
+        default=0
+    )
+    
+    for msg in messages[last_question:]:
+        try:
+            if isinstance(msg, HumanMessage):
+                content = msg.content[:5000] if len(msg.content) > 5000 else msg.content
+                history.append(MessageHistory(role="user", content=content))
+            elif isinstance(msg, AIMessage):
+                content = msg.content[:10000] if len(msg.content) > 10000 else msg.content
+                history.append(MessageHistory(role="assistant", content=content))
+        except Exception as e:
+            logger.warning(f"Erreur parsing message: {e}")
+    
+    # =================================================================
+    # QUESTIONS SUGGÉRÉES
+    # =================================================================
+    suggested_questions_raw = final_state.get("suggested_questions", [])
+    suggested_questions = [
+        q[:200] if len(q) > 200 else q
+        for q in suggested_questions_raw[:5]
+        if q and len(q.strip()) > 0
+    ]
+    
+    # =================================================================
+    # RÉPONSE
+    # =================================================================
+    answer = final_state.get("answer", "Aucune réponse générée")
+    if len(answer) > 50000:
+        answer = answer[:50000]
+    
+    return QueryResponse(
+        reponse=answer,
+        sources=parsed_sources,
+        history=history,
+        suggested_questions=suggested_questions
+    )
+
+
+# =============================================================================
+# CACHE SÉMANTIQUE DES RÉPONSES
+# =============================================================================
+
+answer_cache = SemanticAnswerCache(
+    max_entries=ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=ANSWER_CACHE_TTL,
+    similarity_threshold=ANSWER_CACHE_THRESHOLD,
+    version_provider=lambda: read_index_version(CHROMA_DB_PATH),
+)
+
+
+async def lookup_answer_cache(question: str) -> Tuple[Optional[List[float]], Optional[QueryResponse]]:
+    """
+    Cherche une réponse en cache pour une question proche.
+    
+    Returns:
+        (embedding de la question, réponse en cache ou None).
+        L'embedding est None si le cache est désactivé ou indisponible.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, None
+    
+    try:
+        with stage_timer("answer_cache_lookup"):
+            embedding = await model_executor.run(embed_question, question)
+            payload = answer_cache.lookup(question, embedding)
+    except Exception as e:
+        logger.warning(f"⚠️ Cache sémantique indisponible: {e}")
+        record_event("answer_cache_error")
+        return None, None
+    
+    if payload is None:
+        record_event("answer_cache_miss")
+        return embedding, None
+    
+    record_event("answer_cache_hit")
+    
+    response = QueryResponse(**payload)
+    # L'historique reflète la question effectivement posée
+    response.history = [
+        MessageHistory(role="user", content=question),
+        MessageHistory(role="assistant", content=response.reponse),
+    ]
+    logger.info("⚡ Réponse servie depuis le cache sémantique")
+    return embedding, response
+
+
+def store_in_answer_cache(question: str, embedding: Optional[List[float]], response: QueryResponse) -> None:
+    """Met en cache une réponse (uniquement les réponses sourcées)."""
+    if embedding is None or not response.sources:
+        return
+    answer_cache.store(question, embedding, response.model_dump(exclude={"history", "response_id", "thread_token"}))
+
+
+# =============================================================================
+# HISTORIQUE DES CONVERSATIONS
+# =============================================================================
+
+conversation_store = ConversationStore(
+    max_threads=CONVERSATION_MAX_THREADS,
+    ttl_seconds=CONVERSATION_TTL,
+    max_messages=HISTORY_MAX_MESSAGES,
+    user_chars=HISTORY_USER_CHARS,
+    assistant_chars=HISTORY_ASSISTANT_CHARS,
+    spill_path=(
+        Path(CONVERSATION_SPILL_PATH or Path(SHARED_STATE_DIR) / "conversations.sqlite")
+        if CONVERSATION_SPILL_PATH or WEB_WORKERS > 1 else None
+    ),
+    shared=WEB_WORKERS > 1,
+)
+
+
+# =============================================================================
+# CONTRÔLE D'ADMISSION PAR PLAN
+# =============================================================================
+
+admission_scheduler = AdmissionScheduler(
+    # Limite de l'instance répartie entre les workers
+    max_concurrency=max(1, -(-ADMISSION_MAX_CONCURRENCY // WEB_WORKERS)),
+    max_queue_wait=ADMISSION_MAX_QUEUE_WAIT,
+    enabled=ADMISSION_CONTROL,
+)
+
+# Plan de l'utilisateur authentifié (système de crédits optionnel)
+try:
+    from src.auth.dependencies import get_optional_user
+    from src.credits.credit_engine import credit_engine
+except Exception as e:
+    logger.warning(f"⚠️ Plans indisponibles pour l'admission (plan FREE pour tous): {e}")
+    get_optional_user, credit_engine = None, None
+
+
+def _lookup_user_plan(user_id: str) -> Optional[PlanType]:
+    """Plan enregistré d'un utilisateur (appel bloquant au système de crédits)."""
+    user_credits = credit_engine.get_user_credits(user_id)
+    return user_credits.plan if user_credits else None
+
+
+plan_resolver = PlanResolver(_lookup_user_plan, ttl_seconds=PLAN_CACHE_TTL)
+
+
+async def resolve_plan(authorization: Optional[str]) -> PlanType:
+    """Plan de la requête: FREE pour les requêtes anonymes."""
+    if not ADMISSION_CONTROL or not authorization or credit_engine is None:
+        return PlanType.FREE
+    user = await get_optional_user(authorization)
+    if not user:
+        return PlanType.FREE
+    return await io_executor.run(plan_resolver.resolve, user["id"])
+
+
+def admission_rejected_response(error: AdmissionRejected) -> JSONResponse:
+    """503 immédiat avec Retry-After (au lieu d'un timeout après REQUEST_TIMEOUT)."""
+    logger.warning(f"🚦 {error}")
+    return JSONResponse(
+        status_code=503,
+        content={
+            "detail": "Service momentanément saturé. Veuillez réessayer dans quelques secondes.",
+            "retry_after": error.retry_after
+        },
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+# =============================================================================
+# QUESTIONS SUGGÉRÉES EN ARRIÈRE-PLAN
+# =============================================================================
+
+suggestion_service = SuggestionService(
+    max_queue_size=SUGGESTIONS_QUEUE_SIZE,
+    workers=SUGGESTIONS_WORKERS,
+    # Polling /suggested-questions/{id} possible sur un autre worker
+    shared_path=Path(SHARED_STATE_DIR) / "suggestions.sqlite" if WEB_WORKERS > 1 else None,
+)
+
+initial_question_pool = InitialQuestionPool(
+    fallback=CITIZEN_QUESTIONS,
+    max_size=INITIAL_QUESTIONS_POOL_SIZE,
+    rounds=INITIAL_QUESTIONS_ROUNDS,
+    refresh_interval=INITIAL_QUESTIONS_REFRESH,
+    max_backoff=INITIAL_QUESTIONS_REFRESH,
+    version_provider=lambda: read_index_version(CHROMA_DB_PATH),
+)
+
+
+def schedule_suggestions(question: str, final_state: dict, response: QueryResponse) -> Optional[str]:
+    """
+    Planifie la génération des questions suggérées pour une réponse sourcée.
+    
+    Returns:
+        Identifiant de réponse (None si pas de sources, réponse dégradée,
+        budget de temps épuisé ou file pleine)
+    """
+    if not response.sources or not suggestions_allowed(final_state):
+        return None
+    
+    context_docs = []
+    for raw in final_state.get("sources", []):
+        try:
+            context_docs.append(json.loads(raw) if isinstance(raw, str) else raw)
+        except json.JSONDecodeError:
+            continue
+    
+    return suggestion_service.submit(
+        question,
+        context_docs,
+        response.reponse,
+        # Les réponses servies depuis le cache héritent des suggestions
+        on_ready=lambda questions: answer_cache.update(question, suggested_questions=questions),
+    )
+
+
 # =============================================================================
 # APPLICATION FASTAPI
 # =============================================================================
 
+warm_up_state = {
+    "ready": not WARM_UP_ON_STARTUP,
+    "duration_seconds": None,
+    "steps": {},
+}
+
+
+async def run_warm_up() -> None:
+    """Préchauffe le pipeline puis marque l'instance comme prête."""
+    logger.info("🔥 Préchauffage des modèles...")
+    start = time.perf_counter()
+    
+    steps = await model_executor.run(warm_up)
+    steps.update(await awarm_up_llm_clients())
+    
+    warm_up_state["steps"] = steps
+    warm_up_state["duration_seconds"] = round(time.perf_counter() - start, 2)
+    warm_up_state["ready"] = True
+    
+    failed = [name for name, value in steps.items() if isinstance(value, str)]
+    if failed:
+        logger.warning(f"⚠️ Préchauffage terminé avec erreurs ({', '.join(failed)})")
+    logger.info(f"✅ Instance prête (préchauffage: {warm_up_state['duration_seconds']}s)")
+
+
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Gestion du cycle de vie de l'application."""
     logger.info("🚀 Démarrage de l'API Agent Juridique Sénégalais RAG...")
     
-    # Pas d'initialisation de DB pour le moment - mode développement
-    # La DB est initialisée à la demande dans get_db()
+    # Préchauffage en arrière-plan: le serveur répond déjà à /health,
+    # /ready renvoie 503 tant que les modèles ne sont pas chargés
+    warm_up_task = asyncio.create_task(run_warm_up()) if WARM_UP_ON_STARTUP else None
+    
+    await suggestion_service.start()
+    await initial_question_pool.start()
     
     yield
     
     logger.info("🛑 Arrêt de l'API...")
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await initial_question_pool.stop()
+    await suggestion_service.stop()
+    conversation_store.close()
+    cpu_executor.shutdown()
+    io_executor.shutdown()
 
 
 app = FastAPI(
@@ -221,6 +580,8 @@ app = FastAPI(
 app.add_middleware(SecurityHeadersMiddleware)
 app.add_middleware(RateLimitMiddleware)
 app.add_middleware(RequestLoggingMiddleware)
+# Latence par route et en-tête Server-Timing (étapes du pipeline)
+app.add_middleware(ServerTimingMiddleware)
 # Compression GZip optimisée (compresser à partir de 500 bytes)
 app.add_middleware(GZipMiddleware, minimum_size=500)
 
@@ -231,7 +592,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "X-Requested-With"],
-    expose_headers=["X-Process-Time", "X-Rate-Limit-Remaining"],
+    expose_headers=["X-Process-Time", "X-Rate-Limit-Remaining", "Server-Timing", "Retry-After"],
     max_age=3600,  # Cache preflight requests pendant 1 heure
 )
 
@@ -274,96 +635,192 @@ async def health_check():
     }
 
 
-@app.post("/ask", response_model=QueryResponse)
-async def ask_question(request: SecureQueryRequest):
+single_flight = SingleFlight()
+
+
+async def run_agent_pipeline(
+    question: str,
+    question_embedding: Optional[List[float]],
+    history: Optional[list] = None,
+    plan: PlanType = PlanType.FREE,
+) -> QueryResponse:
     """
-    Endpoint principal: interroge l'agent et retourne une réponse structurée.
+    Exécute l'agent pour une question (cache manqué) et prépare la réponse.
+    
+    Sans historique, la réponse complète est mise en cache; la génération des
+    suggestions est planifiée si le budget de temps le permet. L'échéance de
+    la requête part de l'arrivée (attente d'admission comprise).
     
-    Sécurisé avec validation, rate limiting, et timeout.
+    Raises:
+        AdmissionRejected: file du plan pleine ou attente trop longue
     """
-    logger.info(f"📥 Question reçue: {request.question[:50]}...")
+    deadline = time.monotonic() + REQUEST_TIMEOUT
     
+    # Invoke avec timeout et gestion mémoire optimisée
     try:
-        # Invoke avec timeout et gestion mémoire optimisée
-        try:
-            # Utiliser un thread pool pour éviter de bloquer l'event loop
-            loop = asyncio.get_event_loop()
+        # Place d'exécution selon le plan, puis graphe asynchrone: les nœuds
+        # sautent les étapes optionnelles et annulent les appels Groq à l'échéance
+        async with admission_scheduler.admit(plan):
             final_state = await asyncio.wait_for(
-                loop.run_in_executor(
-                    None,  # Utiliser le thread pool par défaut
-                    agent_app.invoke,
-                    {"question": request.question, "messages": []}
-                ),
-                timeout=REQUEST_TIMEOUT
-            )
-            
-            # Forcer le garbage collection après traitement pour libérer la mémoire
-            import gc
-            gc.collect()
-            
-        except asyncio.TimeoutError:
-            logger.warning(f"⏱️ Timeout après {REQUEST_TIMEOUT}s")
-            # Nettoyer la mémoire en cas de timeout
-            import gc
-            gc.collect()
-            raise HTTPException(
-                status_code=504,
-                detail=f"La requête a pris plus de {REQUEST_TIMEOUT} secondes. Veuillez reformuler votre question."
+                agent_app.ainvoke({
+                    "question": question,
+                    "messages": list(history or []),
+                    "deadline": deadline,
+                }),
+                timeout=max(0.0, deadline - time.monotonic()) + DEADLINE_GRACE_SECONDS
             )
         
-        # =================================================================
-        # PARSING DES SOURCES (JSON → SourceModel)
-        # =================================================================
-        raw_sources = final_state.get("sources", [])
-        parsed_sources = parse_sources(raw_sources)
-        
-        logger.info(f"📚 {len(parsed_sources)} sources parsées")
-        
-        # =================================================================
-        # EXTRACTION DE L'HISTORIQUE
-        # =================================================================
-        messages = final_state.get("messages", [])
-        history: List[MessageHistory] = []
+        # Forcer le garbage collection après traitement pour libérer la mémoire
+        import gc
+        gc.collect()
         
-        recent_messages = messages[-10:] if len(messages) > 10 else messages
-        
-        for msg in recent_messages:
-            try:
-                if isinstance(msg, HumanMessage):
-                    content = msg.content[:5000] if len(msg.content) > 5000 else msg.content
-                    history.append(MessageHistory(role="user", content=content))
-                elif isinstance(msg, AIMessage):
-                    content = msg.content[:10000] if len(msg.content) > 10000 else msg.content
-                    history.append(MessageHistory(role="assistant", content=content))
-            except Exception as e:
-                logger.warning(f"Erreur parsing message: {e}")
-        
-        # =================================================================
-        # QUESTIONS SUGGÉRÉES
-        # =================================================================
-        suggested_questions_raw = final_state.get("suggested_questions", [])
-        suggested_questions = [
-            q[:200] if len(q) > 200 else q
-            for q in suggested_questions_raw[:5]
-            if q and len(q.strip()) > 0
-        ]
-        
-        # =================================================================
-        # RÉPONSE
-        # =================================================================
-        answer = final_state.get("answer", "Aucune réponse générée")
-        if len(answer) > 50000:
-            answer = answer[:50000]
-        
-        logger.info(f"✅ Réponse générée ({len(answer)} caractères)")
-        
-        return QueryResponse(
-            reponse=answer,
-            sources=parsed_sources,
-            history=history,
-            suggested_questions=suggested_questions
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ Timeout après {REQUEST_TIMEOUT}s")
+        record_event("request_timeout")
+        # Nettoyer la mémoire en cas de timeout
+        import gc
+        gc.collect()
+        raise HTTPException(
+            status_code=504,
+            detail=f"La requête a pris plus de {REQUEST_TIMEOUT} secondes. Veuillez reformuler votre question."
+        )
+    
+    response = build_query_response(final_state)
+    if final_state.get("degraded"):
+        logger.warning(f"⏳ Réponse dégradée (échéance): {', '.join(final_state['degraded'])}")
+    elif not history:
+        # Une réponse dépendant de l'historique n'est pas réutilisable
+        store_in_answer_cache(question, question_embedding, response)
+    response.response_id = schedule_suggestions(question, final_state, response)
+    logger.info(f"✅ Réponse générée ({len(response.reponse)} caractères)")
+    return response
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Endpoint de disponibilité pour le load balancer: 503 tant que le
+    préchauffage (modèles, base, reranker, clients HTTP) n'est pas terminé.
+    """
+    if not warm_up_state["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    
+    return {
+        "status": "ready",
+        "warm_up_seconds": warm_up_state["duration_seconds"],
+        "steps": warm_up_state["steps"],
+    }
+
+
+async def collect_model_server_stats() -> dict:
+    """Statistiques du serveur de modèles, préfixées `model_server_` (vide si absent ou injoignable)."""
+    client = get_model_server_client()
+    if client is None:
+        return {}
+    try:
+        stats = await asyncio.wait_for(io_executor.run(client.stats), timeout=2)
+    except Exception as e:
+        logger.warning(f"⚠️ Statistiques du serveur de modèles indisponibles: {type(e).__name__}: {e}")
+        return {}
+    return {f"model_server_{section}": values for section, values in stats.items()}
+
+
+async def collect_stats() -> dict:
+    """Statistiques internes des composants (caches, files, classifieur, modèles)."""
+    return {
+        **model_stats(),
+        **await collect_model_server_stats(),
+        "answer_cache": answer_cache.stats(),
+        "coalescing": single_flight.stats(),
+        "conversations": conversation_store.stats(),
+        "classifier": get_question_classifier().stats(),
+        "suggestions": suggestion_service.stats(),
+        "initial_questions": initial_question_pool.stats(),
+        "admission": admission_scheduler.stats(),
+        "cpu_executor": cpu_executor.stats(),
+        "io_executor": io_executor.stats(),
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    """Statistiques internes: caches, regroupement des requêtes, suggestions, latences."""
+    return {
+        **await collect_stats(),
+        "latency": metrics_summary(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Métriques au format Prometheus: histogrammes de latence par étape et par
+    route, compteurs d'événements (cache, fallbacks, timeouts) et statistiques
+    internes exposées en jauges.
+    """
+    return PlainTextResponse(
+        render_metrics(await collect_stats()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+async def answer_question(
+    question: str,
+    thread_token: Optional[str],
+    plan: PlanType = PlanType.FREE,
+) -> QueryResponse:
+    """
+    Répond à une question en tenant compte de l'historique du thread.
+    
+    Sans historique: cache sémantique puis regroupement des questions
+    identiques simultanées. Avec historique: exécution dédiée. Seules les
+    exécutions du pipeline passent par le contrôle d'admission.
+    """
+    history = conversation_store.messages(thread_token)
+    if history:
+        return await run_agent_pipeline(question, None, history, plan)
+    
+    # Cache sémantique: questions quasi identiques déjà traitées
+    question_embedding, cached_response = await lookup_answer_cache(question)
+    if cached_response is not None:
+        return cached_response
+    
+    if not REQUEST_COALESCING:
+        return await run_agent_pipeline(question, question_embedding, plan=plan)
+    
+    # Requêtes simultanées avec la même question (sans historique) regroupées
+    # sur une seule exécution du pipeline
+    response, shared = await single_flight.do(
+        normalize_question(question),
+        lambda: run_agent_pipeline(question, question_embedding, plan=plan)
+    )
+    if shared:
+        logger.info("🔗 Requête regroupée avec une exécution en cours")
+        record_event("request_coalesced")
+    # Chaque appelant reçoit sa propre copie de la réponse partagée
+    return response.model_copy(deep=True)
+
+
+@app.post("/ask", response_model=QueryResponse)
+async def ask_question(request: SecureQueryRequest, authorization: Optional[str] = Header(None)):
+    """
+    Endpoint principal: interroge l'agent et retourne une réponse structurée.
+    
+    Sécurisé avec validation, rate limiting, et timeout. Sous charge, les
+    requêtes sont admises selon le plan de l'utilisateur (503 si saturé).
+    """
+    logger.info(f"📥 Question reçue: {request.question[:50]}...")
+    
+    try:
+        plan = await resolve_plan(authorization)
+        response = await answer_question(request.question, request.thread_token, plan)
+        response.thread_token = conversation_store.append(
+            request.thread_token, request.question, response.reponse
         )
+        return response
         
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except HTTPException:
         raise
     except Exception as e:
@@ -379,51 +836,194 @@ async def ask_question(request: SecureQueryRequest):
         ) from e
 
 
-@app.get("/suggested-questions/initial")
-async def get_initial_questions():
+def format_sse(event: str, data: dict) -> str:
+    """Formate un événement Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def stream_agent_events(
+    question: str,
+    thread_token: Optional[str] = None,
+    plan: PlanType = PlanType.FREE,
+):
     """
-    Endpoint pour récupérer 4-5 questions suggérées à l'accueil.
-    Les questions sont générées dynamiquement basées sur le contenu réel de la base de données.
+    Exécute l'agent en streaming et produit les événements SSE.
+    
+    Ordre des événements:
+    - sources: documents retenus par le nœud retrieve (dès qu'ils sont prêts)
+    - token: fragments de la réponse au fil de la génération
+    - done: réponse finale complète (sources définitives incluses)
+    - suggestions: questions suggérées, générées après la réponse
+    - error: en cas de timeout, de refus d'admission (503) ou d'erreur interne
     """
-    logger.info("📋 Récupération des questions suggérées initiales")
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    final_state: dict = {"deadline": deadline}
     
-    try:
-        from src.agent import generate_initial_questions
-        
-        # Utiliser un thread pool pour éviter de bloquer l'event loop
-        loop = asyncio.get_event_loop()
-        suggested_questions = await asyncio.wait_for(
-            loop.run_in_executor(None, generate_initial_questions),
-            timeout=30  # Timeout de 30 secondes
+    history = conversation_store.messages(thread_token)
+    if history:
+        question_embedding, cached_response = None, None
+    else:
+        question_embedding, cached_response = await lookup_answer_cache(question)
+    if cached_response is not None:
+        cached_response.thread_token = conversation_store.append(
+            thread_token, question, cached_response.reponse
         )
+        yield format_sse("sources", {
+            "sources": [source.model_dump() for source in cached_response.sources]
+        })
+        yield format_sse("token", {"content": cached_response.reponse})
+        yield format_sse("done", cached_response.model_dump(exclude={"suggested_questions"}))
+        yield format_sse("suggestions", {"suggested_questions": cached_response.suggested_questions})
+        return
+    
+    try:
+        await admission_scheduler.acquire(plan)
+    except AdmissionRejected as e:
+        logger.warning(f"🚦 {e}")
+        yield format_sse("error", {
+            "detail": "Service momentanément saturé. Veuillez réessayer dans quelques secondes.",
+            "status": 503,
+            "retry_after": e.retry_after
+        })
+        return
+    admitted_at = time.monotonic()
+    
+    stream = agent_app.astream(
+        {"question": question, "messages": list(history), "deadline": deadline},
+        stream_mode=["updates", "messages"]
+    ).__aiter__()
+    
+    try:
+        while True:
+            # Filet de sécurité: le graphe rend normalement une réponse dégradée avant
+            remaining = deadline + DEADLINE_GRACE_SECONDS - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            
+            try:
+                mode, chunk = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+            except StopAsyncIteration:
+                break
+            
+            if mode == "messages":
+                # Tokens LLM: ne relayer que ceux de la réponse finale
+                message, metadata = chunk
+                if ANSWER_STREAM_TAG in (metadata.get("tags") or []) and message.content:
+                    yield format_sse("token", {"content": message.content})
+                continue
+            
+            # Mises à jour d'état par nœud: {nom_du_noeud: mise_à_jour}
+            for node_name, update in chunk.items():
+                if not update:
+                    continue
+                final_state.update(update)
+                
+                if node_name == "retrieve":
+                    sources = parse_sources(update.get("context_documents", []))
+                    yield format_sse("sources", {
+                        "sources": [source.model_dump() for source in sources]
+                    })
         
-        logger.info(f"✅ {len(suggested_questions)} questions générées")
-        
-        return {
-            "suggested_questions": suggested_questions,
-            "count": len(suggested_questions)
-        }
+        response = build_query_response(final_state)
+        if final_state.get("degraded"):
+            logger.warning(f"⏳ Réponse dégradée (échéance): {', '.join(final_state['degraded'])}")
+        elif not history:
+            store_in_answer_cache(question, question_embedding, response)
+        response.response_id = schedule_suggestions(question, final_state, response)
+        response.thread_token = conversation_store.append(thread_token, question, response.reponse)
+        yield format_sse("done", response.model_dump(exclude={"suggested_questions"}))
+        logger.info(f"✅ Réponse streamée ({len(response.reponse)} caractères)")
         
+        # Événement final: questions suggérées (passent par la même file bornée)
+        suggested_questions: List[str] = []
+        if response.response_id:
+            remaining = max(0.0, deadline - time.monotonic())
+            result = await suggestion_service.get(
+                response.response_id,
+                wait=min(SUGGESTIONS_MAX_WAIT, remaining)
+            )
+            if result:
+                suggested_questions = result["suggested_questions"]
+        yield format_sse("suggestions", {"suggested_questions": suggested_questions})
+    
     except asyncio.TimeoutError:
-        logger.warning("⏱️ Timeout lors de la génération des questions")
-        # Fallback: retourner les questions statiques
-        from src.agent import CITIZEN_QUESTIONS
-        import random
-        fallback = CITIZEN_QUESTIONS.copy() if CITIZEN_QUESTIONS else []
-        random.shuffle(fallback)
-        return {
-            "suggested_questions": fallback[:5],
-            "count": len(fallback[:5])
-        }
+        logger.warning(f"⏱️ Timeout streaming après {REQUEST_TIMEOUT}s")
+        record_event("request_timeout")
+        yield format_sse("error", {
+            "detail": f"La requête a pris plus de {REQUEST_TIMEOUT} secondes. Veuillez reformuler votre question.",
+            "status": 504
+        })
     
     except Exception as e:
-        logger.error(f"❌ Erreur génération questions initiales: {str(e)}")
-        # Fallback: retourner les questions statiques
-        from src.agent import CITIZEN_QUESTIONS
-        import random
-        fallback = CITIZEN_QUESTIONS.copy() if CITIZEN_QUESTIONS else []
-        random.shuffle(fallback)
-        return {
-            "suggested_questions": fallback[:5],
-            "count": len(fallback[:5])
-        }
\ No newline at end of file
+        logger.error(f"❌ Erreur streaming: {type(e).__name__}: {e}")
+        traceback.print_exc(file=sys.stdout)
+        yield format_sse("error", {
+            "detail": "Une erreur interne est survenue. Veuillez réessayer plus tard.",
+            "status": 500
+        })
+    
+    finally:
+        await stream.aclose()
+        admission_scheduler.release(plan, time.monotonic() - admitted_at)
+
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: SecureQueryRequest, authorization: Optional[str] = Header(None)):
+    """
+    Variante streaming de /ask (Server-Sent Events).
+    
+    Les sources sont envoyées dès la fin de la recherche, puis la réponse
+    token par token, et enfin les questions suggérées. Si la file du plan
+    est déjà pleine, 503 immédiat (sinon l'admission a lieu dans le flux).
+    """
+    logger.info(f"📥 Question reçue (stream): {request.question[:50]}...")
+    
+    plan = await resolve_plan(authorization)
+    if admission_scheduler.is_saturated(plan):
+        return admission_rejected_response(
+            AdmissionRejected(plan, "queue_full", admission_scheduler.retry_after(plan))
+        )
+    
+    return StreamingResponse(
+        stream_agent_events(request.question, request.thread_token, plan),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Désactiver le buffering nginx
+        }
+    )
+
+
+@app.get("/suggested-questions/initial")
+async def get_initial_questions():
+    """
+    Endpoint pour récupérer 4-5 questions suggérées à l'accueil.
+    Les questions sont tirées d'un pool généré en arrière-plan à partir du contenu réel
+    de la base de données (questions statiques tant que le pool est vide).
+    """
+    suggested_questions = initial_question_pool.sample(5)
+    
+    return {
+        "suggested_questions": suggested_questions,
+        "count": len(suggested_questions)
+    }
+
+
+@app.get("/suggested-questions/{response_id}")
+async def get_suggested_questions(
+    response_id: str,
+    wait: float = Query(default=0, ge=0, le=SUGGESTIONS_MAX_WAIT, description="Attente maximale (secondes)")
+):
+    """
+    Récupère les questions suggérées générées en arrière-plan pour une réponse de /ask.
+    
+    Avec `wait > 0`, la requête attend la fin de la génération (long polling).
+    """
+    result = await suggestion_service.get(response_id, wait=wait)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Suggestions introuvables ou expirées")
+    
+    return {
+        "response_id": response_id,
+        **result,
+    }
@@ -0,0 +1,453 @@
+"""
+Génération des questions suggérées en arrière-plan.
+
+La génération des suggestions est un second appel au modèle 70B: elle est
+retirée du chemin critique de /ask. Les tâches passent par une file bornée
+traitée par un nombre fixe de workers; si la file est pleine, la tâche est
+abandonnée plutôt que d'accumuler du travail pendant un pic de trafic.
+Les résultats sont conservés (LRU + TTL) et récupérés par identifiant de
+réponse. Avec plusieurs workers uvicorn, ils sont aussi écrits dans un
+fichier SQLite partagé (`shared_path`): le polling peut arriver sur un autre
+worker que celui qui a traité /ask.
+
+Les questions de la page d'accueil proviennent d'un pool précalculé
+(`InitialQuestionPool`), rafraîchi périodiquement et à chaque reconstruction
+de l'index: une visite ne déclenche plus ni recherche ni appel LLM. Après
+un rafraîchissement raté (LLM indisponible), la tentative suivante est
+retardée exponentiellement.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from src.agent import (
+    agenerate_suggested_questions,
+    generate_questions_from_documents,
+    io_executor,
+    model_executor,
+    sample_corpus_documents,
+)
+
+logger = logging.getLogger("api")
+
+
+@dataclass
+class _SuggestionJob:
+    """Tâche de génération en attente."""
+    response_id: str
+    question: str
+    sources: List[dict]
+    answer: str
+    on_ready: Optional[Callable[[List[str]], None]] = None
+
+
+@dataclass
+class _SuggestionResult:
+    """Résultat (éventuellement en attente) pour une réponse."""
+    created_at: float
+    status: str = "pending"  # pending | ready | failed
+    questions: List[str] = field(default_factory=list)
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class _SharedResults:
+    """Résultats visibles de tous les workers (table SQLite, mode WAL)."""
+
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, path: Path, ttl_seconds: float):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS suggestion_results ("
+            "response_id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "questions TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def put(self, response_id: str, result: _SuggestionResult) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO suggestion_results VALUES (?, ?, ?, ?)",
+                (response_id, result.status, json.dumps(result.questions, ensure_ascii=False), result.created_at)
+            )
+            self._db.execute(
+                "DELETE FROM suggestion_results WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._db.commit()
+
+    def get(self, response_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, questions, created_at FROM suggestion_results WHERE response_id = ?",
+                (response_id,)
+            ).fetchone()
+        if row is None or row[2] < time.time() - self.ttl_seconds:
+            return None
+        return {"status": row[0], "suggested_questions": json.loads(row[1])}
+
+    async def wait(self, response_id: str, wait: float) -> Optional[dict]:
+        """Relit le résultat jusqu'à ce qu'il ne soit plus en attente (ou `wait` écoulé)."""
+        deadline = time.monotonic() + wait
+        result = self.get(response_id)
+        while result is not None and result["status"] == "pending" and time.monotonic() < deadline:
+            await asyncio.sleep(self.POLL_INTERVAL)
+            result = self.get(response_id)
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class SuggestionService:
+    """File bornée + workers asynchrones pour les questions suggérées."""
+
+    def __init__(
+        self,
+        max_queue_size: int = 100,
+        workers: int = 2,
+        max_results: int = 1000,
+        ttl_seconds: float = 600,
+        job_timeout: float = 30,
+        shared_path: Optional[Path] = None,
+    ):
+        """
+        Args:
+            max_queue_size: Tâches en attente au maximum (au-delà: abandon)
+            workers: Générations simultanées
+            max_results: Résultats conservés en mémoire
+            ttl_seconds: Durée de conservation d'un résultat
+            job_timeout: Timeout d'une génération (secondes)
+            shared_path: Fichier SQLite partagé entre workers (désactivé si None)
+        """
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self.max_results = max_results
+        self.ttl_seconds = ttl_seconds
+        self.job_timeout = job_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._results: OrderedDict[str, _SuggestionResult] = OrderedDict()
+        self._shared = _SharedResults(shared_path, ttl_seconds) if shared_path else None
+
+        self.submitted = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        """Démarre les workers (à appeler dans l'event loop de l'application)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"suggestions-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"💡 Service de suggestions démarré ({self.workers} workers, file max {self.max_queue_size})")
+
+    async def stop(self) -> None:
+        """Arrête les workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._shared is not None:
+            self._shared.close()
+
+    def submit(
+        self,
+        question: str,
+        sources: List[dict],
+        answer: str,
+        on_ready: Optional[Callable[[List[str]], None]] = None,
+    ) -> Optional[str]:
+        """
+        Planifie la génération des suggestions pour une réponse.
+
+        Args:
+            question: Question posée
+            sources: Documents de contexte ayant servi à la réponse
+            answer: Réponse générée
+            on_ready: Callback appelé avec les questions une fois générées
+
+        Returns:
+            Identifiant de réponse, ou None si la file est pleine
+            (ou le service non démarré)
+        """
+        if self._queue is None:
+            return None
+
+        self._purge_expired()
+
+        response_id = uuid.uuid4().hex
+        try:
+            self._queue.put_nowait(_SuggestionJob(response_id, question, sources, answer, on_ready))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("⚠️ File des suggestions pleine: génération abandonnée")
+            return None
+
+        result = _SuggestionResult(created_at=time.time())
+        self._results[response_id] = result
+        if self._shared is not None:
+            self._shared.put(response_id, result)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+        self.submitted += 1
+        return response_id
+
+    async def get(self, response_id: str, wait: float = 0) -> Optional[dict]:
+        """
+        Récupère les suggestions d'une réponse.
+
+        Args:
+            response_id: Identifiant renvoyé par submit
+            wait: Attente maximale (secondes) si la génération est en cours
+
+        Returns:
+            {"status": ..., "suggested_questions": [...]} ou None si inconnu/expiré
+        """
+        self._purge_expired()
+
+        result = self._results.get(response_id)
+        if result is None:
+            # Réponse traitée par un autre worker
+            return await self._shared.wait(response_id, wait) if self._shared is not None else None
+
+        if result.status == "pending" and wait > 0:
+            try:
+                await asyncio.wait_for(result.done.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+        return {"status": result.status, "suggested_questions": list(result.questions)}
+
+    def stats(self) -> dict:
+        """Statistiques du service."""
+        return {
+            "queue_size": self._queue.qsize() if self._queue else 0,
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    def _purge_expired(self) -> None:
+        """Supprime les résultats expirés (les plus anciens sont en tête)."""
+        cutoff = time.time() - self.ttl_seconds
+        while self._results:
+            response_id, result = next(iter(self._results.items()))
+            if result.created_at >= cutoff:
+                break
+            self._results.pop(response_id, None)
+
+    async def _worker(self) -> None:
+        """Boucle de traitement des tâches."""
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run_job(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job: _SuggestionJob) -> None:
+        result = self._results.get(job.response_id)
+        if result is None:
+            # Résultat déjà évincé: inutile de générer
+            return
+
+        try:
+            questions = await asyncio.wait_for(
+                agenerate_suggested_questions(job.question, job.sources, job.answer),
+                timeout=self.job_timeout
+            )
+            result.questions = [q[:200] for q in questions[:5] if q and q.strip()]
+            result.status = "ready"
+            if job.on_ready and result.questions:
+                job.on_ready(result.questions)
+        except Exception as e:
+            self.failed += 1
+            result.status = "failed"
+            logger.warning(f"⚠️ Erreur génération suggestions: {type(e).__name__}: {e}")
+        finally:
+            result.done.set()
+            if self._shared is not None:
+                self._shared.put(job.response_id, result)
+
+
+def _question_key(question: str) -> str:
+    """Forme normalisée d'une question pour la déduplication."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+class InitialQuestionPool:
+    """
+    Pool de questions d'accueil générées à partir du corpus, en arrière-plan.
+
+    `sample` ne fait qu'un tirage aléatoire en mémoire. Tant que le pool est
+    vide (démarrage à froid, LLM indisponible), les questions statiques
+    `fallback` sont servies.
+
+    Un rafraîchissement fait `rounds` générations, chacune avec un nouveau
+    tirage de documents (pool des modèles) puis un appel LLM (pool I/O),
+    interrompues au premier échec. Les questions sont dédupliquées. Après un échec, la
+    tentative suivante attend `check_interval * 2^échecs`, plafonné à
+    `max_backoff`.
+    """
+
+    def __init__(
+        self,
+        fallback: Sequence[str],
+        max_size: int = 40,
+        rounds: int = 3,
+        refresh_interval: float = 1800,
+        check_interval: float = 60,
+        generation_timeout: float = 60,
+        max_backoff: float = 1800,
+        version_provider: Optional[Callable[[], Optional[str]]] = None,
+        sampler: Callable[[], List] = sample_corpus_documents,
+        generator: Callable[[List], List[str]] = generate_questions_from_documents,
+    ):
+        """
+        Args:
+            fallback: Questions statiques servies tant que le pool est vide
+            max_size: Nombre maximum de questions conservées
+            rounds: Générations (recherche + LLM) par rafraîchissement
+            refresh_interval: Intervalle entre deux rafraîchissements (secondes)
+            check_interval: Intervalle de vérification de la version d'index
+            generation_timeout: Timeout d'une génération (secondes)
+            max_backoff: Délai maximal avant une nouvelle tentative après échecs (secondes)
+            version_provider: Version courante de l'index (rafraîchissement si elle change)
+            sampler: Fonction synchrone (CPU) tirant des documents source (appelée à chaque génération)
+            generator: Fonction synchrone (LLM) générant des questions à partir des documents
+        """
+        self.fallback = list(fallback)
+        self.max_size = max_size
+        self.rounds = rounds
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self.generation_timeout = generation_timeout
+        self.max_backoff = max_backoff
+        self.version_provider = version_provider
+        self.sampler = sampler
+        self.generator = generator
+
+        # Remplacée d'un bloc à chaque rafraîchissement (lecture sans verrou)
+        self._questions: List[str] = []
+        self._version: Optional[str] = None
+        self._refreshed_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+
+        self.refreshes = 0
+        self.failures = 0
+
+    async def start(self) -> None:
+        """Démarre le rafraîchissement en arrière-plan."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="initial-questions-refresher")
+
+    async def stop(self) -> None:
+        """Arrête le rafraîchissement."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def sample(self, count: int = 5) -> List[str]:
+        """Tire `count` questions au hasard (pool, ou questions statiques à froid)."""
+        questions = self._questions or self.fallback
+        return random.sample(questions, min(count, len(questions)))
+
+    def stats(self) -> dict:
+        """Statistiques du pool."""
+        return {
+            "size": len(self._questions),
+            "version": self._version,
+            "age_seconds": round(time.time() - self._refreshed_at) if self._refreshed_at else None,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "consecutive_failures": self._consecutive_failures,
+            "retry_in_seconds": max(0, round(self._retry_at - time.time())),
+        }
+
+    def _current_version(self) -> Optional[str]:
+        return self.version_provider() if self.version_provider else None
+
+    async def _run(self) -> None:
+        """Boucle de rafraîchissement."""
+        while True:
+            version = self._current_version()
+            due = (
+                not self._questions
+                or version != self._version
+                or time.time() - self._refreshed_at >= self.refresh_interval
+            )
+            if due and time.time() >= self._retry_at:
+                await self.refresh(version)
+            await asyncio.sleep(self.check_interval)
+
+    async def refresh(self, version: Optional[str] = None) -> None:
+        """
+        Génère de nouvelles questions et remplace le pool.
+
+        Si la version d'index est inchangée, les nouvelles questions s'ajoutent
+        aux précédentes (dans la limite de `max_size`); sinon elles les remplacent.
+        """
+        generated: List[str] = []
+
+        try:
+            for _ in range(self.rounds):
+                # Nouveau tirage de documents à chaque génération (pool des modèles)
+                documents = await model_executor.run(self.sampler)
+                if not documents:
+                    continue
+                questions = await asyncio.wait_for(
+                    # Appel LLM synchrone: pool I/O
+                    io_executor.run(self.generator, documents),
+                    timeout=self.generation_timeout
+                )
+                generated.extend(q[:200] for q in questions if q and q.strip())
+        except Exception as e:
+            # Pas d'autres appels LLM pendant une panne
+            logger.warning(f"⚠️ Erreur génération du pool de questions: {type(e).__name__}: {e}")
+
+        if not generated:
+            # Conserver le pool actuel; nouvelle tentative après un délai croissant
+            self.failures += 1
+            self._consecutive_failures += 1
+            backoff = min(self.check_interval * 2 ** self._consecutive_failures, self.max_backoff)
+            self._retry_at = time.time() + backoff
+            logger.info(f"💡 Pool de questions d'accueil: nouvelle tentative dans {backoff:.0f}s")
+            return
+
+        self._consecutive_failures = 0
+        self._retry_at = 0.0
+
+        previous = self._questions if version == self._version else []
+        # Dédupliquer (casse, ponctuation, espaces) en gardant les plus récentes en tête
+        unique = {}
+        for question in generated + previous:
+            unique.setdefault(_question_key(question), question)
+        self._questions = list(unique.values())[:self.max_size]
+        self._version = version
+        self._refreshed_at = time.time()
+        self.refreshes += 1
+        logger.info(f"💡 Pool de questions d'accueil rafraîchi: {len(self._questions)} questions")